@@ -1,53 +1,167 @@
+import argparse
+import atexit
 import yaml
 import os
 import random
 import getpass
 from colorama import init, Fore, Style
-from tabulate import tabulate
 import re
+import secrets
+import sqlite3
+from contextlib import nullcontext
 from copy import deepcopy
-import requests
 import subprocess
-import paramiko
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from moduloDatos import RepositorioDB, AlmacenRutas, crear_almacen, cargar_yaml, reporte_tiempos_carga, ruta_datos
+from moduloSSH import PoolSSH
+from moduloDiferido import importar_diferido, funcion_diferida
+from moduloFloodlight import CONTROLADOR, separar_direccion, obtener_cliente, SnapshotDispositivos, CacheRutas, MotorRutas, RepartoRutas, RegistroFlujos, RutasPorSesion, TablaFlujos, nombres_instalados
 
 # Inicializa colorama para dar estilo al texto en la CLI
 init(autoreset=True)
 
+# SSH y tablas se importan recién cuando se usan (ver moduloDiferido)
+paramiko = importar_diferido("paramiko")
+tabulate = funcion_diferida("tabulate", "tabulate")
+
 # Definir como una variable global
 db = None
+repo = None  # Índices en memoria sobre db (ver moduloDatos.RepositorioDB)
 notas_alumno_original = None
 
 # Definición global de usuario
 usuario = None
 
+# Servicio y token de la sesión de la CLI (ver ServicioAcademico)
+servicio = None
+token_sesion = None
+
 #FUNCIONES DE RUTAS *********************************************************************************************************************************** 
 
-def crear_ruta(ip_controlador):
+# Si es True, cada ruta obtenida se vuelca en segundo plano a impresion_estaticas.yaml para depuración
+DEPURAR_RUTAS = os.environ.get("SDN_DEPURAR_RUTAS") == "1"
+_lock_depuracion = threading.Lock()
+
+# Reglas instaladas por cada sesión (código de usuario), para borrarlas solo a ellas al cerrar sesión
+registro_flujos = RegistroFlujos()
+
+# Estado deseado de las reglas, para no reenviar las que el controlador ya tiene
+tabla_flujos = TablaFlujos()
+
+# Tiempo de vida de las reglas en los switches (0 = sin límite, el valor por defecto). Con un límite, si la CLI
+# se cierra sin cerrar sesión el switch borra solo las reglas que dejaron de usarse; pero también vencen las
+# reglas (incluidas las de ARP) de una sesión abierta que estuvo inactiva, sin que registro_flujos lo sepa.
+IDLE_TIMEOUT = int(os.environ.get("SDN_IDLE_TIMEOUT", "0"))
+HARD_TIMEOUT = int(os.environ.get("SDN_HARD_TIMEOUT", "0"))
+
+# Reglas que admite la tabla de cada switch (0 = sin control) y fracción a partir de la cual se desalojan sesiones
+CAPACIDAD_SWITCH = int(os.environ.get("SDN_CAPACIDAD_SWITCH", "0"))
+UMBRAL_CAPACIDAD = 0.9
+
+def aplicar_tiempos_de_vida(reglas):
+    for regla in reglas:
+        if IDLE_TIMEOUT:
+            regla["idle_timeout"] = str(IDLE_TIMEOUT)
+        if HARD_TIMEOUT:
+            regla["hard_timeout"] = str(HARD_TIMEOUT)
+    return reglas
+
+def liberar_capacidad(ip_controlador, pendientes, sesion=None, mostrar=print):
     """
-    Inserta rutas estáticas en Floodlight según la información generada en 'impresion_estaticas.yaml'.
+    Si instalar las reglas pendientes deja algún switch por encima del umbral de capacidad, borra las reglas
+    de las sesiones con más tiempo sin actividad que tengan reglas en ese switch (nunca las de la sesión actual).
+
+    Returns:
+        list: Sesiones desalojadas.
+    """
+    if not CAPACIDAD_SWITCH:
+        return []
+    limite = int(CAPACIDAD_SWITCH * UMBRAL_CAPACIDAD)
+    desalojadas = []
+    for candidata in registro_flujos.sesiones_por_antiguedad():
+        # Una regla pendiente que reemplaza a una ya confirmada con el mismo nombre no ocupa otra entrada
+        nuevas = Counter(regla['switch'] for regla in pendientes
+                         if tabla_flujos.switch_de(regla['name']) != regla['switch'])
+        conteo = tabla_flujos.reglas_por_switch()
+        llenos = {switch for switch, cantidad in nuevas.items() if conteo[switch] + cantidad > limite}
+        if not llenos:
+            break
+        if candidata == sesion:
+            continue
+        if any(tabla_flujos.switch_de(nombre) in llenos for nombre in registro_flujos.reglas_de(candidata)):
+            borrar_rutas(ip_controlador, candidata, silencioso=True)
+            desalojadas.append(candidata)
+    if desalojadas:
+        mostrar(Fore.YELLOW + f"Tablas de flujo casi llenas: se liberaron las reglas de {len(desalojadas)} sesión(es) inactiva(s).")
+    return desalojadas
+
+def crear_ruta(ip_controlador, rutas, sesion=None, silencioso=False, hosts=None, por_pareja=False):
+    """
+    Inserta rutas estáticas en Floodlight a partir de la lista de saltos devuelta por get_route.
     Incluye reglas de ARP para todos los switches involucrados, eliminando reglas redundantes.
+    Si se indica la sesión, las reglas insertadas quedan registradas a su nombre.
+    Con silencioso=True no se imprime nada (para las instalaciones en segundo plano).
     """
-    ruta_archivo = os.path.join(os.path.dirname(__file__), "impresion_estaticas.yaml")
-    
-    # Leer la ruta desde el archivo impresion_estaticas.yaml
-    try:
-        with open(ruta_archivo, 'r', encoding="utf-8") as archivo:
-            rutas = yaml.safe_load(archivo)
-    except FileNotFoundError:
-        print(Fore.RED + f"Error: No se encontró el archivo {ruta_archivo}.")
-        return
-    except yaml.YAMLError as e:
-        print(Fore.RED + f"Error al leer el archivo YAML: {e}")
-        return
+    mostrar = (lambda *args: None) if silencioso else print
 
     # Verificar si las rutas están definidas
     if not rutas:
-        print(Fore.RED + "Error: No hay rutas definidas en impresion_estaticas.yaml.")
+        mostrar(Fore.RED + "Error: No hay rutas definidas para crear las reglas.")
         return
 
-    # Construir las reglas
+    # Enviar solo las reglas que faltan o cambiaron, en paralelo por el pool de conexiones
+    reglas = aplicar_tiempos_de_vida(generar_reglas(rutas, hosts, por_pareja))
+    instaladas = obtener_flujos_instalados(ip_controlador, silencioso)
+    if instaladas is not None:
+        tabla_flujos.sincronizar(instaladas)
+    pendientes, ahorradas = tabla_flujos.reconciliar(reglas, instaladas)
+    liberar_capacidad(ip_controlador, pendientes, sesion, mostrar)
+    resultado = obtener_cliente(ip_controlador).insertar_reglas(pendientes)
+    exitosas = set(resultado['exitosas'])
+    tabla_flujos.confirmar([regla for regla in pendientes if regla['name'] in exitosas])
+    resultado['ahorradas'] = ahorradas
+
+    mostrar(Fore.GREEN + f"Reglas insertadas exitosamente: {len(resultado['exitosas'])} (ya instaladas: {len(ahorradas)})")
+    for nombre, error in resultado['fallidas']:
+        mostrar(Fore.RED + f"Error al insertar la regla {nombre}: {error}")
+    if sesion is not None:
+        registro_flujos.registrar(sesion, resultado['exitosas'] + ahorradas)
+    return resultado
+
+
+def obtener_flujos_instalados(ip_controlador, silencioso=False):
+    """
+    Retorna los nombres de las reglas estáticas presentes en el controlador, o None si no se pudo consultar.
+    Los errores van por reportar_error, salvo con silencioso=True (instalaciones en segundo plano).
+    """
+    mostrar = (lambda *args: None) if silencioso else reportar_error
+    try:
+        response = obtener_cliente(ip_controlador).get("/wm/staticflowpusher/list/all/json")
+        if response.status_code == 200:
+            return nombres_instalados(response.json())
+        mostrar(Fore.RED + f"Error al listar las reglas instaladas: {response.status_code}")
+    except Exception as e:
+        mostrar(Fore.RED + f"Excepción al listar las reglas instaladas: {e}")
+    return None
+
+
+def generar_reglas(rutas, hosts=None, por_pareja=False):
+    """
+    Construye las reglas de flujo (ida, retorno y ARP) para la lista de saltos devuelta por Floodlight.
+
+    Args:
+        rutas (list): Saltos devueltos por get_route.
+        hosts (dict): Opcional. {'origen': {'ip', 'mac'}, 'destino': {'ip', 'mac'}} del usuario y el servidor.
+        por_pareja (bool): Si es True (y hay hosts), las reglas también coinciden con las MAC de origen y destino,
+            para que usuarios en caminos distintos no compartan la misma regla por in_port (ver MULTIRUTA).
+    """
+    pareja = (hosts['origen']['mac'], hosts['destino']['mac']) if por_pareja and hosts else None
     reglas = []
-    for i in range(len(rutas) - 1):
+    # Los saltos vienen de a pares (entrada, salida) en el mismo switch; entre un par y el siguiente hay un
+    # enlace, y una regla ahí tendría el mismo in_port y prioridad que la del salto con otra salida
+    for i in range(0, len(rutas) - 1, 2):
         src_switch = rutas[i]["switch"]
         src_port = rutas[i]["port"]["portNumber"]
         dst_switch = rutas[i + 1]["switch"]
@@ -56,7 +170,7 @@ def crear_ruta(ip_controlador):
         # Evitar rutas redundantes (cuando in_port == out_port)
         if src_port != dst_port:
             # Regla para el flujo de ida
-            reglas.append({
+            ida = {
                 "switch": src_switch,
                 "name": f"flow-{src_switch}-{src_port}-to-{dst_port}",
                 "cookie": "0",
@@ -64,10 +178,10 @@ def crear_ruta(ip_controlador):
                 "in_port": src_port,
                 "active": "true",
                 "actions": f"output={dst_port}"
-            })
+            }
 
             # Regla para el flujo de retorno
-            reglas.append({
+            retorno = {
                 "switch": dst_switch,
                 "name": f"flow-{dst_switch}-{dst_port}-to-{src_port}",
                 "cookie": "0",
@@ -75,94 +189,390 @@ def crear_ruta(ip_controlador):
                 "in_port": dst_port,
                 "active": "true",
                 "actions": f"output={src_port}"
+            }
+
+            if pareja:
+                mac_origen, mac_destino = pareja
+                for regla, eth_src, eth_dst in ((ida, mac_origen, mac_destino), (retorno, mac_destino, mac_origen)):
+                    regla.update({"name": f"{regla['name']}-{eth_src}-{eth_dst}", "priority": "9050",
+                                  "eth_src": eth_src, "eth_dst": eth_dst})
+
+            reglas.extend((ida, retorno))
+
+    reglas.extend(generar_reglas_arp(rutas, hosts))
+    if QOS and hosts:
+        reglas.extend(generar_reglas_qos(rutas, hosts))
+    return reglas
+
+
+# Cómo se resuelve ARP entre el usuario y el servidor:
+#   "flood": una regla allow-arp-{switch} que inunda ARP por todos los puertos de cada switch de la ruta
+#   "ruta":  ARP se reenvía en unicast solo por los puertos de la ruta, en ambos sentidos, para la pareja de IP
+#            usuario-servidor (varias parejas pueden compartir un puerto); sin los datos de los extremos se usa "flood"
+#   "proxy": el switch de borde responde el ARP con la MAC de la base de datos (requiere OpenFlow 1.3);
+#            sin los datos de los extremos se usa "flood"
+MODO_ARP = os.environ.get("SDN_MODO_ARP", "ruta")
+PRIORIDAD_ARP = "9100"  # Por encima de las reglas por in_port, que también reenviarían el ARP
+
+def generar_reglas_arp(rutas, hosts=None, modo=None):
+    """
+    Construye las reglas de ARP para la ruta según MODO_ARP.
+
+    Args:
+        rutas (list): Saltos devueltos por get_route.
+        hosts (dict): Opcional. {'origen': {'ip', 'mac'}, 'destino': {'ip', 'mac'}} para los modos ruta y proxy.
+        modo (str): Opcional. Reemplaza a MODO_ARP.
+    """
+    modo = modo or MODO_ARP
+    reglas = []
+
+    if modo == "flood" or not hosts:
+        # Incluir reglas de ARP para todos los switches involucrados
+        for switch in set(ruta["switch"] for ruta in rutas):
+            reglas.append({
+                "switch": switch,
+                "name": f"allow-arp-{switch}",
+                "cookie": "0",
+                "priority": "9000",
+                "eth_type": "0x0806",
+                "active": "true",
+                "actions": "output=flood"
             })
+        return reglas
+
+    origen, destino = hosts['origen'], hosts['destino']
+    if modo == "proxy":
+        # Cada extremo recibe la respuesta en su switch de borde, por el mismo puerto por el que preguntó
+        bordes = ((rutas[0], origen, destino), (rutas[-1], destino, origen))
+        for salto, solicitante, objetivo in bordes:
+            switch, puerto = salto["switch"], salto["port"]["portNumber"]
+            reglas.append({
+                "switch": switch,
+                "name": f"arp-proxy-{switch}-{solicitante['ip']}-{objetivo['ip']}",
+                "cookie": "0",
+                "priority": PRIORIDAD_ARP,
+                "in_port": puerto,
+                "eth_type": "0x0806",
+                "arp_opcode": "1",
+                "arp_spa": solicitante['ip'],
+                "arp_tpa": objetivo['ip'],
+                "active": "true",
+                "actions": ",".join([
+                    f"set_field=eth_dst->{solicitante['mac']}",
+                    f"set_field=eth_src->{objetivo['mac']}",
+                    "set_field=arp_opcode->2",
+                    f"set_field=arp_tha->{solicitante['mac']}",
+                    f"set_field=arp_tpa->{solicitante['ip']}",
+                    f"set_field=arp_sha->{objetivo['mac']}",
+                    f"set_field=arp_spa->{objetivo['ip']}",
+                    "output=in_port",
+                ])
+            })
+        return reglas
+
+    # Unicast por la ruta: cada switch aparece como (puerto de entrada, puerto de salida), en sentido usuario -> servidor.
+    # Cada regla coincide también con las IP de la pareja, para que la de otro usuario que entra por el mismo
+    # puerto (p. ej. el del servidor) no la reemplace en el switch.
+    for i in range(0, len(rutas) - 1, 2):
+        switch = rutas[i]["switch"]
+        entrada, salida = rutas[i]["port"]["portNumber"], rutas[i + 1]["port"]["portNumber"]
+        if rutas[i + 1]["switch"] != switch or entrada == salida:
+            continue
+        sentidos = ((entrada, salida, origen['ip'], destino['ip']), (salida, entrada, destino['ip'], origen['ip']))
+        for puerto_entrada, puerto_salida, ip_emisor, ip_objetivo in sentidos:
+            reglas.append({
+                "switch": switch,
+                "name": f"arp-{switch}-{puerto_entrada}-to-{puerto_salida}-{ip_emisor}-{ip_objetivo}",
+                "cookie": "0",
+                "priority": PRIORIDAD_ARP,
+                "in_port": puerto_entrada,
+                "eth_type": "0x0806",
+                "arp_spa": ip_emisor,
+                "arp_tpa": ip_objetivo,
+                "active": "true",
+                "actions": f"output={puerto_salida}"
+            })
+    return reglas
 
-    # Incluir reglas de ARP para todos los switches involucrados
-    switches_involucrados = set(ruta["switch"] for ruta in rutas)
-    for switch in switches_involucrados:
-        reglas.append({
-            "switch": switch,
-            "name": f"allow-arp-{switch}",
-            "cookie": "0",
-            "priority": "9000",
-            "ether-type": "0x0806",
-            "active": "true",
-            "actions": "output=flood"
-        })
 
-    # Enviar las reglas a Floodlight
-    url = f"http://{ip_controlador}:8080/wm/staticflowpusher/json"
-    for regla in reglas:
-        try:
-            response = requests.post(url, json=regla)
-            if response.status_code == 200:
-                print(Fore.GREEN + f"Regla insertada exitosamente: {regla['name']}")
-            else:
-                print(Fore.RED + f"Error al insertar la regla {regla['name']}: {response.status_code}")
-        except Exception as e:
-            print(Fore.RED + f"Excepción al insertar la regla {regla['name']}: {e}")
+# Si es True, el tráfico de los servicios del curso va a una cola y prioridad según el rol del usuario
+# (los switches deben tener las colas configuradas, p. ej. con QoS de Open vSwitch)
+QOS = os.environ.get("SDN_QOS") == "1"
 
+# rol -> servicio -> cola y prioridad de las reglas. Se puede reemplazar con qos.yaml en la carpeta de datos.
+POLITICA_QOS = {
+    'Profesor': {'ssh': {'cola': 0, 'prioridad': 9400}, 'web': {'cola': 1, 'prioridad': 9250}},
+    'Administrador': {'ssh': {'cola': 0, 'prioridad': 9400}, 'web': {'cola': 1, 'prioridad': 9250}},
+    'Estudiante': {'ssh': {'cola': 1, 'prioridad': 9300}, 'web': {'cola': 2, 'prioridad': 9200}},
+}
 
+# Puertos TCP de cada servicio, salvo que el servidor indique otro para su servicio principal
+PUERTOS_SERVICIO = {'ssh': [22], 'web': [80, 443]}
 
+_politica_qos = None
 
-def get_route(ip_controlador, src_dpid, src_port, dst_dpid, dst_port):
+def politica_qos():
+    global _politica_qos
+    if _politica_qos is None:
+        archivo = ruta_datos("qos.yaml")
+        _politica_qos = (cargar_yaml(archivo) if os.path.exists(archivo) else None) or POLITICA_QOS
+    return _politica_qos
+
+def generar_reglas_qos(rutas, hosts):
     """
-    Llama a la API REST de Floodlight para obtener la ruta entre los puntos fuente y destino.
-    Guarda el resultado en 'impresion_estaticas.yaml' y luego construye las rutas estáticas automáticamente.
+    Construye reglas TCP por cada servicio permitido del curso que envían el tráfico a la cola
+    (enqueue=puerto:cola) y con la prioridad que la política asigna al rol del usuario.
+    Coinciden con las IP del usuario y del servidor, así que usuarios de distinto rol no comparten reglas.
+
+    Args:
+        rutas (list): Saltos devueltos por get_route.
+        hosts (dict): {'origen': {'ip', 'rol'}, 'destino': {'ip', 'servicios', 'servicio', 'puerto'}}.
+    """
+    origen, destino = hosts['origen'], hosts['destino']
+    politicas_rol = politica_qos().get(origen.get('rol'), {})
+    reglas = []
+    for servicio in destino.get('servicios') or []:
+        politica = politicas_rol.get(servicio)
+        if not politica:
+            continue
+        if servicio == destino.get('servicio') and destino.get('puerto'):
+            puertos_tcp = [destino['puerto']]
+        else:
+            puertos_tcp = PUERTOS_SERVICIO.get(servicio, [])
+
+        for puerto_tcp in puertos_tcp:
+            for i in range(0, len(rutas) - 1, 2):
+                switch = rutas[i]["switch"]
+                entrada, salida = rutas[i]["port"]["portNumber"], rutas[i + 1]["port"]["portNumber"]
+                if rutas[i + 1]["switch"] != switch or entrada == salida:
+                    continue
+                sentidos = (
+                    (entrada, salida, {"ipv4_src": origen['ip'], "ipv4_dst": destino['ip'], "tcp_dst": str(puerto_tcp)}),
+                    (salida, entrada, {"ipv4_src": destino['ip'], "ipv4_dst": origen['ip'], "tcp_src": str(puerto_tcp)}),
+                )
+                for puerto_entrada, puerto_salida, campos in sentidos:
+                    reglas.append({
+                        "switch": switch,
+                        "name": f"qos-{switch}-{puerto_entrada}-to-{puerto_salida}-{origen['ip']}-{destino['ip']}-{puerto_tcp}",
+                        "cookie": "0",
+                        "priority": str(politica['prioridad']),
+                        "in_port": puerto_entrada,
+                        "eth_type": "0x0800",
+                        "ip_proto": "0x06",
+                        **campos,
+                        "active": "true",
+                        "actions": f"enqueue={puerto_salida}:{politica['cola']}"
+                    })
+    return reglas
+
+
+
+# Caches de rutas por controlador
+caches_rutas = {}
+
+# Mientras el login espera el correo y la contraseña, los errores del controlador que aparecen en segundo plano
+# se guardan aquí en lugar de imprimirse (ver ArranqueConcurrente)
+errores_diferidos = None
+_lock_errores = threading.Lock()
+
+def reportar_error(mensaje):
+    with _lock_errores:
+        if errores_diferidos is not None:
+            errores_diferidos.append(mensaje)
+            return
+    print(mensaje)
+
+def diferir_errores(errores):
+    """
+    Con una lista, los errores de reportar_error se acumulan en ella; con None se vuelven a imprimir.
+    """
+    global errores_diferidos
+    with _lock_errores:
+        errores_diferidos = errores
+
+def obtener_enlaces(ip_controlador):
+    """
+    Retorna la lista de enlaces del controlador, o None si no se pudo consultar.
     """
-    url = f"http://{ip_controlador}:8080/wm/topology/route/{src_dpid}/{src_port}/{dst_dpid}/{dst_port}/json"
     try:
-        response = requests.get(url)
+        response = obtener_cliente(ip_controlador).get("/wm/topology/links/json")
         if response.status_code == 200:
-            ruta = response.json()
-            print(Fore.GREEN + "Ruta obtenida exitosamente.")
+            return response.json()
+        reportar_error(Fore.RED + f"Error al obtener los enlaces: {response.status_code}")
+    except Exception as e:
+        reportar_error(Fore.RED + f"Excepción al obtener los enlaces: {e}")
+    return None
 
-            # Guardar la ruta en impresion_estaticas.yaml
-            ruta_archivo = os.path.join(os.path.dirname(__file__), "impresion_estaticas.yaml")
-            with open(ruta_archivo, 'w', encoding="utf-8") as archivo:
-                yaml.dump(ruta, archivo, default_flow_style=False, allow_unicode=True)
-            print(Fore.GREEN + f"Ruta guardada en {ruta_archivo}.")
+def obtener_cache_rutas(ip_controlador):
+    cache = caches_rutas.get(ip_controlador)
+    if cache is None:
+        cache = CacheRutas(lambda: obtener_enlaces(ip_controlador))
+        caches_rutas[ip_controlador] = cache
+    return cache
 
-            # Llamar a crear_ruta para construir las rutas estáticas automáticamente
-            crear_ruta(ip_controlador)
+# Si es True, las rutas se calculan localmente sobre el grafo del controlador (ver moduloFloodlight.MotorRutas)
+RUTAS_LOCALES = os.environ.get("SDN_RUTAS_LOCALES", "1") != "0"
 
-        else:
-            print(Fore.RED + f"Error al obtener la ruta: {response.status_code}")
+# Motores de rutas locales por controlador
+motores_rutas = {}
+
+def obtener_switches(ip_controlador):
+    """
+    Retorna la lista de switches conectados al controlador, o None si no se pudo consultar.
+    """
+    try:
+        response = obtener_cliente(ip_controlador).get("/wm/core/controller/switches/json")
+        if response.status_code == 200:
+            return response.json()
+        reportar_error(Fore.RED + f"Error al obtener los switches: {response.status_code}")
     except Exception as e:
-        print(Fore.RED + f"Excepción al obtener la ruta: {e}")
+        reportar_error(Fore.RED + f"Excepción al obtener los switches: {e}")
+    return None
+
+# Caminos de igual costo entre los que se reparten las sesiones hacia un mismo servidor (1 = un solo camino).
+# Necesita RUTAS_LOCALES y los datos de los hosts; las reglas pasan a coincidir también con las MAC.
+MULTIRUTA = int(os.environ.get("SDN_MULTIRUTA", "1"))
+
+# Sesiones por camino cuando MULTIRUTA > 1
+reparto_rutas = RepartoRutas()
+
+# Última ruta instalada por cada sesión hacia cada servidor, para reencaminar cuando el usuario se mueve
+rutas_sesion = RutasPorSesion()
+
+def obtener_motor_rutas(ip_controlador):
+    motor = motores_rutas.get(ip_controlador)
+    if motor is None:
+        motor = MotorRutas(lambda: obtener_enlaces(ip_controlador), lambda: obtener_switches(ip_controlador))
+        motores_rutas[ip_controlador] = motor
+    return motor
+
+def precalcular_rutas_servidores(ip_controlador, rutas):
+    """
+    Descarga la topología y precalcula el árbol de caminos hacia el switch de cada servidor de rutas.yaml.
+    """
+    if not RUTAS_LOCALES:
+        return
+    raices = [ap['switchDPID'] for servidor in rutas['servidores'] for ap in servidor.get('attachmentPoint') or []]
+    obtener_motor_rutas(ip_controlador).precalcular(raices)
+
+def calcular_ruta(ip_controlador, src_dpid, src_port, dst_dpid, dst_port, hosts=None, mostrar=print):
+    """
+    Retorna la lista de saltos entre los puntos fuente y destino, o None si no se pudo obtener.
+    Con RUTAS_LOCALES se calcula sobre el grafo del controlador; si no hay camino conocido se consulta
+    la API REST de Floodlight, salvo que la ruta ya esté en la cache (y la topología no haya cambiado).
+    Con MULTIRUTA > 1 se elige uno de los caminos de igual costo según la MAC del usuario (hosts['origen']).
+    """
+    clave = (src_dpid, src_port, dst_dpid, dst_port)
+    if usa_multiruta(hosts):
+        caminos = obtener_motor_rutas(ip_controlador).rutas_equivalentes(*clave, MULTIRUTA)
+        if caminos:
+            mostrar(Fore.GREEN + f"Ruta calculada localmente ({len(caminos)} caminos de igual costo).")
+            return RepartoRutas.elegir(caminos, hosts['origen']['mac'])
+    elif RUTAS_LOCALES:
+        ruta = obtener_motor_rutas(ip_controlador).ruta(*clave)
+        if ruta is not None:
+            mostrar(Fore.GREEN + "Ruta calculada localmente.")
+            return ruta
+
+    cache = obtener_cache_rutas(ip_controlador)
+    ruta = cache.obtener(clave)
+    if ruta is not None:
+        mostrar(Fore.GREEN + "Ruta obtenida de la cache.")
+        return ruta
+    response = obtener_cliente(ip_controlador).get(f"/wm/topology/route/{src_dpid}/{src_port}/{dst_dpid}/{dst_port}/json")
+    if response.status_code != 200:
+        mostrar(Fore.RED + f"Error al obtener la ruta: {response.status_code}")
+        return None
+    ruta = response.json()
+    cache.guardar(clave, ruta)
+    mostrar(Fore.GREEN + "Ruta obtenida exitosamente.")
+    return ruta
+
+
+def usa_multiruta(hosts):
+    return RUTAS_LOCALES and MULTIRUTA > 1 and hosts is not None
+
+
+def get_route(ip_controlador, src_dpid, src_port, dst_dpid, dst_port, sesion=None, silencioso=False,
+              hosts=None, usuario=None):
+    """
+    Obtiene la ruta entre los puntos fuente y destino (ver calcular_ruta) y la pasa en memoria a crear_ruta,
+    que construye las rutas estáticas automáticamente. Si se indica la sesión, la ruta queda registrada
+    en rutas_sesion a nombre del usuario (su código) para poder reencaminarla si cambia de attachment point.
+    """
+    mostrar = (lambda *args: None) if silencioso else print
+    multiruta = usa_multiruta(hosts)
+    try:
+        ruta = calcular_ruta(ip_controlador, src_dpid, src_port, dst_dpid, dst_port, hosts, mostrar)
+        if ruta is None:
+            return
+        if multiruta:
+            reparto_rutas.asignar(sesion, ruta)
+
+        # Volcar la ruta a impresion_estaticas.yaml solo si se pidió depuración
+        if DEPURAR_RUTAS:
+            threading.Thread(target=volcar_ruta_depuracion, args=(ruta,), daemon=True).start()
+
+        # Llamar a crear_ruta para construir las rutas estáticas automáticamente
+        resultado = crear_ruta(ip_controlador, ruta, sesion, silencioso, hosts, por_pareja=multiruta)
+        if sesion is not None and resultado and not resultado['fallidas']:
+            rutas_sesion.guardar(sesion, usuario, (src_dpid, src_port, dst_dpid, dst_port), ruta, hosts, multiruta,
+                                 resultado['exitosas'] + resultado['ahorradas'])
+        return resultado
+
+    except Exception as e:
+        mostrar(Fore.RED + f"Excepción al obtener la ruta: {e}")
+
+
+def volcar_ruta_depuracion(ruta):
+    """
+    Escribe la ruta en impresion_estaticas.yaml (archivo temporal + rename) sin bloquear el acceso al curso.
+    """
+    ruta_archivo = ruta_datos("impresion_estaticas.yaml")
+    temporal = f"{ruta_archivo}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        with _lock_depuracion:
+            with open(temporal, 'w', encoding="utf-8") as archivo:
+                yaml.dump(ruta, archivo, default_flow_style=False, allow_unicode=True)
+            os.replace(temporal, ruta_archivo)
+    except (OSError, yaml.YAMLError) as e:
+        reportar_error(Fore.RED + f"No se pudo volcar la ruta de depuración: {e}")
 
 
 # Función para obtener los dispositivos conectados
 def obtener_dispositivos(ip_controlador):
-    url = f"http://{ip_controlador}:8080/wm/device/"
     try:
-        response = requests.get(url)
+        response = obtener_cliente(ip_controlador).get("/wm/device/")
         if response.status_code == 200:
             return response.json()
         else:
-            print(f"Error al obtener dispositivos: {response.status_code}")
+            reportar_error(f"Error al obtener dispositivos: {response.status_code}")
             return []
     except Exception as e:
-        print(f"Excepción al obtener dispositivos: {e}")
+        reportar_error(f"Excepción al obtener dispositivos: {e}")
         return []
 
-def actualizar_attachment_points_servidores(ip_controlador, rutas, servidores):
-    dispositivos = obtener_dispositivos(ip_controlador)
-    # Mapear servidores por su MAC
-    macs_servidores = {servidor['mac']: servidor for servidor in servidores}
+# Snapshots de /wm/device/ compartidos por los actualizadores, uno por controlador
+snapshots_dispositivos = {}
+
+def obtener_snapshot_dispositivos(ip_controlador):
+    """
+    Retorna el snapshot MAC -> attachmentPoint del controlador. Solo se descarga de nuevo
+    la lista de dispositivos cuando el snapshot supera su ventana de vigencia.
+    """
+    snapshot = snapshots_dispositivos.get(ip_controlador)
+    if snapshot is None:
+        snapshot = SnapshotDispositivos(lambda: obtener_dispositivos(ip_controlador))
+        snapshots_dispositivos[ip_controlador] = snapshot
+    return snapshot
+
+def actualizar_attachment_points_servidores(ip_controlador, rutas, servidores, lock=None):
+    snapshot = obtener_snapshot_dispositivos(ip_controlador)
     # Crear una lista de servidores con attachmentPoints actualizados
     servidores_actualizados = []
     for servidor in servidores:
-        mac = servidor['mac']
-        attachment_points = []
         # Buscar el dispositivo que coincida con la MAC del servidor
-        for dispositivo in dispositivos:
-            if dispositivo.get('mac', [None])[0] == mac:
-                attachment_points = [
-                    {'switchDPID': ap.get('switchDPID'), 'port': ap.get('port')}
-                    for ap in dispositivo.get('attachmentPoint', [])
-                ]
-                break
+        attachment_points = snapshot.attachment_points(servidor['mac'])
         # Agregar o actualizar el servidor en la lista de rutas
         servidores_actualizados.append({
             'codigo_servidor': servidor['codigo_servidor'],
@@ -172,32 +582,20 @@ def actualizar_attachment_points_servidores(ip_controlador, rutas, servidores):
         })
     # Reemplazar la lista de servidores en rutas.yaml
     rutas['servidores'] = servidores_actualizados
-    # Guardar los cambios en rutas.yaml
-    guardar_rutas(rutas)
+    # Guardar los cambios en rutas.yaml (lock: el que protege rutas, si otros hilos la modifican)
+    guardar_rutas(rutas, lock)
 
 
 # Función para actualizar attachment points en rutas.yaml
-def actualizar_attachment_points_usuarios(ip_controlador, rutas, usuarios):
-    dispositivos = obtener_dispositivos(ip_controlador)
-
-    # Mapear usuarios por su MAC
-    macs_usuarios = {usuario['mac']: usuario for usuario in usuarios}
+def actualizar_attachment_points_usuarios(ip_controlador, rutas, usuarios, lock=None):
+    snapshot = obtener_snapshot_dispositivos(ip_controlador)
 
     # Crear una lista de usuarios con attachmentPoints actualizados
     usuarios_actualizados = []
 
     for usuario in usuarios:
-        mac = usuario['mac']
-        attachment_points = []
-
         # Buscar el dispositivo que coincida con la MAC del usuario
-        for dispositivo in dispositivos:
-            if dispositivo.get('mac', [None])[0] == mac:
-                attachment_points = [
-                    {'switchDPID': ap.get('switchDPID'), 'port': ap.get('port')}
-                    for ap in dispositivo.get('attachmentPoint', [])
-                ]
-                break
+        attachment_points = snapshot.attachment_points(usuario['mac'])
 
         # Agregar o actualizar el usuario en la lista de rutas
         usuarios_actualizados.append({
@@ -209,18 +607,183 @@ def actualizar_attachment_points_usuarios(ip_controlador, rutas, usuarios):
     # Reemplazar la lista de usuarios en rutas.yaml
     rutas['usuarios'] = usuarios_actualizados
 
-    # Guardar los cambios en rutas.yaml
-    guardar_rutas(rutas)
+    # Guardar los cambios en rutas.yaml (lock: el que protege rutas, si otros hilos la modifican)
+    guardar_rutas(rutas, lock)
+
+
+#SEGUIMIENTO DE ATTACHMENT POINTS ********************************************************************************************************************
+#
+# En lugar de actualizar todos los usuarios y servidores antes del login, un hilo consulta periódicamente la tabla
+# de dispositivos del controlador y aplica a rutas (en memoria) solo las MAC nuevas, movidas o desaparecidas.
+# Se pide una escritura de rutas.yaml por ciclo, y solo si algo cambió (ver AlmacenRutas).
 
+INTERVALO_ATTACHMENT = float(os.environ.get("SDN_INTERVALO_ATTACHMENT", "10"))  # Segundos entre consultas
 
-def borrar_rutas(ip_controlador):
+
+class SeguidorAttachmentPoints:
     """
-    Borra todas las rutas estáticas configuradas en el controlador Floodlight.
+    Mantiene al día los attachment points de rutas a partir de /wm/device/ en un hilo en segundo plano.
+    Los demás hilos deben modificar rutas con 'lock' tomado; los cambios que hagan se escriben en el
+    siguiente ciclo si llaman a marcar_cambios().
     """
-    url = f"http://{ip_controlador}:8080/wm/staticflowpusher/clear/all/json"
+
+    def __init__(self, ip_controlador, rutas, db, intervalo=INTERVALO_ATTACHMENT):
+        self.ip_controlador = ip_controlador
+        self.rutas = rutas
+        self.db = db
+        self.intervalo = intervalo
+        self.lock = threading.Lock()
+        self.mapa = {}             # MAC -> attachment points de la última consulta
+        self.sondeos = 0
+        self.escrituras = 0
+        self.ultimos_cambios = {'nuevas': 0, 'movidas': 0, 'quitadas': 0}
+        self._pendiente = False    # rutas tiene cambios sin escribir
+        self._primera_lectura = threading.Event()
+        self._detener = threading.Event()
+        self._hilo = None
+
+    def iniciar(self):
+        self._hilo = threading.Thread(target=self._ciclo, name="seguidor-attachment", daemon=True)
+        self._hilo.start()
+        return self
+
+    def detener(self):
+        self._detener.set()
+        if self._hilo is not None:
+            self._hilo.join()
+        self.escribir()
+        almacen_rutas.vaciar()
+
+    def esperar_primera_lectura(self, timeout=None):
+        return self._primera_lectura.wait(timeout)
+
+    def marcar_cambios(self):
+        with self.lock:
+            self._pendiente = True
+
+    def _ciclo(self):
+        while True:
+            try:
+                self.sondear()
+            except Exception as e:
+                reportar_error(Fore.RED + f"Excepción al actualizar los attachment points: {e}")
+            finally:
+                self._primera_lectura.set()
+            if self._detener.wait(self.intervalo):
+                return
+
+    def _entradas_por_mac(self):
+        """
+        Retorna MAC -> [(lista de rutas, clave, entrada de la base de datos)] para usuarios y servidores.
+        """
+        entradas = {}
+        for usuario in self.db['usuarios']:
+            entradas.setdefault(usuario['mac'], []).append(('usuarios', 'codigo', usuario))
+        for servidor in self.db['servidores']:
+            entradas.setdefault(servidor['mac'], []).append(('servidores', 'codigo_servidor', servidor))
+        return entradas
+
+    def _entrada_rutas(self, lista, clave, registro):
+        for entrada in self.rutas[lista]:
+            if entrada[clave] == registro[clave]:
+                return entrada
+        entrada = {clave: registro[clave], 'nombre': registro['nombre'], 'attachmentPoint': []}
+        if lista == 'servidores':
+            entrada['ip'] = registro['ip']
+        self.rutas[lista].append(entrada)
+        return entrada
+
+    def sondear(self):
+        """
+        Descarga la tabla de dispositivos, aplica las diferencias con la consulta anterior y escribe rutas.yaml
+        si hubo cambios. En la primera consulta se revisan todos los usuarios y servidores.
+
+        Returns:
+            dict: {'nuevas', 'movidas', 'quitadas'} con la cantidad de MAC de cada tipo.
+        """
+        snapshot = obtener_snapshot_dispositivos(self.ip_controlador)
+        if self.sondeos:
+            snapshot.invalidar()  # En la primera consulta se aprovecha el snapshot vigente, si lo hay
+        actual = snapshot.mapa()
+        entradas = self._entradas_por_mac()
+
+        if not self.sondeos:
+            cambiadas = set(entradas)
+        else:
+            cambiadas = {mac for mac in actual.keys() | self.mapa.keys() if actual.get(mac) != self.mapa.get(mac)}
+        cambios = {'nuevas': 0, 'movidas': 0, 'quitadas': 0}
+        movimientos = []
+        servidores_movidos = False
+
+        with self.lock:
+            for mac in cambiadas & entradas.keys():
+                attachment_points = [dict(ap) for ap in actual.get(mac, [])]
+                for lista, clave, registro in entradas[mac]:
+                    entrada = self._entrada_rutas(lista, clave, registro)
+                    anteriores = entrada.get('attachmentPoint') or []
+                    if anteriores == attachment_points:
+                        continue
+                    entrada['attachmentPoint'] = attachment_points
+                    self._pendiente = True
+                    if not attachment_points:
+                        cambios['quitadas'] += 1
+                    elif not anteriores:
+                        cambios['nuevas'] += 1
+                    else:
+                        cambios['movidas'] += 1
+                        if lista == 'usuarios' and not mismo_attachment_point(anteriores[0], attachment_points[0]):
+                            movimientos.append((registro['codigo'], anteriores[0], attachment_points[0]))
+                    servidores_movidos = servidores_movidos or lista == 'servidores'
+            self.mapa = actual
+
+        # Las rutas de las sesiones del usuario que se movió se reencaminan (ver reencaminar_attachment_point)
+        for codigo, anterior, nuevo in movimientos:
+            reencaminar_attachment_point(self.ip_controlador, anterior, nuevo, codigo, silencioso=True)
+        if servidores_movidos or not self.sondeos:
+            precalcular_rutas_servidores(self.ip_controlador, self.rutas)
+
+        self.escribir()
+        self.sondeos += 1
+        self.ultimos_cambios = cambios
+        self._primera_lectura.set()
+        return cambios
+
+    def escribir(self):
+        """
+        Escribe rutas.yaml si tiene cambios pendientes (todos los cambios desde la última escritura van juntos).
+        """
+        with self.lock:
+            if not self._pendiente:
+                return False
+            self._pendiente = False
+            if not guardar_rutas(self.rutas):
+                return False
+            self.escrituras += 1
+            return True
+
+
+def borrar_rutas(ip_controlador, sesion=None, silencioso=False):
+    """
+    Borra las rutas estáticas de la sesión indicada, conservando las reglas que otras sesiones
+    siguen usando. Sin sesión, borra todas las rutas estáticas del controlador Floodlight.
+    """
+    if sesion is not None:
+        mostrar = (lambda *args: None) if silencioso else print
+        reparto_rutas.liberar(sesion)
+        rutas_sesion.olvidar(sesion)
+        nombres = registro_flujos.liberar(sesion)
+        resultado = obtener_cliente(ip_controlador).borrar_reglas(nombres)
+        tabla_flujos.olvidar(resultado['exitosas'])
+        for nombre, error in resultado['fallidas']:
+            mostrar(Fore.RED + f"Error al borrar la regla {nombre}: {error}")
+        if not resultado['fallidas']:
+            mostrar(Fore.GREEN + "Cerrado sesión exitoso")
+        return resultado
+
     try:
-        response = requests.get(url)
+        response = obtener_cliente(ip_controlador).get("/wm/staticflowpusher/clear/all/json")
         if response.status_code == 200:
+            tabla_flujos.vaciar()
             print(Fore.GREEN + "Cerrado sesión exitoso")
         else:
             print(Fore.RED + f"Error al borrar las rutas: {response.status_code}")
@@ -228,124 +791,216 @@ def borrar_rutas(ip_controlador):
         print(Fore.RED + f"Excepción al intentar borrar las rutas: {e}")
    
 
-def actualizar_attachment_point_usuario_logueado(ip_controlador, rutas, usuario_logueado):
-    dispositivos = obtener_dispositivos(ip_controlador)
-    mac = usuario_logueado['mac']
-    attachment_points = []
+#REENCAMINAMIENTO ************************************************************************************************************************************
+
+def reencaminar_ruta(ip_controlador, sesion, registro, src_dpid, src_port, silencioso=False):
+    """
+    Mueve una ruta instalada de la sesión a un nuevo attachment point del usuario enviando y borrando
+    solo las reglas de los saltos que cambiaron. Primero se instalan las reglas nuevas y recién cuando
+    todas quedaron instaladas se borran las del camino anterior (make-before-break), así la sesión no se corta.
 
+    Returns:
+        dict: {'nuevas', 'borradas', 'conservadas', 'fallidas'} o None si no se pudo calcular la ruta nueva.
+    """
+    mostrar = (lambda *args: None) if silencioso else print
+    _, _, dst_dpid, dst_port = registro['extremos']
+    hosts, por_pareja = registro['hosts'], registro['por_pareja']
+    ruta = calcular_ruta(ip_controlador, src_dpid, src_port, dst_dpid, dst_port, hosts, mostrar)
+    if ruta is None:
+        return None
+
+    # Make: crear_ruta ya omite las reglas que siguen instaladas (los saltos compartidos con el camino anterior)
+    resultado = crear_ruta(ip_controlador, ruta, sesion, silencioso, hosts, por_pareja)
+    if resultado is None:
+        return None
+    if resultado['fallidas']:
+        # El camino anterior queda intacto; las reglas nuevas que sí entraron se limpian al cerrar sesión
+        mostrar(Fore.RED + "No se pudo instalar el camino nuevo completo; se mantiene el anterior.")
+        return {'nuevas': resultado['exitosas'], 'borradas': [], 'conservadas': resultado['ahorradas'],
+                'fallidas': resultado['fallidas']}
+
+    if por_pareja:
+        reparto_rutas.quitar(sesion, registro['ruta'])
+        reparto_rutas.asignar(sesion, ruta)
+    vigentes = set(resultado['exitosas']) | set(resultado['ahorradas'])
+    rutas_sesion.guardar(sesion, registro['usuario'], (src_dpid, src_port, dst_dpid, dst_port), ruta, hosts,
+                         por_pareja, vigentes)
+
+    # Break: borrar las reglas del camino anterior que ya no usa ninguna ruta de la sesión (otra ruta que salía
+    # del mismo puerto puede no haberse movido todavía) ni ninguna otra sesión
+    en_uso = vigentes | rutas_sesion.reglas_de(sesion, excepto=(dst_dpid, dst_port))
+    liberadas = registro_flujos.quitar(sesion, registro['reglas'] - en_uso)
+    borrado = obtener_cliente(ip_controlador).borrar_reglas(liberadas)
+    tabla_flujos.olvidar(borrado['exitosas'])
+    for nombre, error in borrado['fallidas']:
+        mostrar(Fore.RED + f"Error al borrar la regla {nombre}: {error}")
+    return {'nuevas': resultado['exitosas'], 'borradas': borrado['exitosas'],
+            'conservadas': resultado['ahorradas'], 'fallidas': borrado['fallidas']}
+
+
+def reencaminar_attachment_point(ip_controlador, anterior, nuevo, usuario, silencioso=False):
+    """
+    Reencamina las rutas instaladas del usuario (su código) que salen del attachment point 'anterior'
+    hacia 'nuevo' (ambos {'switchDPID', 'port'}); las de otros usuarios en el mismo puerto no se tocan.
+    Retorna la lista de resultados de reencaminar_ruta.
+    """
+    mostrar = (lambda *args: None) if silencioso else print
+    resultados = []
+    for sesion, registro in rutas_sesion.desde(anterior['switchDPID'], anterior['port'], usuario):
+        resultado = reencaminar_ruta(ip_controlador, sesion, registro, nuevo['switchDPID'], nuevo['port'], silencioso)
+        if resultado is not None:
+            mostrar(Fore.GREEN + f"Ruta reencaminada: {len(resultado['nuevas'])} reglas nuevas, "
+                                 f"{len(resultado['borradas'])} borradas, {len(resultado['conservadas'])} conservadas.")
+        resultados.append(resultado)
+    return resultados
+
+
+def mismo_attachment_point(a, b):
+    return (a['switchDPID'], a['port']) == (b['switchDPID'], b['port'])
+
+
+def actualizar_attachment_point_usuario_logueado(ip_controlador, rutas, usuario_logueado, guardar=True, lock=None,
+                                                 silencioso=False):
+    """
+    Actualiza en rutas.yaml el attachment point del usuario logueado. Si cambió de switch o de puerto,
+    las rutas que sus sesiones tenían instaladas se reencaminan al nuevo attachment point.
+    Con guardar=False solo se modifica rutas en memoria (la escritura queda a cargo de SeguidorAttachmentPoints).
+    lock es el que protege rutas si otros hilos la modifican: solo se toma para cambiar la entrada del usuario,
+    no mientras se consulta el controlador ni mientras se reencamina. Retorna el attachment point actual.
+    """
+    mostrar = (lambda *args: None) if silencioso else print
     # Buscar el dispositivo conectado correspondiente a la MAC del usuario logueado
-    for dispositivo in dispositivos:
-        if dispositivo.get('mac', [None])[0] == mac:
-            attachment_points = [
-                {'switchDPID': ap.get('switchDPID'), 'port': ap.get('port')}
-                for ap in dispositivo.get('attachmentPoint', [])
-            ]
-            break
+    attachment_points = obtener_snapshot_dispositivos(ip_controlador).attachment_points(usuario_logueado['mac'])
 
     # Actualizar el usuario en rutas.yaml
-    for usuario in rutas['usuarios']:
-        if usuario['codigo'] == usuario_logueado['codigo']:
-            usuario['attachmentPoint'] = attachment_points
-            break
-    else:
-        # Si el usuario no está en rutas.yaml, lo agregamos
-        rutas['usuarios'].append({
-            'codigo': usuario_logueado['codigo'],
-            'nombre': usuario_logueado['nombre'],
-            'attachmentPoint': attachment_points
-        })
+    anterior = None
+    with lock or nullcontext():
+        for usuario in rutas['usuarios']:
+            if usuario['codigo'] == usuario_logueado['codigo']:
+                anteriores = usuario.get('attachmentPoint') or []
+                usuario['attachmentPoint'] = attachment_points
+                if anteriores and attachment_points and not mismo_attachment_point(anteriores[0], attachment_points[0]):
+                    anterior = anteriores[0]
+                break
+        else:
+            # Si el usuario no está en rutas.yaml, lo agregamos
+            rutas['usuarios'].append({
+                'codigo': usuario_logueado['codigo'],
+                'nombre': usuario_logueado['nombre'],
+                'attachmentPoint': attachment_points
+            })
+
+    if anterior is not None:
+        reencaminar_attachment_point(ip_controlador, anterior, attachment_points[0], usuario_logueado['codigo'],
+                                     silencioso)
 
     # Guardar los cambios en rutas.yaml
-    guardar_rutas(rutas)
-    print(f"Attachment point del usuario {usuario_logueado['nombre']} actualizado en rutas.yaml.")
+    if guardar:
+        guardar_rutas(rutas, lock)
+    mostrar(f"Attachment point del usuario {usuario_logueado['nombre']} actualizado en rutas.yaml.")
+    return attachment_points
 
 
 
-def validar_usuario_curso(usuario_logueado, curso):
+def validar_usuario_curso(usuario_logueado, curso, repositorio=None):
     """
     Valida si el usuario tiene acceso al curso.
     
     Args:
         usuario_logueado (dict): Información del usuario logueado.
         curso (dict): Información del curso seleccionado.
+        repositorio (RepositorioDB): Repositorio con las inscripciones; por defecto, el de la CLI.
     
     Returns:
         bool: True si el usuario tiene acceso, False si no lo tiene.
     """
+    if tiene_acceso_curso(usuario_logueado, curso, repositorio):
+        return True
+
+    print(f"El usuario {usuario_logueado['nombre']} ({usuario_logueado['rol']}) no tiene acceso al curso {curso['nombre']}.")
+    return False
+
+def tiene_acceso_curso(usuario_logueado, curso, repositorio=None):
+    """
+    Igual que validar_usuario_curso pero sin imprimir nada (para listados y el modo servicio).
+    """
+    repositorio = repositorio or repo
     if usuario_logueado['rol'] == 'Administrador':
         return True  # Los administradores tienen acceso a todos los cursos
 
     if usuario_logueado['rol'] == 'Profesor' and usuario_logueado['codigo'] == curso['profesor']:
         return True  # Los profesores tienen acceso a sus cursos
 
-    if usuario_logueado['rol'] == 'Estudiante' and usuario_logueado['codigo'] in curso['alumnos']:
+    if usuario_logueado['rol'] == 'Estudiante' and repositorio.esta_inscrito(usuario_logueado['codigo'], curso['codigo_curso']):
         return True  # Los estudiantes tienen acceso solo a los cursos en los que están inscritos
 
-    print(f"El usuario {usuario_logueado['nombre']} ({usuario_logueado['rol']}) no tiene acceso al curso {curso['nombre']}.")
     return False
 
 import time  # Importar para usar un temporizador
 
-def validar_conectividad_desde_h1(ip_gateway, port, usuario_h1, contra_h1, ip_destino, curso, db):
+# Conexiones SSH autenticadas reutilizadas entre validaciones
+pool_ssh = PoolSSH()
+
+def validar_conectividad_desde_h1(ip_gateway, port, usuario_h1, contra_h1, ip_destino):
     """
     Valida la conectividad desde h1 mediante SSH y realiza un ping al destino.
-    Si la validación es exitosa, procede a mostrar la información del curso.
+    La conexión SSH se toma del pool, así que solo la primera validación paga el handshake.
+
+    Returns:
+        tuple: (True si el ping fue exitoso, salida del comando o mensaje de error)
     """
     try:
-        ssh_client = paramiko.SSHClient()
-        ssh_client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
-        ssh_client.connect(ip_gateway, port=port, username=usuario_h1, password=contra_h1)
-        print(Fore.GREEN + "Conexión SSH a h1 establecida.")
-
-        # Preguntar si se desea continuar con el ping
-        validacion_ping_propia = input(Fore.YELLOW + "¿Desea continuar con el ping o probar ping fallido (SI/NO)? ").strip().upper()
-
-        if validacion_ping_propia == "NO":
-            print(Fore.YELLOW + "Deteniéndose antes de realizar el ping. Borrando las rutas creadas para demostrar que pasa si no hay ping")
-            time.sleep(5)
-            borrar_rutas(ip_gateway)
-            return False
-
         # Realizar un ping desde h1 al servidor destino
         comando_ping = f"ping -c 1 {ip_destino}"
-        stdin, stdout, stderr = ssh_client.exec_command(comando_ping)
-        output = stdout.read().decode('utf-8')
-        ssh_client.close()
+        output = pool_ssh.ejecutar(ip_gateway, port, usuario_h1, contra_h1, comando_ping)
 
         if "1 packets transmitted, 1 received" in output:
             print(Fore.GREEN + f"Ping exitoso al destino {ip_destino}.")
-            mostrar_info_curso(curso, db)
-            return True
+            return True, output
         else:
             print(Fore.RED + f"Ping fallido al destino {ip_destino}: {output}")
-            return False
+            return False, output
 
-    except paramiko.SSHException as e:
+    except (paramiko.SSHException, OSError) as e:
         print(Fore.RED + f"Error al conectarse a h1: {e}")
+        return False, str(e)
+
+def confirmar_ping():
+    """
+    Pregunta en la CLI si se continúa con el ping. Responder NO sirve para demostrar qué pasa sin rutas.
+    """
+    validacion_ping_propia = input(Fore.YELLOW + "¿Desea continuar con el ping o probar ping fallido (SI/NO)? ").strip().upper()
+
+    if validacion_ping_propia == "NO":
+        print(Fore.YELLOW + "Deteniéndose antes de realizar el ping. Borrando las rutas creadas para demostrar que pasa si no hay ping")
+        time.sleep(5)
         return False
+    return True
 
 
 
 # Función para guardar las rutas actualizadas
-def guardar_rutas(rutas):
-    ruta_archivo = os.path.join(os.path.dirname(__file__), "rutas.yaml")
-    with open(ruta_archivo, 'w', encoding="utf-8") as archivo:
-        yaml.dump(rutas, archivo, default_flow_style=False, allow_unicode=True)
+# rutas.yaml solo se escribe si cambió alguna entrada, y los cambios seguidos van en una sola escritura
+almacen_rutas = AlmacenRutas()
+
+def guardar_rutas(rutas, lock=None):
+    """
+    Programa la escritura de rutas.yaml (ver moduloDatos.AlmacenRutas). Retorna la cantidad de entradas cambiadas.
+    """
+    return almacen_rutas.guardar(rutas, lock)
 
 
 
 #ALUMNOS **********************************************************************************************************************************************
 
-# Funciones para cargar la base de datos YAML
-def cargar_base_datos_usuarios():
-    ruta = os.path.join(os.path.dirname(__file__), "database.yaml")
-    with open(ruta, 'r', encoding="utf-8") as archivo:
-        return yaml.safe_load(archivo)
+# Funciones para cargar la base de datos (database.yaml o SQLite, según SDN_ALMACEN)
+def cargar_base_datos_usuarios(almacen=None):
+    if almacen is None:
+        almacen = crear_almacen()
+    return almacen.cargar()
     
 def cargar_base_datos_rutas():
-    ruta = os.path.join(os.path.dirname(__file__), "rutas.yaml")
-    with open(ruta, 'r', encoding="utf-8") as archivo:
-        return yaml.safe_load(archivo)
+    return almacen_rutas.cargar()
 
 # Función para mostrar el banner principal
 def mostrar_banner():
@@ -362,28 +1017,49 @@ def extraer_codigo(correo):
     return None
 
 # Función para realizar el login
-def login(usuarios):
-    global usuario
+def login(servicio):
+    global usuario, token_sesion
     while True:
         print(Fore.YELLOW + ">> Inicio de sesión <<\n")
         correo = input("Ingrese su correo PUCP (@pucp.edu.pe): ").strip()
         contrasenia = getpass.getpass("Ingrese su contraseña: ").strip()
 
-        # Extraer el código del correo
-        codigo = extraer_codigo(correo)
-        if not codigo:
-            print(Fore.RED + "\nFormato de correo incorrecto. Intente nuevamente.\n")
+        # El servicio valida el formato del correo, el código y la contraseña
+        try:
+            token_sesion = servicio.iniciar_sesion(correo, contrasenia)
+        except ErrorServicio as e:
+            print(Fore.RED + f"\n{e} Intente nuevamente.\n")
             continue
 
-        # Buscar si el usuario con ese código existe y validar la contraseña
-        for u in usuarios:
-            if u['codigo'] == int(codigo) and u['contrasenia'] == contrasenia:
-                print(Fore.GREEN + "\n¡Inicio de sesión exitoso!\n")
-                usuario = u  # Actualiza la variable global usuario
-                return usuario  # Retorna el usuario logueado
+        print(Fore.GREEN + "\n¡Inicio de sesión exitoso!\n")
+        usuario = servicio.usuario(token_sesion)  # Actualiza la variable global usuario
+        return usuario  # Retorna el usuario logueado
 
-        # Si no se encontró el usuario o la contraseña no coincide
-        print(Fore.RED + "\nCredenciales incorrectas. Intente nuevamente.\n")
+def cerrar_sesion_actual():
+    """
+    Cierra la sesión de la CLI en el servicio, lo que borra solo las rutas de esta sesión.
+    """
+    try:
+        servicio.cerrar_sesion(token_sesion)
+    except ErrorServicio as e:
+        print(Fore.RED + str(e))
+
+def acceder_curso(curso, db, mensaje_fallo):
+    """
+    Solicita al servicio las rutas y la validación de conectividad para el curso y, si hay ping,
+    muestra el menú del curso.
+    """
+    try:
+        resultado = servicio.solicitar_acceso(token_sesion, curso['codigo_curso'], antes_del_ping=confirmar_ping)
+    except ErrorServicio as e:
+        print(Fore.RED + str(e))
+        return
+
+    if resultado['conectividad']:
+        mostrar_info_curso(curso, db)
+        print(Fore.GREEN + f"Acceso exitoso al curso {curso['nombre']}.")
+    else:
+        print(Fore.RED + mensaje_fallo)
 
 def ver_cursos(usuario, cursos, db, rutas, ip_controlador):
     """
@@ -408,48 +1084,11 @@ def ver_cursos(usuario, cursos, db, rutas, ip_controlador):
     if opcion.isdigit() and 0 < int(opcion) <= len(cursos):
         curso_seleccionado = cursos[int(opcion) - 1]
 
-        # Validar si el usuario pertenece al curso
-        if validar_usuario_curso(usuario, curso_seleccionado):
-            servidor_info = next(
-                (s for s in rutas['servidores'] if s['codigo_servidor'] == curso_seleccionado['servidor'][0]['codigo_servidor']),
-                None
-            )
-            if not servidor_info or 'attachmentPoint' not in servidor_info:
-                print(Fore.RED + "No se encontró información del servidor o su Attachment Point en rutas.yaml.")
-                return
-
-            usuario_attachment_point = next(
-                (u['attachmentPoint'][0] for u in rutas['usuarios'] if u['codigo'] == usuario['codigo']),
-                None
-            )
-            if not usuario_attachment_point:
-                print(Fore.RED + "No se encontró el Attachment Point del usuario en rutas.yaml.")
-                return
-
-            # Obtener los datos necesarios para la ruta
-            src_dpid = usuario_attachment_point['switchDPID']
-            src_port = usuario_attachment_point['port']
-            dst_dpid = servidor_info['attachmentPoint'][0]['switchDPID']
-            dst_port = servidor_info['attachmentPoint'][0]['port']
-
-            # Obtener la ruta mediante la API REST de Floodlight y guardar en impresion_estaticas.yaml
-            get_route(ip_controlador, src_dpid, src_port, dst_dpid, dst_port)
-            
-            # Validar conectividad SSH y ping al servidor
-            if validar_conectividad_desde_h1(
-                ip_gateway=ip_controlador,
-                port=usuario['port'],  # Suponiendo que se tenga esta información del usuario
-                usuario_h1=usuario['usuario_h1'],  # Usuario SSH para h1
-                contra_h1=usuario['contra_h1'],  # Contraseña SSH para h1
-                ip_destino=servidor_info['ip'],  # IP del servidor del curso
-                curso=curso_seleccionado,
-                db=db
-            ):
-                print(Fore.GREEN + f"Acceso exitoso al curso {curso_seleccionado['nombre']}.")
-            else:
-                print(Fore.RED + "No se pudo validar la conectividad al servidor. No hace ping al servidor del curso deseado.")
-        else:
-            print(Fore.RED + f"El usuario {usuario['nombre']} no tiene acceso al curso {curso_seleccionado['nombre']}.")
+        # El servicio valida el acceso, crea las rutas y comprueba la conectividad SSH y ping al servidor
+        acceder_curso(
+            curso_seleccionado, db,
+            "No se pudo validar la conectividad al servidor. No hace ping al servidor del curso deseado."
+        )
     else:
         print(Fore.RED + "Opción inválida. Intenta nuevamente.\n")
         ver_cursos(usuario, cursos, db, rutas, ip_controlador)
@@ -483,26 +1122,18 @@ def ver_notas(curso, db):
     # Crear una lista para almacenar las filas de la tabla
     notas_tabla = []
 
-    # Iterar sobre las notas de todos los cursos
-    for nota in db.get('notas', []):
-        if nota['curso'] == curso['codigo_curso']:  # Si el curso coincide
-            # Buscar las notas del alumno que corresponde al código del usuario
-            for alumno in nota['alumnos']:
-                if alumno['alumno'] == usuario['codigo']:  # Verificar si el código coincide
-                    # Crear una fila para las notas
-                    fila = [usuario['nombre']]  # Nombre del alumno
-                    # Añadir las calificaciones a la fila
-                    for materia, calificacion in alumno.items():
-                        if materia != 'alumno':  # No mostrar el código del alumno
-                            fila.append(calificacion)
-                    notas_tabla.append(fila)
-                    break
+    # Pedir al servicio las notas del alumno que corresponde al usuario de la sesión
+    try:
+        notas = servicio.ver_notas(token_sesion, curso['codigo_curso'])
+    except ErrorServicio:
+        notas = None
+    if notas:
+        # Crear una fila para las notas con el nombre del alumno y sus calificaciones
+        notas_tabla.append([usuario['nombre']] + list(notas.values()))
 
     # Generar las cabeceras dinámicamente, basadas en las claves de las notas
     if notas_tabla:
-        # Obtener las claves de las primeras notas del alumno (excluyendo 'alumno')
-        primera_fila = notas_tabla[0]
-        cabeceras = ['Alumno'] + [key.capitalize() for key in alumno.keys() if key != 'alumno']
+        cabeceras = ['Alumno'] + [key.capitalize() for key in notas.keys()]
         
         # Imprimir la tabla
         print(Fore.GREEN + tabulate(notas_tabla, headers=cabeceras, tablefmt='grid'))
@@ -516,14 +1147,10 @@ def ver_participantes(curso):
     print(Fore.CYAN + f"\n== Participantes del curso: {curso['nombre']} ==\n")
     
     # Obtener el profesor del curso
-    profesor = next(usuario for usuario in db.get('usuarios', []) if usuario['codigo'] == curso['profesor'])
-    profesor_nombre = profesor['nombre']
+    profesor_nombre = repo.nombre_usuario(curso['profesor'], por_defecto="Sin profesor")
     
     # Obtener los alumnos del curso
-    alumnos = []
-    for alumno_codigo in curso['alumnos']:
-        alumno = next(usuario for usuario in db.get('usuarios', []) if usuario['codigo'] == alumno_codigo)
-        alumnos.append(alumno['nombre'])
+    alumnos = [repo.nombre_usuario(alumno_codigo) for alumno_codigo in curso['alumnos']]
 
     # Crear tabla con profesor y alumnos
     encabezados = ['Rol', 'Nombre']
@@ -552,7 +1179,7 @@ def mostrar_menu(usuario, db, rutas, ip_controlador):
                 ver_cursos(usuario, db.get('cursos', []), db, rutas, ip_controlador)
             elif opcion == '2':
                 print(Fore.YELLOW + "Cerrando sesión...")
-                borrar_rutas(ip_controlador)  # Llamar a borrar las rutas
+                cerrar_sesion_actual()  # Borrar solo las rutas de esta sesión
                 return
             else:
                 print(Fore.RED + "Opción inválida. Intenta nuevamente.\n")
@@ -565,7 +1192,7 @@ def mostrar_menu(usuario, db, rutas, ip_controlador):
                 gestionar_cursos_profesor(db.get('cursos', []), rutas, ip_controlador, db)
             elif opcion == '2':
                 print(Fore.YELLOW + "Saliendo...")
-                borrar_rutas(ip_controlador)  # Llamar a borrar las rutas
+                cerrar_sesion_actual()  # Borrar solo las rutas de esta sesión
                 return
             else:
                 print(Fore.RED + "Opción inválida. Intenta nuevamente.\n")
@@ -581,7 +1208,7 @@ def mostrar_menu(usuario, db, rutas, ip_controlador):
                 administrar_cursos()  # Función para administrar cursos
             elif opcion == '3':
                 print(Fore.YELLOW + "Cerrando sesión...")
-                borrar_rutas(ip_controlador)  # Llamar a borrar las rutas
+                cerrar_sesion_actual()  # Borrar solo las rutas de esta sesión
                 return
             else:
                 print(Fore.RED + "Opción inválida. Intenta nuevamente.\n")
@@ -621,44 +1248,7 @@ def gestionar_cursos_profesor(cursos, rutas, ip_controlador, db):
             return
 
         # Continuar con el flujo si es profesor del curso
-        servidor_info = next(
-            (s for s in rutas['servidores'] if s['codigo_servidor'] == curso_seleccionado['servidor'][0]['codigo_servidor']),
-            None
-        )
-        if not servidor_info or 'attachmentPoint' not in servidor_info:
-            print(Fore.RED + "No se encontró información del servidor o su Attachment Point en rutas.yaml.")
-            return
-
-        usuario_attachment_point = next(
-            (u['attachmentPoint'][0] for u in rutas['usuarios'] if u['codigo'] == usuario['codigo']),
-            None
-        )
-        if not usuario_attachment_point:
-            print(Fore.RED + "No se encontró el Attachment Point del usuario en rutas.yaml.")
-            return
-
-        # Obtener los datos necesarios para la ruta
-        src_dpid = usuario_attachment_point['switchDPID']
-        src_port = usuario_attachment_point['port']
-        dst_dpid = servidor_info['attachmentPoint'][0]['switchDPID']
-        dst_port = servidor_info['attachmentPoint'][0]['port']
-
-        # Obtener la ruta mediante la API REST de Floodlight y guardar en impresion_estaticas.yaml
-        get_route(ip_controlador, src_dpid, src_port, dst_dpid, dst_port)
-
-        # Validar conectividad SSH y ping al servidor
-        if validar_conectividad_desde_h1(
-            ip_gateway=ip_controlador,
-            port=usuario['port'],  # Suponiendo que se tenga esta información del usuario
-            usuario_h1=usuario['usuario_h1'],  # Usuario SSH para h1
-            contra_h1=usuario['contra_h1'],  # Contraseña SSH para h1
-            ip_destino=servidor_info['ip'],  # IP del servidor del curso
-            curso=curso_seleccionado,
-            db=db
-        ):
-            print(Fore.GREEN + f"Acceso exitoso al curso {curso_seleccionado['nombre']}.")
-        else:
-            print(Fore.RED + "No se pudo validar la conectividad al servidor. No hay ping.")
+        acceder_curso(curso_seleccionado, db, "No se pudo validar la conectividad al servidor. No hay ping.")
     else:
         print(Fore.RED + "Opción inválida. Intenta nuevamente.\n")
         gestionar_cursos_profesor(cursos, rutas, ip_controlador, db)
@@ -682,20 +1272,16 @@ def menu_curso_profesor(curso):
 
 def ver_notas_profesor(curso):
     # Mostrar las notas de los alumnos del curso
-    notas_curso = [nota for nota in db.get('notas', []) if nota['curso'] == curso['codigo_curso']]
+    notas_curso = repo.obtener_notas_curso(curso['codigo_curso'])
     
     if not notas_curso:
         print(Fore.RED + "No hay notas disponibles para este curso.\n")
         return
 
     print(Fore.CYAN + "== Alumnos Inscritos ==\n")
-    estudiantes = []
 
     # Extraer alumnos inscritos en el curso
-    for nota in notas_curso:
-        estudiantes.extend(nota['alumnos'])
-
-    estudiantes = list({v['alumno']: v for v in estudiantes}.values())  # Eliminar duplicados
+    estudiantes = list({v['alumno']: v for v in notas_curso['alumnos']}.values())  # Eliminar duplicados
 
     # Imprimir lista de estudiantes
     for index, estudiante in enumerate(estudiantes, 1):
@@ -720,14 +1306,12 @@ def menu_editar_notas(estudiante, curso):
         print(Fore.CYAN + f"\n== Notas de {estudiante['alumno']} ==\n")
         
         # Obtener las notas del curso desde la base de datos
-        notas_curso = next((nota for nota in db.get('notas', []) if 'curso' in nota and nota['curso'] == curso['codigo_curso']), None)
-        
-        if not notas_curso:
+        if not repo.obtener_notas_curso(curso['codigo_curso']):
             print(Fore.RED + "Error: No se encontraron datos de notas para este curso en la base de datos.")
             return
         
         # Obtener las notas específicas del alumno seleccionado
-        notas_alumno = next((a for a in notas_curso['alumnos'] if a['alumno'] == estudiante['alumno']), None)
+        notas_alumno = repo.obtener_notas_alumno(curso['codigo_curso'], estudiante['alumno'])
         
         if not notas_alumno:
             print(Fore.RED + "Este alumno no tiene notas registradas.\n")
@@ -798,37 +1382,17 @@ def guardar_cambios(notas_curso):
         return
 
     print(Fore.GREEN + "Guardando cambios...\n")
-    
-    # Leer el archivo YAML
+
+    # Actualizar solo el registro del alumno; el almacenamiento decide cómo persistirlo
+    registro = {k: deepcopy(v) for k, v in notas_curso.items() if k != 'curso'}
     try:
-        with open("database.yaml", "r", encoding="utf-8") as file:
-            db = yaml.safe_load(file)  # Cargar los datos existentes
-    except FileNotFoundError:
-        print(Fore.RED + "Error: El archivo YAML no se encuentra.")
+        notas_actualizadas = repo.actualizar_notas(notas_curso['curso'], registro)
+    except (OSError, yaml.YAMLError, sqlite3.Error) as e:
+        print(Fore.RED + f"Error al guardar las notas: {e}")
         return
-    except yaml.YAMLError as e:
-        print(Fore.RED + f"Error al leer el archivo YAML: {e}")
-        return
-
-    # Buscar el bloque de notas para el curso correspondiente
-    notas_actualizadas = False
-    for curso_notas in db.get('notas', []):  # Iterar sobre el bloque 'notas'
-        if curso_notas.get('curso') == notas_curso.get('curso'):  # Coincidir cursos
-            for i, alumno in enumerate(curso_notas.get('alumnos', [])):
-                # Validar la clave 'alumno' y comparar con notas_curso
-                if alumno.get('alumno') == notas_curso.get('alumno'):
-                    curso_notas['alumnos'][i] = deepcopy(notas_curso)  # Actualizar las notas
-                    notas_actualizadas = True
-                    break
 
     if notas_actualizadas:
-        try:
-            # Guardar las notas actualizadas en el archivo YAML
-            with open("database.yaml", "w", encoding="utf-8") as file:
-                yaml.safe_dump(db, file, default_flow_style=False, allow_unicode=True)
-            print(Fore.GREEN + "Cambios guardados exitosamente.\n")
-        except yaml.YAMLError as e:
-            print(Fore.RED + f"Error al guardar el archivo YAML: {e}")
+        print(Fore.GREEN + "Cambios guardados exitosamente.\n")
     else:
         print(Fore.RED + f"No se encontraron las notas para el curso: {notas_curso.get('curso')} y alumno: {notas_curso.get('alumno')}.\n")
 
@@ -875,7 +1439,7 @@ def generar_mac_unica():
     # Generar una MAC única que no se repita
     while True:
         mac = f"44:11:{random.randint(0,99):02X}:{random.randint(0,99):02X}:{random.randint(0,99):02X}:{random.randint(0,99):02X}"
-        if not any(user['mac'] == mac for user in db['usuarios']):  # Verificar que no exista
+        if not repo.existe_mac(mac):  # Verificar que no exista
             return mac
 
 def crear_usuario():
@@ -898,6 +1462,12 @@ def crear_usuario():
     # Obtener información del usuario
     nombre = input("Ingrese el nombre del usuario: ").strip()
     codigo = input("Ingrese el código del usuario: ").strip()
+    if not (codigo.isdigit() and len(codigo) == 8):
+        print(Fore.RED + "Código inválido. Debe tener 8 dígitos.")
+        return
+    if repo.obtener_usuario(int(codigo)):
+        print(Fore.RED + f"Ya existe un usuario con el código {codigo}.")
+        return
     contrasenia = input("Ingrese la contraseña del usuario: ").strip()
     mac = generar_mac_unica()  # Generar una MAC única
 
@@ -910,20 +1480,15 @@ def crear_usuario():
         'rol': rol
     }
 
-    # Agregar el nuevo usuario a la base de datos
-    db['usuarios'].append(nuevo_usuario)
-
-    # Guardar la base de datos actualizada en el archivo YAML
-    guardar_base_datos(db)
+    # Agregar el nuevo usuario a la base de datos (se guarda solo esta fila)
+    try:
+        repo.agregar_usuario(nuevo_usuario)
+    except (OSError, yaml.YAMLError, sqlite3.Error) as e:
+        print(Fore.RED + f"Error al guardar el usuario: {e}")
+        return
 
     print(f"\nUsuario {nombre} creado con éxito!\n")
 
-def guardar_base_datos(db):
-    ruta = os.path.join(os.path.dirname(__file__), "database.yaml")
-    with open(ruta, 'w', encoding="utf-8") as archivo:
-        yaml.dump(db, archivo, default_flow_style=False, allow_unicode=True)
-    print("Base de datos guardada en 'database.yaml'")
-
 def asignar_usuario():
     while True:
         print("\n--- Menú de Asignación de Usuarios ---")
@@ -977,8 +1542,11 @@ def asignar_profesor():
         return
 
     # Asignar el profesor al curso
-    curso['profesor'] = profesor['codigo']
-    guardar_base_datos(db)
+    try:
+        repo.asignar_profesor(curso, profesor['codigo'])
+    except (OSError, yaml.YAMLError, sqlite3.Error) as e:
+        print(Fore.RED + f"Error al asignar el profesor: {e}")
+        return
     print(f"Profesor {profesor['nombre']} asignado al curso {curso['nombre']} con éxito.")
 
 def asignar_estudiante():
@@ -997,7 +1565,7 @@ def asignar_estudiante():
     estudiantes_data = []
 
     for estudiante in estudiantes:
-        cursos_inscritos = [curso['nombre'] for curso in db['cursos'] if estudiante['codigo'] in curso['alumnos']]
+        cursos_inscritos = [curso['nombre'] for curso in repo.cursos_de_alumno(estudiante['codigo'])]
         cursos_inscritos_str = ", ".join(cursos_inscritos) if cursos_inscritos else "Ninguno"
         estudiantes_data.append([estudiante['codigo'], estudiante['nombre'], cursos_inscritos_str])
 
@@ -1007,25 +1575,30 @@ def asignar_estudiante():
     codigo_estudiante = input("\nIngrese el código del estudiante: ").strip()
     codigo_curso = input("Ingrese el código del curso: ").strip()
 
-    curso = next((curso for curso in db['cursos'] if curso['codigo_curso'] == codigo_curso), None)
-    estudiante = next((estudiante for estudiante in estudiantes if str(estudiante['codigo']) == codigo_estudiante), None)
+    curso = repo.obtener_curso(codigo_curso)
+    estudiante = repo.obtener_usuario(int(codigo_estudiante)) if codigo_estudiante.isdigit() else None
+    if estudiante and estudiante['rol'] != 'Estudiante':
+        estudiante = None
 
     if not curso or not estudiante:
         print("Código de curso o estudiante inválido.")
         return
 
     # Verificar si el estudiante ya está inscrito
-    if estudiante['codigo'] in curso['alumnos']:
+    if repo.esta_inscrito(estudiante['codigo'], curso['codigo_curso']):
         print("Este alumno ya se encuentra inscrito en el curso.")
         return
 
     # Confirmar la asignación
     confirmacion = input(f"¿Está seguro que desea agregar al alumno {estudiante['nombre']} (código {codigo_estudiante}) al curso {curso['nombre']} (código {codigo_curso})? [s/n]: ").strip().lower()
     if confirmacion == 's':
-        curso['alumnos'].append(estudiante['codigo'])
-        # Crear notas iniciales para el estudiante en este curso
-        crear_seccion_notas(estudiante, curso)
-        guardar_base_datos(db)
+        # Crear notas iniciales para el estudiante en este curso y guardar todo en una sola operación
+        nueva_nota = crear_seccion_notas(estudiante, curso)
+        try:
+            repo.inscribir_alumno(curso, estudiante['codigo'], nueva_nota)
+        except (OSError, yaml.YAMLError, sqlite3.Error) as e:
+            print(Fore.RED + f"Error al inscribir al alumno: {e}")
+            return
         print(f"Alumno {estudiante['nombre']} asignado al curso {curso['nombre']} con éxito.")
     else:
         print("Asignación cancelada.")
@@ -1034,7 +1607,7 @@ def crear_seccion_notas(estudiante, curso):
     print(f"Creando sección de notas para el alumno {estudiante['nombre']} en el curso {curso['nombre']}...")
 
     # Buscar las notas del curso
-    notas_curso = next((notas for notas in db['notas'] if notas['curso'] == curso['codigo_curso']), None)
+    notas_curso = repo.obtener_notas_curso(curso['codigo_curso'])
     if not notas_curso:
         print(f"No se encontraron notas registradas para el curso {curso['nombre']}.")
         return
@@ -1048,9 +1621,9 @@ def crear_seccion_notas(estudiante, curso):
 
     # Crear la entrada de notas para el nuevo estudiante
     nueva_nota = {'alumno': estudiante['codigo'], **formato_calificaciones}
-    notas_curso['alumnos'].append(nueva_nota)
 
     print(f"Sección de notas creada para el alumno {estudiante['nombre']}.")
+    return nueva_nota
 
 def administrar_cursos():
     while True:
@@ -1083,8 +1656,8 @@ def listar_cursos():
 def obtener_nombre_profesor(codigo_profesor):
     if codigo_profesor == "Sin profesor":
         return "Sin profesor"
-    profesor = next((p for p in db['usuarios'] if p['codigo'] == codigo_profesor and p['rol'] == 'Profesor'), None)
-    return profesor['nombre'] if profesor else "Desconocido"
+    profesor = repo.obtener_usuario(codigo_profesor)
+    return profesor['nombre'] if profesor and profesor['rol'] == 'Profesor' else "Desconocido"
 
 def agregar_curso():
     print("\n--- Agregar Nuevo Curso ---")
@@ -1113,9 +1686,12 @@ def agregar_curso():
 
     while True:
         codigo_curso = input("Ingrese el código del curso (formato TEL###): ").strip()
-        if codigo_curso.startswith("TEL") and len(codigo_curso) == 6 and codigo_curso[3:].isdigit():
+        if not (codigo_curso.startswith("TEL") and len(codigo_curso) == 6 and codigo_curso[3:].isdigit()):
+            print("Código inválido. Debe seguir el formato TEL###.")
+        elif repo.obtener_curso(codigo_curso):
+            print(f"Ya existe un curso con el código {codigo_curso}.")
+        else:
             break
-        print("Código inválido. Debe seguir el formato TEL###.")
 
     # Crear el formato de notas
     formato_notas = {}
@@ -1149,15 +1725,15 @@ def agregar_curso():
     # Solicitar profesor y alumno inicial
     while True:
         codigo_profesor = input("Ingrese el código del profesor a cargo: ").strip()
-        profesor = next((p for p in db['usuarios'] if str(p['codigo']) == codigo_profesor and p['rol'] == 'Profesor'), None)
-        if profesor:
+        profesor = repo.obtener_usuario(int(codigo_profesor)) if codigo_profesor.isdigit() else None
+        if profesor and profesor['rol'] == 'Profesor':
             break
         print("Código de profesor inválido o no encontrado.")
 
     while True:
         codigo_alumno = input("Ingrese el código de un alumno para agregar al curso: ").strip()
-        alumno = next((a for a in db['usuarios'] if str(a['codigo']) == codigo_alumno and a['rol'] == 'Estudiante'), None)
-        if alumno:
+        alumno = repo.obtener_usuario(int(codigo_alumno)) if codigo_alumno.isdigit() else None
+        if alumno and alumno['rol'] == 'Estudiante':
             break
         print("Código de alumno inválido o no encontrado.")
 
@@ -1169,7 +1745,6 @@ def agregar_curso():
         "alumnos": [int(codigo_alumno)],
         "servidor": []  # Se puede completar después si es necesario
     }
-    db['cursos'].append(nuevo_curso)
 
     # Crear la sección de notas inicial
     nueva_seccion_notas = {
@@ -1177,36 +1752,456 @@ def agregar_curso():
         "nombre": nombre_curso,
         "alumnos": [{"alumno": int(codigo_alumno), **formato_notas}]
     }
-    db['notas'].append(nueva_seccion_notas)
-
-    # Guardar la base de datos
-    guardar_base_datos(db)
+    # Guardar el curso y su sección de notas
+    try:
+        repo.agregar_curso(nuevo_curso, nueva_seccion_notas)
+    except (OSError, yaml.YAMLError, sqlite3.Error) as e:
+        print(Fore.RED + f"Error al guardar el curso: {e}")
+        return
     print(f"Curso '{nombre_curso}' creado con éxito.")
 
-#******************************************************************************************************************************************************
+#SERVICIO *********************************************************************************************************************************************
 
-def main():
-    # Cargar las bases de datos
-    global db
-    db = cargar_base_datos_usuarios()
-    rutas = cargar_base_datos_rutas()
-    mostrar_banner()
+class ErrorServicio(Exception):
+    """
+    Error de negocio del servicio (credenciales, permisos, datos faltantes). El mensaje se muestra al usuario.
+    """
 
-    ip_controlador = "10.20.12.146"
 
-    # Actualizar attachment points de todos los usuarios al inicio
-    usuarios = db['usuarios']
-    servidores = db['servidores']
-    
-    actualizar_attachment_points_servidores(ip_controlador, rutas, servidores)
+class SesionUsuario:
+    """
+    Estado explícito de una sesión: el usuario autenticado y los cursos a los que ya accedió.
+    """
+
+    def __init__(self, token, usuario):
+        self.token = token
+        self.usuario = usuario
+        self.inicio = time.time()
+        self.ultimo_uso = time.monotonic()
+        self.cursos_accedidos = set()
+        self.precargas = {}  # codigo_curso -> Future de la instalación anticipada de sus rutas
 
-    actualizar_attachment_points_usuarios(ip_controlador, rutas, usuarios)
 
-    # Login del usuario
-    usuario_logueado = login(db['usuarios'])
+# Si es True, al iniciar sesión se instalan en segundo plano las rutas de todos los cursos autorizados
+PRECARGAR_RUTAS = os.environ.get("SDN_PRECARGAR_RUTAS") == "1"
+MAX_PRECARGAS = 4  # Cursos precargados a la vez entre todas las sesiones
 
-    # Actualizar solo el attachment point del usuario logueado
-    actualizar_attachment_point_usuario_logueado(ip_controlador, rutas, usuario_logueado)
+# Segundos sin actividad tras los que el servicio cierra una sesión y borra sus reglas (ver moduloServicio)
+SESION_INACTIVA = int(os.environ.get("SDN_SESION_INACTIVA", "1800"))
+
+class ServicioAcademico:
+    """
+    Operaciones de la aplicación sin entrada interactiva: login, listado de cursos, acceso a un curso,
+    consulta de notas y cierre de sesión. Cada sesión se identifica por un token, así que un mismo
+    proceso puede atender a varios usuarios a la vez (ver moduloServicio.py). Los menús de la CLI
+    son clientes de este servicio.
+    """
+
+    def __init__(self, repo, rutas, ip_controlador, precargar_rutas=None, sesion_inactiva=None, seguidor=None):
+        self.repo = repo
+        self.rutas = rutas
+        self.ip_controlador = ip_controlador
+        self.precargar_rutas = PRECARGAR_RUTAS if precargar_rutas is None else precargar_rutas
+        self.sesiones = {}  # token -> SesionUsuario
+        self._lock = threading.Lock()
+        # rutas.yaml es compartido por todas las sesiones (y por el seguidor de attachment points, si lo hay)
+        self.seguidor = seguidor
+        self._lock_rutas = seguidor.lock if seguidor is not None else threading.Lock()
+        self._precargas = ThreadPoolExecutor(max_workers=MAX_PRECARGAS, thread_name_prefix="precarga-rutas")
+        self.sesion_inactiva = sesion_inactiva
+        if sesion_inactiva:
+            threading.Thread(target=self._recolector, name="recolector-sesiones", daemon=True).start()
+
+    def _sesion(self, token):
+        with self._lock:
+            sesion = self.sesiones.get(token)
+        if sesion is None:
+            raise ErrorServicio("Sesión inválida o expirada.")
+        sesion.ultimo_uso = time.monotonic()
+        registro_flujos.tocar(token)
+        return sesion
+
+    def recolectar_sesiones(self):
+        """
+        Cierra las sesiones que superaron sesion_inactiva sin actividad, borrando sus reglas.
+
+        Returns:
+            list: Tokens de las sesiones cerradas.
+        """
+        limite = time.monotonic() - self.sesion_inactiva
+        with self._lock:
+            vencidas = [token for token, sesion in self.sesiones.items() if sesion.ultimo_uso < limite]
+        cerradas = []
+        for token in vencidas:
+            try:
+                self.cerrar_sesion(token)
+                cerradas.append(token)
+            except ErrorServicio:
+                pass  # La sesión se cerró por su cuenta mientras tanto
+        return cerradas
+
+    def _recolector(self):
+        intervalo = max(1, min(60, self.sesion_inactiva // 2))
+        while True:
+            time.sleep(intervalo)
+            self.recolectar_sesiones()
+
+    def _curso_accesible(self, usuario, codigo_curso):
+        curso = self.repo.obtener_curso(codigo_curso)
+        if not curso:
+            raise ErrorServicio(f"El curso {codigo_curso} no existe.")
+        if not tiene_acceso_curso(usuario, curso, self.repo):
+            raise ErrorServicio(f"El usuario {usuario['nombre']} no tiene acceso al curso {curso['nombre']}.")
+        return curso
+
+    def iniciar_sesion(self, correo, contrasenia):
+        """
+        Valida las credenciales, actualiza el attachment point del usuario y retorna el token de sesión.
+        """
+        codigo = extraer_codigo(correo)
+        if not codigo:
+            raise ErrorServicio("Formato de correo incorrecto.")
+
+        usuario_logueado = self.repo.autenticar(int(codigo), contrasenia)
+        if not usuario_logueado:
+            raise ErrorServicio("Credenciales incorrectas.")
+
+        self._actualizar_attachment_point(usuario_logueado)
+
+        token = secrets.token_hex(16)
+        sesion = SesionUsuario(token, usuario_logueado)
+        with self._lock:
+            self.sesiones[token] = sesion
+        if self.precargar_rutas:
+            self.precargar_cursos(sesion)
+        return token
+
+    def _actualizar_attachment_point(self, usuario_logueado):
+        """
+        Con seguidor, rutas.yaml no se escribe aquí: el cambio sale en la siguiente escritura del seguidor.
+        El lock de rutas solo se toma para cambiar la entrada del usuario, así los logins y el seguidor no
+        esperan a las consultas al controlador ni al reencaminamiento de otros.
+        """
+        attachment_points = actualizar_attachment_point_usuario_logueado(
+            self.ip_controlador, self.rutas, usuario_logueado, guardar=self.seguidor is None,
+            lock=self._lock_rutas, silencioso=True)
+        if self.seguidor is not None:
+            self.seguidor.marcar_cambios()
+        return attachment_points
+
+    def cursos_autorizados(self, usuario_logueado):
+        """
+        Cursos con servidor a los que el usuario puede acceder según la base de datos.
+        Los administradores no se incluyen: tienen acceso a todos los cursos y no conviene instalarlos todos.
+        """
+        if usuario_logueado['rol'] == 'Estudiante':
+            cursos = self.repo.cursos_de_alumno(usuario_logueado['codigo'])
+        elif usuario_logueado['rol'] == 'Profesor':
+            cursos = [curso for curso in self.repo.db['cursos'] if curso['profesor'] == usuario_logueado['codigo']]
+        else:
+            cursos = []
+        return [curso for curso in cursos if curso.get('servidor')]
+
+    def precargar_cursos(self, sesion):
+        """
+        Encola la instalación de las rutas de cada curso autorizado, a nombre de la sesión.
+        solicitar_acceso espera la del curso elegido y luego solo confirma que las reglas ya están.
+        """
+        for curso in self.cursos_autorizados(sesion.usuario):
+            sesion.precargas[curso['codigo_curso']] = self._precargas.submit(self._precargar_curso, sesion, curso)
+
+    def _precargar_curso(self, sesion, curso):
+        try:
+            extremos, servidor_info = self.extremos_ruta(sesion.usuario, curso)
+        except ErrorServicio:
+            return None
+        return get_route(self.ip_controlador, *extremos, sesion.token, silencioso=True,
+                         hosts=self.hosts_extremos(sesion.usuario, servidor_info, curso),
+                         usuario=sesion.usuario['codigo'])
+
+    @staticmethod
+    def _esperar_precarga(futuro):
+        try:
+            futuro.result()
+        except Exception:
+            pass  # Si la precarga falló, solicitar_acceso instala las rutas de todos modos
+
+    def usuario(self, token):
+        return self._sesion(token).usuario
+
+    def listar_cursos(self, token):
+        usuario_logueado = self._sesion(token).usuario
+        return [
+            {
+                'codigo_curso': curso['codigo_curso'],
+                'nombre': curso['nombre'],
+                'acceso': tiene_acceso_curso(usuario_logueado, curso, self.repo),
+            }
+            for curso in self.repo.db['cursos']
+        ]
+
+    def extremos_ruta(self, usuario_logueado, curso):
+        """
+        Retorna ((src_dpid, src_port, dst_dpid, dst_port), servidor_info) según los attachment points de rutas.yaml.
+        """
+        if not curso.get('servidor'):
+            raise ErrorServicio(f"El curso {curso['nombre']} no tiene servidor asignado.")
+
+        # Los attachment points de los servidores llegan con la primera consulta del seguidor
+        if self.seguidor is not None:
+            self.seguidor.esperar_primera_lectura()
+
+        servidor_info = next(
+            (s for s in self.rutas['servidores'] if s['codigo_servidor'] == curso['servidor'][0]['codigo_servidor']),
+            None
+        )
+        if not servidor_info or not servidor_info.get('attachmentPoint'):
+            raise ErrorServicio("No se encontró información del servidor o su Attachment Point en rutas.yaml.")
+
+        usuario_attachment_point = next(
+            (u['attachmentPoint'][0] for u in self.rutas['usuarios']
+             if u['codigo'] == usuario_logueado['codigo'] and u.get('attachmentPoint')),
+            None
+        )
+        if not usuario_attachment_point:
+            raise ErrorServicio("No se encontró el Attachment Point del usuario en rutas.yaml.")
+
+        extremos = (
+            usuario_attachment_point['switchDPID'],
+            usuario_attachment_point['port'],
+            servidor_info['attachmentPoint'][0]['switchDPID'],
+            servidor_info['attachmentPoint'][0]['port'],
+        )
+        return extremos, servidor_info
+
+    def hosts_extremos(self, usuario_logueado, servidor_info, curso=None):
+        """
+        Datos de ambos extremos según la base de datos: IP y MAC (ARP proxy, reparto entre caminos),
+        rol del usuario y servicios que el curso permite en el servidor (QoS).
+        """
+        servidor = self.repo.obtener_servidor(servidor_info['codigo_servidor'])
+        if not servidor or not usuario_logueado.get('ip'):
+            return None
+        servicios = []
+        for asignado in (curso or {}).get('servidor') or []:
+            if asignado['codigo_servidor'] == servidor['codigo_servidor']:
+                servicios = asignado.get('servicios_permitidos') or []
+        return {
+            'origen': {'ip': usuario_logueado['ip'], 'mac': usuario_logueado['mac'], 'rol': usuario_logueado['rol']},
+            'destino': {'ip': servidor['ip'], 'mac': servidor['mac'], 'servicios': servicios,
+                        'servicio': servidor.get('servicio'), 'puerto': servidor.get('puerto')},
+        }
+
+    def solicitar_acceso(self, token, codigo_curso, antes_del_ping=None):
+        """
+        Crea las rutas entre el usuario y el servidor del curso y valida la conectividad con un ping desde h1.
+
+        Args:
+            token (str): Token de la sesión.
+            codigo_curso (str): Código del curso.
+            antes_del_ping (callable): Opcional. Si retorna False, se borran las rutas de la sesión y no se hace ping.
+
+        Returns:
+            dict: {'curso', 'reglas', 'conectividad', 'salida'}
+        """
+        sesion = self._sesion(token)
+        usuario_logueado = sesion.usuario
+        curso = self._curso_accesible(usuario_logueado, codigo_curso)
+        extremos, servidor_info = self.extremos_ruta(usuario_logueado, curso)
+
+        # Si las rutas se están precargando, esperar; get_route solo confirmará que ya están instaladas
+        futuro = sesion.precargas.get(codigo_curso)
+        if futuro is not None:
+            self._esperar_precarga(futuro)
+
+        # Obtener la ruta mediante la API REST de Floodlight e insertar las reglas
+        reglas = get_route(self.ip_controlador, *extremos, token,
+                           hosts=self.hosts_extremos(usuario_logueado, servidor_info, curso),
+                           usuario=usuario_logueado['codigo'])
+
+        if antes_del_ping is not None and not antes_del_ping():
+            borrar_rutas(self.ip_controlador, token)
+            return {'curso': codigo_curso, 'reglas': reglas, 'conectividad': False, 'salida': ''}
+
+        conectividad, salida = validar_conectividad_desde_h1(
+            ip_gateway=separar_direccion(self.ip_controlador)[0],  # h1 se alcanza a través del mismo host
+            port=usuario_logueado['port'],  # Suponiendo que se tenga esta información del usuario
+            usuario_h1=usuario_logueado['usuario_h1'],  # Usuario SSH para h1
+            contra_h1=usuario_logueado['contra_h1'],  # Contraseña SSH para h1
+            ip_destino=servidor_info['ip'],  # IP del servidor del curso
+        )
+        if conectividad:
+            sesion.cursos_accedidos.add(codigo_curso)
+        return {'curso': codigo_curso, 'reglas': reglas, 'conectividad': conectividad, 'salida': salida}
+
+    def ver_notas(self, token, codigo_curso):
+        """
+        Retorna las calificaciones del usuario de la sesión en el curso, sin la clave 'alumno'.
+        """
+        usuario_logueado = self._sesion(token).usuario
+        self._curso_accesible(usuario_logueado, codigo_curso)
+        registro = self.repo.obtener_notas_alumno(codigo_curso, usuario_logueado['codigo'])
+        if not registro:
+            raise ErrorServicio("No se encontraron notas para este alumno en este curso.")
+        return {materia: calificacion for materia, calificacion in registro.items() if materia != 'alumno'}
+
+    def actualizar_ubicacion(self, token):
+        """
+        Vuelve a consultar el attachment point del usuario de la sesión; si se movió de switch o de puerto,
+        sus rutas instaladas se reencaminan enviando y borrando solo los saltos que cambiaron.
+        Retorna el attachment point actual.
+        """
+        usuario_logueado = self._sesion(token).usuario
+        obtener_snapshot_dispositivos(self.ip_controlador).invalidar()
+        return self._actualizar_attachment_point(usuario_logueado)
+
+    def cerrar_sesion(self, token):
+        """
+        Cierra la sesión y borra solo las reglas que instaló.
+        """
+        with self._lock:
+            sesion = self.sesiones.pop(token, None)
+        if sesion is None:
+            raise ErrorServicio("Sesión inválida o expirada.")
+        # Las precargas que ya empezaron deben terminar antes de borrar, para no dejar reglas huérfanas
+        for futuro in sesion.precargas.values():
+            if not futuro.cancel():
+                self._esperar_precarga(futuro)
+        return borrar_rutas(self.ip_controlador, token)
+
+#ARRANQUE *********************************************************************************************************************************************
+#
+# Nada de lo que se carga al iniciar depende de las credenciales, así que se hace en paralelo mientras
+# el usuario escribe su correo y contraseña.
+
+class ArranqueConcurrente:
+    """
+    Lanza en paralelo la lectura de database.yaml y rutas.yaml y la descarga de dispositivos y topología del
+    controlador; con las dos primeras se arma el ServicioAcademico. Registra cuándo empezó y cuánto tardó cada etapa.
+    Hasta que se llama a errores(), los errores de las etapas se acumulan en lugar de interrumpir el login.
+    """
+
+    def __init__(self, ip_controlador, precargar_rutas=None):
+        self.ip_controlador = ip_controlador
+        self.precargar_rutas = precargar_rutas
+        self.tiempos = {}  # etapa -> (inicio relativo, duración) en segundos
+        self.inicio = time.perf_counter()
+        self._errores = []
+        diferir_errores(self._errores)
+        self._ejecutor = ThreadPoolExecutor(max_workers=5, thread_name_prefix="arranque")
+
+        # Se crean aquí para que las etapas y el login compartan el mismo snapshot y el mismo motor
+        snapshot = obtener_snapshot_dispositivos(ip_controlador)
+        motor = obtener_motor_rutas(ip_controlador) if RUTAS_LOCALES else None
+
+        self.etapas = {
+            'database.yaml': self._etapa('database.yaml', self._cargar_db),
+            'rutas.yaml': self._etapa('rutas.yaml', cargar_base_datos_rutas),
+            'dispositivos': self._etapa('dispositivos', snapshot.mapa),
+        }
+        if motor is not None:
+            self.etapas['topología'] = self._etapa('topología', lambda: motor.actualizar(forzar=True))
+        self.etapas['servicio'] = self._etapa('servicio', self._crear_servicio)
+        self._ejecutor.shutdown(wait=False)
+
+    def _etapa(self, nombre, funcion):
+        def medir():
+            inicio = time.perf_counter()
+            try:
+                return funcion()
+            except Exception as e:
+                reportar_error(Fore.RED + f"Error en la etapa {nombre} del arranque: {e}")
+                raise
+            finally:
+                self.tiempos[nombre] = (inicio - self.inicio, time.perf_counter() - inicio)
+        return self._ejecutor.submit(medir)
+
+    @staticmethod
+    def _cargar_db():
+        almacen = crear_almacen()
+        return RepositorioDB(cargar_base_datos_usuarios(almacen), almacen)
+
+    def _crear_servicio(self):
+        repo = self.etapas['database.yaml'].result()
+        rutas = self.etapas['rutas.yaml'].result()
+        # El seguidor arranca con la tabla de dispositivos ya descargada (no la vuelve a pedir)
+        self.etapas['dispositivos'].result()
+        seguidor = SeguidorAttachmentPoints(self.ip_controlador, rutas, repo.db).iniciar()
+        atexit.register(seguidor.detener)
+        return ServicioAcademico(repo, rutas, self.ip_controlador, self.precargar_rutas, seguidor=seguidor)
+
+    def servicio(self):
+        return self.etapas['servicio'].result()
+
+    def errores(self):
+        """
+        Deja de acumular errores y retorna los que aparecieron hasta ahora; los siguientes se imprimen al momento.
+        """
+        diferir_errores(None)
+        return list(self._errores)
+
+    def esperar(self):
+        for futuro in self.etapas.values():
+            futuro.exception()
+
+    def reporte(self):
+        """
+        Retorna un texto con el inicio y la duración de cada etapa, en el orden en que empezaron.
+        """
+        self.esperar()
+        lineas = [
+            f"{nombre}: {duracion * 1000:.1f} ms (desde +{inicio * 1000:.1f} ms)"
+            for nombre, (inicio, duracion) in sorted(self.tiempos.items(), key=lambda item: item[1][0])
+        ]
+        fin = max(inicio + duracion for inicio, duracion in self.tiempos.values())
+        lineas.append(f"total: {fin * 1000:.1f} ms")
+        return "\n".join(lineas)
+
+
+class ServicioDiferido:
+    """
+    Se usa en lugar del servicio mientras el arranque lo termina de crear: cada acceso espera a que esté listo.
+    """
+
+    def __init__(self, futuro):
+        self._futuro = futuro
+
+    def __getattr__(self, atributo):
+        return getattr(self._futuro.result(), atributo)
+
+#******************************************************************************************************************************************************
+
+def main():
+    parser = argparse.ArgumentParser(description="Sistema de Gestión PUCP")
+    parser.add_argument("--timings", action="store_true", help="Mostrar los tiempos de cada etapa del arranque")
+    parser.add_argument("--precargar-rutas", action="store_true", default=None,
+                        help="Instalar en segundo plano las rutas de los cursos autorizados al iniciar sesión")
+    parser.add_argument("--controlador", default=CONTROLADOR,
+                        help="Dirección del controlador Floodlight, \"ip\" o \"ip:puerto\" (también SDN_CONTROLADOR)")
+    args = parser.parse_args()
+    ip_controlador = args.controlador
+
+    # Bases de datos, dispositivos y topología se cargan en paralelo; los attachment points se mantienen
+    # al día en segundo plano (ver SeguidorAttachmentPoints)
+    global db, repo, servicio
+    arranque = ArranqueConcurrente(ip_controlador, args.precargar_rutas)
+    mostrar_banner()
+
+    # Login del usuario (el servicio actualiza solo el attachment point del usuario logueado). Los errores
+    # del arranque se muestran al terminar, también si el arranque falló, para no interrumpir la contraseña
+    try:
+        usuario_logueado = login(ServicioDiferido(arranque.etapas['servicio']))
+        servicio = arranque.servicio()
+    finally:
+        for error in arranque.errores():
+            print(error)
+    repo = servicio.repo
+    db = repo.db
+    rutas = servicio.rutas
+
+    if args.timings:
+        print(Fore.CYAN + "Tiempos de arranque:\n" + arranque.reporte())
+        print(Fore.CYAN + "Tiempos de carga:\n" + reporte_tiempos_carga() + "\n")
 
     # Mostrar menú correspondiente al rol
     while True:
@@ -1214,4 +2209,4 @@ def main():
         break
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
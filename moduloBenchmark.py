@@ -0,0 +1,385 @@
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import random
+import statistics
+import tempfile
+import time
+from datetime import datetime
+from unittest import mock
+
+import moduloAuth as auth
+import moduloDatos
+from moduloDatos import RepositorioDB, AlmacenRutas, crear_almacen, escribir_yaml
+from moduloFloodlight import SnapshotDispositivos
+from moduloSimulador import SimuladorFloodlight, dpid_sintetico, generar_topologia
+
+#GENERADOR DE ESCENARIOS *****************************************************************************************************************************
+
+def _mac(prefijo, i):
+    return f"{prefijo}:{(i >> 24) & 255:02x}:{(i >> 16) & 255:02x}:{(i >> 8) & 255:02x}:{i & 255:02x}"
+
+
+def generar_escenario(usuarios=1000, cursos=100, alumnos_por_curso=30, servidores=10, columnas_notas=8,
+                      switches=20, semilla=1):
+    """
+    Genera una base de datos, un rutas.yaml y una lista de dispositivos de Floodlight con el mismo
+    formato que los archivos reales, pero a la escala indicada.
+
+    Returns:
+        dict: {'db', 'rutas', 'dispositivos'}
+    """
+    rnd = random.Random(semilla)
+    num_profesores = max(1, usuarios // 20)
+
+    lista_usuarios = []
+    for i in range(usuarios):
+        lista_usuarios.append({
+            'codigo': 20000000 + i,
+            'contrasenia': f"clave{i}",
+            'mac': _mac("02:00", i),
+            'ip': f"10.{(i >> 16) & 255}.{(i >> 8) & 255}.{i & 255}",
+            'port': 22,
+            'usuario_h1': 'ubuntu',
+            'contra_h1': 'ubuntu',
+            'nombre': f"Usuario {i}",
+            'rol': 'Profesor' if i < num_profesores else 'Estudiante',
+        })
+    lista_usuarios.append({
+        'codigo': 19990000, 'contrasenia': "admin", 'mac': _mac("02:02", 0), 'ip': "10.255.255.254", 'port': 22,
+        'usuario_h1': 'ubuntu', 'contra_h1': 'ubuntu', 'nombre': "Administrador", 'rol': 'Administrador',
+    })
+    profesores = [u['codigo'] for u in lista_usuarios if u['rol'] == 'Profesor']
+    estudiantes = [u['codigo'] for u in lista_usuarios if u['rol'] == 'Estudiante']
+
+    lista_servidores = [
+        {
+            'codigo_servidor': f"Server{j}",
+            'ip': f"10.254.{(j >> 8) & 255}.{j & 255}",
+            'mac': _mac("02:01", j),
+            'nombre': f"Servidor {j}",
+            'protocolo_conexion': 'TCP',
+            'puerto': 22,
+            'servicio': 'ssh',
+        }
+        for j in range(servidores)
+    ]
+
+    columnas = [f"pc{k + 1}" for k in range(max(columnas_notas - 2, 0))] + ["ex1", "ex2"][:columnas_notas]
+    lista_cursos, lista_notas = [], []
+    for n in range(cursos):
+        codigo_curso = f"TEL{n:03d}"
+        alumnos = rnd.sample(estudiantes, min(alumnos_por_curso, len(estudiantes)))
+        lista_cursos.append({
+            'alumnos': alumnos,
+            'codigo_curso': codigo_curso,
+            'nombre': f"Curso {n}",
+            'profesor': rnd.choice(profesores),
+            'servidor': [{'codigo_servidor': f"Server{n % servidores}", 'servicios_permitidos': ['ssh', 'web']}],
+        })
+        lista_notas.append({
+            'alumnos': [
+                {'alumno': alumno, **{c: (rnd.randint(0, 20) if rnd.random() < 0.5 else "Pendiente") for c in columnas}}
+                for alumno in alumnos
+            ],
+            'curso': codigo_curso,
+            'nombre': f"Curso {n}",
+        })
+
+    db = {'usuarios': lista_usuarios, 'cursos': lista_cursos, 'servidores': lista_servidores, 'notas': lista_notas}
+
+    # Cada host cuelga de un switch de acceso al azar
+    def attachment():
+        return [{'switchDPID': dpid_sintetico(rnd.randrange(switches) + 1), 'port': rnd.randint(1, 48)}]
+
+    attachment_por_mac = {u['mac']: attachment() for u in lista_usuarios}
+    attachment_por_mac.update({s['mac']: attachment() for s in lista_servidores})
+    dispositivos = [{'mac': [mac], 'attachmentPoint': aps} for mac, aps in attachment_por_mac.items()]
+    rutas = {
+        'servidores': [
+            {'attachmentPoint': attachment_por_mac[s['mac']], 'codigo_servidor': s['codigo_servidor'],
+             'ip': s['ip'], 'nombre': s['nombre']}
+            for s in lista_servidores
+        ],
+        'usuarios': [
+            {'attachmentPoint': attachment_por_mac[u['mac']], 'codigo': u['codigo'], 'nombre': u['nombre']}
+            for u in lista_usuarios
+        ],
+    }
+    return {'db': db, 'rutas': rutas, 'dispositivos': dispositivos}
+
+
+def generar_ruta(saltos):
+    """
+    Genera una ruta con el formato de /wm/topology/route/ (puerto de entrada y salida por switch).
+    """
+    ruta = []
+    for i in range(saltos):
+        ruta.append({'switch': dpid_sintetico(i + 1), 'port': {'portNumber': 1}})
+        ruta.append({'switch': dpid_sintetico(i + 1), 'port': {'portNumber': 2}})
+    return ruta
+
+
+def escribir_escenario(escenario, directorio):
+    os.makedirs(directorio, exist_ok=True)
+    escribir_yaml(escenario['db'], os.path.join(directorio, "database.yaml"))
+    escribir_yaml(escenario['rutas'], os.path.join(directorio, "rutas.yaml"))
+    with open(os.path.join(directorio, "dispositivos.json"), 'w', encoding="utf-8") as archivo:
+        json.dump(escenario['dispositivos'], archivo)
+
+
+#MEDICIONES ******************************************************************************************************************************************
+
+def resumir(tiempos):
+    ordenados = sorted(tiempos)
+    return {
+        'repeticiones': len(tiempos),
+        'total_s': sum(tiempos),
+        'media_ms': statistics.fmean(tiempos) * 1000,
+        'p50_ms': ordenados[len(ordenados) // 2] * 1000,
+        'p95_ms': ordenados[min(len(ordenados) - 1, int(len(ordenados) * 0.95))] * 1000,
+        'min_ms': ordenados[0] * 1000,
+        'max_ms': ordenados[-1] * 1000,
+    }
+
+
+def medir(funcion, repeticiones):
+    """
+    Ejecuta funcion(i) 'repeticiones' veces sin imprimir nada en consola y retorna el resumen de tiempos.
+    """
+    tiempos = []
+    with contextlib.redirect_stdout(io.StringIO()), mock.patch("builtins.input", return_value=""):
+        for i in range(repeticiones):
+            inicio = time.perf_counter()
+            funcion(i)
+            tiempos.append(time.perf_counter() - inicio)
+    return resumir(tiempos)
+
+
+def con_entradas(funcion, *entradas):
+    """
+    Ejecuta una función interactiva de la CLI respondiendo a sus input() con las entradas dadas.
+    """
+    with mock.patch("builtins.input", side_effect=list(entradas)):
+        return funcion()
+
+
+def medir_acceso(servicio, cursos, repeticiones, rnd):
+    """
+    Inicia sesión con alumnos al azar y mide cuánto tarda el acceso a uno de sus cursos hasta que las rutas
+    quedan listas para el ping. Si el servicio precarga rutas, se espera a que termine antes de medir
+    (el usuario todavía está en el menú).
+    """
+    preparados = []
+    with contextlib.redirect_stdout(io.StringIO()):
+        for _ in range(repeticiones):
+            curso = rnd.choice([c for c in cursos if c['alumnos']])
+            alumno = servicio.repo.obtener_usuario(rnd.choice(curso['alumnos']))
+            token = servicio.iniciar_sesion(f"a{alumno['codigo']}@pucp.edu.pe", alumno['contrasenia'])
+            for futuro in servicio.sesiones[token].precargas.values():
+                servicio._esperar_precarga(futuro)
+            preparados.append((token, curso['codigo_curso']))
+
+        tiempos = []
+        for token, codigo_curso in preparados:
+            inicio = time.perf_counter()
+            # antes_del_ping retorna None: se registra el tiempo y se omite el ping (no hay hosts reales)
+            servicio.solicitar_acceso(token, codigo_curso,
+                                      antes_del_ping=lambda: tiempos.append(time.perf_counter() - inicio))
+            servicio.cerrar_sesion(token)
+    return resumir(tiempos)
+
+
+def ejecutar_benchmark(escenario, repeticiones=50, saltos=6, tipo_almacen="yaml", diario=True, semilla=1,
+                       controlador=None):
+    """
+    Prepara una copia del escenario en un directorio temporal y mide los flujos de autenticación y rutas.
+    Sin controlador, los dispositivos se sirven desde memoria; con controlador (p. ej. el simulador local)
+    también se mide el acceso a un curso (ruta e inserción de reglas), con y sin precarga de rutas.
+
+    Returns:
+        dict: Resultados por operación, listos para guardar como JSON.
+    """
+    rnd = random.Random(semilla)
+    resultados = {}
+    directorio_original = moduloDatos.DIRECTORIO_DATOS
+
+    with tempfile.TemporaryDirectory(prefix="sdn-benchmark-") as directorio:
+        escribir_escenario(escenario, directorio)
+        moduloDatos.DIRECTORIO_DATOS = directorio
+        inicio = time.perf_counter()
+        almacen = crear_almacen(tipo_almacen, diario)
+        try:
+            auth.db = auth.cargar_base_datos_usuarios(almacen)
+            auth.repo = RepositorioDB(auth.db, almacen)
+            auth.almacen_rutas = AlmacenRutas()  # Escrituras de rutas.yaml contadas solo para esta corrida
+            rutas = auth.cargar_base_datos_rutas()
+            resultados['carga_inicial'] = resumir([time.perf_counter() - inicio])
+
+            if controlador:
+                ip_controlador = controlador
+                snapshot = auth.obtener_snapshot_dispositivos(ip_controlador)
+            else:
+                ip_controlador = "benchmark"
+                dispositivos = escenario['dispositivos']
+                snapshot = SnapshotDispositivos(lambda: dispositivos)
+                auth.snapshots_dispositivos[ip_controlador] = snapshot
+            servicio = auth.ServicioAcademico(auth.repo, rutas, ip_controlador)
+            auth.servicio = servicio
+
+            db = auth.db
+            usuarios, cursos = db['usuarios'], db['cursos']
+            estudiantes = [u for u in usuarios if u['rol'] == 'Estudiante']
+
+            # Flujos de autenticación y consulta ----------------------------------------------------------------------
+            def login(i):
+                u = rnd.choice(usuarios)
+                with mock.patch("getpass.getpass", return_value=u['contrasenia']):
+                    con_entradas(lambda: auth.login(servicio), f"a{u['codigo']}@pucp.edu.pe")
+            resultados['login'] = medir(login, repeticiones)
+
+            pares = [(rnd.choice(usuarios), rnd.choice(cursos)) for _ in range(repeticiones * 100)]
+            resultados['validar_usuario_curso'] = medir(
+                lambda i: [auth.validar_usuario_curso(u, c) for u, c in pares[i * 100:(i + 1) * 100]], repeticiones)
+            resultados['validar_usuario_curso']['llamadas_por_repeticion'] = 100
+
+            resultados['ver_participantes'] = medir(lambda i: auth.ver_participantes(rnd.choice(cursos)), repeticiones)
+            resultados['listar_cursos'] = medir(lambda i: auth.listar_cursos(), max(1, repeticiones // 10))
+
+            # Altas y notas -------------------------------------------------------------------------------------------
+            def asignar_estudiante(i):
+                while True:
+                    estudiante, curso = rnd.choice(estudiantes), rnd.choice(cursos)
+                    if not auth.repo.esta_inscrito(estudiante['codigo'], curso['codigo_curso']):
+                        break
+                con_entradas(auth.asignar_estudiante, str(estudiante['codigo']), curso['codigo_curso'], "s")
+            resultados['asignar_estudiante'] = medir(asignar_estudiante, max(1, repeticiones // 5))
+
+            def guardar_cambios(i):
+                seccion = rnd.choice(db['notas'])
+                registro = dict(rnd.choice(seccion['alumnos']))
+                columna = rnd.choice([k for k in registro if k != 'alumno'])
+                registro[columna] = rnd.randint(0, 20)
+                auth.guardar_cambios({'curso': seccion['curso'], **registro})
+            resultados['guardar_cambios'] = medir(guardar_cambios, repeticiones)
+
+            # Rutas y attachment points -------------------------------------------------------------------------------
+            ruta = generar_ruta(saltos)
+            resultados['generar_reglas'] = medir(lambda i: auth.generar_reglas(ruta), repeticiones)
+            resultados['generar_reglas']['saltos'] = saltos
+
+            resultados['snapshot_dispositivos'] = medir(lambda i: snapshot.refrescar(), max(1, repeticiones // 10))
+            resultados['actualizar_attachment_points_servidores'] = medir(
+                lambda i: auth.actualizar_attachment_points_servidores(ip_controlador, rutas, db['servidores']),
+                max(1, repeticiones // 10))
+            resultados['actualizar_attachment_points_usuarios'] = medir(
+                lambda i: auth.actualizar_attachment_points_usuarios(ip_controlador, rutas, usuarios),
+                max(1, repeticiones // 10))
+            resultados['actualizar_attachment_point_usuario_logueado'] = medir(
+                lambda i: auth.actualizar_attachment_point_usuario_logueado(ip_controlador, rutas, rnd.choice(usuarios)),
+                repeticiones)
+
+            if controlador:
+                inicio = time.perf_counter()
+                auth.precalcular_rutas_servidores(ip_controlador, rutas)
+                resultados['precalcular_rutas_servidores'] = resumir([time.perf_counter() - inicio])
+
+                resultados['solicitar_acceso'] = medir_acceso(servicio, cursos, repeticiones, rnd)
+                servicio_precarga = auth.ServicioAcademico(auth.repo, rutas, ip_controlador, precargar_rutas=True)
+                resultados['solicitar_acceso_precargado'] = medir_acceso(servicio_precarga, cursos, repeticiones, rnd)
+        finally:
+            auth.almacen_rutas.vaciar()
+            resultados['escrituras_rutas'] = auth.almacen_rutas.estadisticas()
+            if hasattr(almacen, 'diario'):
+                almacen.diario.compactar()
+            if hasattr(almacen, 'cerrar'):
+                almacen.cerrar()
+            moduloDatos.DIRECTORIO_DATOS = directorio_original
+
+    return resultados
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de autenticación y rutas sobre datos sintéticos.")
+    parser.add_argument("--usuarios", type=int, default=1000)
+    parser.add_argument("--cursos", type=int, default=100)
+    parser.add_argument("--alumnos-por-curso", type=int, default=30)
+    parser.add_argument("--servidores", type=int, default=10)
+    parser.add_argument("--columnas-notas", type=int, default=8)
+    parser.add_argument("--switches", type=int, default=20)
+    parser.add_argument("--saltos", type=int, default=6, help="Switches en la ruta usada para generar reglas")
+    parser.add_argument("--repeticiones", type=int, default=50)
+    parser.add_argument("--almacen", choices=["yaml", "sqlite"], default="yaml")
+    parser.add_argument("--sin-diario", action="store_true", help="Guardar las notas sin el diario de notas")
+    parser.add_argument("--semilla", type=int, default=1)
+    parser.add_argument("--generar", metavar="DIRECTORIO",
+                        help="Solo generar database.yaml, rutas.yaml y dispositivos.json en el directorio")
+    parser.add_argument("--controlador", help="Medir también el acceso a cursos contra este controlador (ip:puerto)")
+    parser.add_argument("--simulador", action="store_true",
+                        help="Levantar el simulador de Floodlight con la topología del escenario y medir contra él")
+    parser.add_argument("--latencia", type=float, default=0.0, help="Simulador: segundos de espera por petición")
+    parser.add_argument("--tasa-error", type=float, default=0.0, help="Simulador: fracción de peticiones con HTTP 500")
+    parser.add_argument("--max-flujos", type=int, default=None, help="Simulador: reglas por switch como máximo")
+    parser.add_argument("--salida", default="resultados_benchmark.json")
+    args = parser.parse_args()
+
+    parametros = {
+        'usuarios': args.usuarios, 'cursos': args.cursos, 'alumnos_por_curso': args.alumnos_por_curso,
+        'servidores': args.servidores, 'columnas_notas': args.columnas_notas, 'switches': args.switches,
+        'semilla': args.semilla,
+    }
+    escenario = generar_escenario(**parametros)
+
+    if args.generar:
+        escribir_escenario(escenario, args.generar)
+        print(f"Escenario generado en {args.generar}")
+        return
+
+    simulador = None
+    controlador = args.controlador
+    if args.simulador:
+        simulador = SimuladorFloodlight(generar_topologia(args.switches, semilla=args.semilla), escenario['dispositivos'],
+                                        latencia=args.latencia, tasa_error=args.tasa_error, max_flujos=args.max_flujos,
+                                        semilla=args.semilla)
+        controlador = simulador.iniciar()
+
+    try:
+        resultados = ejecutar_benchmark(escenario, args.repeticiones, args.saltos, args.almacen,
+                                        not args.sin_diario, args.semilla, controlador)
+    finally:
+        if simulador is not None:
+            simulador.detener()
+
+    informe = {
+        'fecha': datetime.now().isoformat(timespec="seconds"),
+        'python': platform.python_version(),
+        'plataforma': platform.platform(),
+        'escenario': parametros,
+        'almacen': args.almacen,
+        'diario_notas': not args.sin_diario,
+        'controlador': controlador,
+        'repeticiones': args.repeticiones,
+        'resultados': resultados,
+    }
+    informe['escrituras_rutas'] = resultados.pop('escrituras_rutas')
+    if auth.reparto_rutas.sesiones_por_camino:
+        informe['sesiones_por_camino'] = auth.reparto_rutas.resumen()
+    if simulador is not None:
+        informe['simulador'] = {
+            'latencia': args.latencia, 'tasa_error': args.tasa_error, 'max_flujos': args.max_flujos,
+            'peticiones': simulador.peticiones, 'errores_inyectados': simulador.errores_inyectados,
+            'rechazos_por_capacidad': simulador.rechazos_por_capacidad,
+        }
+    with open(args.salida, 'w', encoding="utf-8") as archivo:
+        json.dump(informe, archivo, indent=2)
+
+    for operacion, resumen in resultados.items():
+        print(f"{operacion:48s} media {resumen['media_ms']:10.3f} ms   p95 {resumen['p95_ms']:10.3f} ms")
+    print(f"\nResultados guardados en {args.salida}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,867 @@
+import atexit
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import nullcontext
+from copy import deepcopy
+
+import yaml
+
+# Carpeta con database.yaml, rutas.yaml y demás archivos de datos (SDN_DATOS permite usar otra)
+DIRECTORIO_DATOS = os.environ.get("SDN_DATOS", os.path.dirname(os.path.abspath(__file__)))
+
+
+def ruta_datos(nombre):
+    return os.path.join(DIRECTORIO_DATOS, nombre)
+
+#REPOSITORIO EN MEMORIA ******************************************************************************************************************************
+
+class RepositorioDB:
+    """
+    Mantiene la base de datos cargada desde database.yaml junto con índices hash
+    por código de usuario, MAC, código de curso, código de servidor e inscripciones.
+    Las altas deben hacerse a través de este objeto para que los índices sigan siendo válidos
+    y para que cada cambio se persista en el almacenamiento configurado (YAML o SQLite).
+    """
+
+    def __init__(self, db, almacen=None):
+        self.db = db
+        self.almacen = almacen
+        for clave in ('usuarios', 'cursos', 'servidores', 'notas'):
+            if self.db.get(clave) is None:
+                self.db[clave] = []
+        self.reconstruir_indices()
+
+    def reconstruir_indices(self):
+        """
+        Reconstruye todos los índices a partir de las listas de la base de datos.
+        """
+        self.usuarios_por_codigo = {}
+        self.usuarios_por_mac = {}
+        for usuario in self.db['usuarios']:
+            self._indexar_usuario(usuario)
+
+        self.cursos_por_codigo = {}
+        self.alumnos_por_curso = {}
+        self.cursos_por_alumno = {}
+        for curso in self.db['cursos']:
+            self._indexar_curso(curso)
+
+        self.servidores_por_codigo = {s['codigo_servidor']: s for s in self.db['servidores']}
+
+        self.notas_por_curso = {}
+        self.notas_por_alumno = {}
+        for seccion in self.db['notas']:
+            self._indexar_seccion_notas(seccion)
+
+    def _indexar_usuario(self, usuario):
+        self.usuarios_por_codigo[usuario['codigo']] = usuario
+        # Varios usuarios pueden compartir la misma MAC (p. ej. el mismo host h1)
+        self.usuarios_por_mac.setdefault(usuario.get('mac'), []).append(usuario)
+
+    def _indexar_curso(self, curso):
+        codigo_curso = curso['codigo_curso']
+        self.cursos_por_codigo[codigo_curso] = curso
+        self.alumnos_por_curso[codigo_curso] = set(curso.get('alumnos', []))
+        for codigo_alumno in curso.get('alumnos', []):
+            self.cursos_por_alumno.setdefault(codigo_alumno, set()).add(codigo_curso)
+
+    def _indexar_seccion_notas(self, seccion):
+        codigo_curso = seccion['curso']
+        self.notas_por_curso[codigo_curso] = seccion
+        for registro in seccion.get('alumnos', []):
+            self.notas_por_alumno[(codigo_curso, registro['alumno'])] = registro
+
+    # Consultas -------------------------------------------------------------------------------------------------------------
+
+    def obtener_usuario(self, codigo):
+        return self.usuarios_por_codigo.get(codigo)
+
+    def autenticar(self, codigo, contrasenia):
+        """
+        Retorna el usuario si el código existe y la contraseña coincide, None en otro caso.
+        """
+        usuario = self.usuarios_por_codigo.get(codigo)
+        if usuario and usuario['contrasenia'] == contrasenia:
+            return usuario
+        return None
+
+    def usuarios_con_mac(self, mac):
+        return self.usuarios_por_mac.get(mac, [])
+
+    def existe_mac(self, mac):
+        return bool(self.usuarios_por_mac.get(mac))
+
+    def obtener_curso(self, codigo_curso):
+        return self.cursos_por_codigo.get(codigo_curso)
+
+    def obtener_servidor(self, codigo_servidor):
+        return self.servidores_por_codigo.get(codigo_servidor)
+
+    def esta_inscrito(self, codigo_alumno, codigo_curso):
+        return codigo_alumno in self.alumnos_por_curso.get(codigo_curso, ())
+
+    def cursos_de_alumno(self, codigo_alumno):
+        """
+        Retorna los cursos en los que está inscrito el alumno, en el orden de la base de datos.
+        """
+        codigos = self.cursos_por_alumno.get(codigo_alumno, ())
+        return [curso for curso in self.db['cursos'] if curso['codigo_curso'] in codigos]
+
+    def obtener_notas_curso(self, codigo_curso):
+        return self.notas_por_curso.get(codigo_curso)
+
+    def obtener_notas_alumno(self, codigo_curso, codigo_alumno):
+        return self.notas_por_alumno.get((codigo_curso, codigo_alumno))
+
+    def nombre_usuario(self, codigo, por_defecto="Desconocido"):
+        usuario = self.usuarios_por_codigo.get(codigo)
+        return usuario['nombre'] if usuario else por_defecto
+
+    # Altas y cambios (se aplican en memoria y luego en el almacenamiento) ---------------------------------------------------
+    #
+    # El almacén YAML escribe el mismo diccionario que se modificó, así que el cambio se aplica primero en memoria;
+    # si el almacenamiento lo rechaza (p. ej. un código duplicado en SQLite) se deshace y se relanza la excepción.
+
+    def _persistir(self, operacion, *args):
+        if self.almacen is not None:
+            getattr(self.almacen, operacion)(*args)
+
+    def _persistir_o_deshacer(self, deshacer, operacion, *args):
+        try:
+            self._persistir(operacion, *args)
+        except Exception:
+            deshacer()
+            raise
+
+    def agregar_usuario(self, usuario):
+        self.db['usuarios'].append(usuario)
+        self._indexar_usuario(usuario)
+
+        def deshacer():
+            self.db['usuarios'].pop()
+            self.reconstruir_indices()
+        self._persistir_o_deshacer(deshacer, 'agregar_usuario', usuario)
+
+    def inscribir_alumno(self, curso, codigo_alumno, registro_notas=None):
+        """
+        Inscribe al alumno en el curso y, si se indica, agrega su registro de notas en la misma operación.
+        """
+        curso['alumnos'].append(codigo_alumno)
+        codigo_curso = curso['codigo_curso']
+        self.alumnos_por_curso.setdefault(codigo_curso, set()).add(codigo_alumno)
+        self.cursos_por_alumno.setdefault(codigo_alumno, set()).add(codigo_curso)
+        if registro_notas is not None:
+            self.notas_por_curso[codigo_curso]['alumnos'].append(registro_notas)
+            self.notas_por_alumno[(codigo_curso, codigo_alumno)] = registro_notas
+
+        def deshacer():
+            curso['alumnos'].pop()
+            if registro_notas is not None:
+                self.notas_por_curso[codigo_curso]['alumnos'].pop()
+            self.reconstruir_indices()
+        self._persistir_o_deshacer(deshacer, 'inscribir_alumno', codigo_curso, codigo_alumno, registro_notas)
+
+    def asignar_profesor(self, curso, codigo_profesor):
+        anterior = curso['profesor']
+        curso['profesor'] = codigo_profesor
+
+        def deshacer():
+            curso['profesor'] = anterior
+        self._persistir_o_deshacer(deshacer, 'asignar_profesor', curso['codigo_curso'], codigo_profesor)
+
+    def actualizar_notas(self, codigo_curso, registro):
+        """
+        Reemplaza las calificaciones del alumno del registro. Retorna False si no tenía notas en el curso.
+        """
+        actual = self.notas_por_alumno.get((codigo_curso, registro['alumno']))
+        if actual is None:
+            return False
+        if actual is not registro:
+            actual.clear()
+            actual.update(registro)
+        self._persistir('guardar_notas', codigo_curso, dict(actual))
+        return True
+
+    def agregar_curso(self, curso, seccion_notas=None):
+        self.db['cursos'].append(curso)
+        self._indexar_curso(curso)
+        if seccion_notas is not None:
+            self.db['notas'].append(seccion_notas)
+            self._indexar_seccion_notas(seccion_notas)
+
+        def deshacer():
+            self.db['cursos'].pop()
+            if seccion_notas is not None:
+                self.db['notas'].pop()
+            self.reconstruir_indices()
+        self._persistir_o_deshacer(deshacer, 'agregar_curso', curso, seccion_notas)
+
+
+#ALMACENAMIENTO **************************************************************************************************************************************
+#
+# Un almacén implementa cargar() y las operaciones por fila que usa RepositorioDB:
+# agregar_usuario, inscribir_alumno, asignar_profesor, guardar_notas y agregar_curso,
+# además de guardar_notas_lote(cambios), que usa la compactación del diario de notas.
+
+# Se usa el loader/dumper en C (libyaml) cuando PyYAML fue compilado con él
+CargadorYAML = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+EscritorYAML = getattr(yaml, "CSafeDumper", yaml.SafeDumper)
+
+VERSION_SNAPSHOT = 2  # 2: JSON en lugar de pickle
+TIEMPOS_CARGA = []  # (archivo, método, segundos, segundos del último parseo YAML)
+
+
+def leer_yaml(ruta):
+    with open(ruta, 'r', encoding="utf-8") as archivo:
+        return yaml.load(archivo, Loader=CargadorYAML)
+
+
+def ruta_snapshot(ruta):
+    carpeta, nombre = os.path.split(ruta)
+    return os.path.join(carpeta, f".{nombre}.snapshot")
+
+
+def _firma_contenido(contenido):
+    return hashlib.blake2b(contenido, digest_size=20).hexdigest()
+
+
+def guardar_snapshot(ruta, contenido, datos, segundos_parseo):
+    """
+    Guarda una copia de los datos en JSON (una línea de cabecera con el tamaño, mtime y hash del YAML de origen
+    y una línea con los datos). Leerla no puede ejecutar código, a diferencia de pickle. Si los datos no pasan
+    por JSON sin cambios (fechas, claves que no son texto) no se guarda snapshot y se sigue parseando el YAML.
+    """
+    serializados = json.dumps(datos, ensure_ascii=False, separators=(',', ':'), default=str)
+    if json.loads(serializados) != datos:
+        return
+    estado = os.stat(ruta)
+    cabecera = {
+        'version': VERSION_SNAPSHOT,
+        'tamano': estado.st_size,
+        'mtime_ns': estado.st_mtime_ns,
+        'hash': _firma_contenido(contenido),
+        'segundos_parseo': segundos_parseo,
+    }
+    destino = ruta_snapshot(ruta)
+    temporal = f"{destino}.tmp"
+    try:
+        descriptor = os.open(temporal, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with open(descriptor, 'w', encoding="utf-8") as archivo:
+            archivo.write(json.dumps(cabecera) + "\n" + serializados)
+        os.replace(temporal, destino)
+    except OSError:
+        pass  # El snapshot es solo una optimización
+
+
+def _leer_snapshot(ruta, estado, contenido):
+    try:
+        with open(ruta_snapshot(ruta), 'r', encoding="utf-8") as archivo:
+            cabecera = json.loads(archivo.readline())
+            if (cabecera.get('version') != VERSION_SNAPSHOT or cabecera['tamano'] != estado.st_size
+                    or cabecera['mtime_ns'] != estado.st_mtime_ns or cabecera['hash'] != _firma_contenido(contenido)):
+                return None, None
+            return cabecera, json.loads(archivo.read())
+    except (OSError, ValueError, KeyError, AttributeError):
+        return None, None
+
+
+def cargar_yaml(ruta):
+    """
+    Carga un YAML usando el snapshot JSON si el archivo no cambió (mismo tamaño, mtime y hash);
+    si cambió, lo parsea con el loader en C y regenera el snapshot.
+    """
+    inicio = time.perf_counter()
+    with open(ruta, 'rb') as archivo:
+        contenido = archivo.read()
+    estado = os.stat(ruta)
+
+    cabecera, datos = _leer_snapshot(ruta, estado, contenido)
+    if cabecera is not None:
+        TIEMPOS_CARGA.append((os.path.basename(ruta), "snapshot", time.perf_counter() - inicio, cabecera['segundos_parseo']))
+        return datos
+
+    inicio_parseo = time.perf_counter()
+    datos = yaml.load(contenido.decode("utf-8"), Loader=CargadorYAML)
+    segundos_parseo = time.perf_counter() - inicio_parseo
+    guardar_snapshot(ruta, contenido, datos, segundos_parseo)
+    metodo = "yaml (C)" if CargadorYAML is not yaml.SafeLoader else "yaml"
+    TIEMPOS_CARGA.append((os.path.basename(ruta), metodo, time.perf_counter() - inicio, segundos_parseo))
+    return datos
+
+
+def reporte_tiempos_carga():
+    """
+    Retorna un texto con cómo se cargó cada archivo y cuánto tardó, comparado con el último parseo YAML.
+    """
+    lineas = []
+    for archivo, metodo, segundos, segundos_parseo in TIEMPOS_CARGA:
+        linea = f"{archivo}: {metodo} en {segundos * 1000:.1f} ms"
+        if metodo == "snapshot" and segundos_parseo:
+            linea += f" (parseo YAML: {segundos_parseo * 1000:.1f} ms, {segundos_parseo / max(segundos, 1e-9):.1f}x)"
+        lineas.append(linea)
+    return "\n".join(lineas)
+
+
+def escribir_yaml(datos, ruta):
+    """
+    Escribe el YAML en un archivo temporal y lo renombra, para que un corte a mitad no deje el archivo truncado.
+    Como ya se tienen los datos en memoria, el snapshot se actualiza en el mismo paso.
+    Retorna la cantidad de bytes escritos.
+    """
+    contenido = yaml.dump(datos, Dumper=EscritorYAML, default_flow_style=False, allow_unicode=True).encode("utf-8")
+    temporal = f"{ruta}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(temporal, 'wb') as archivo:
+        archivo.write(contenido)
+        archivo.flush()
+        os.fsync(archivo.fileno())
+    os.replace(temporal, ruta)
+    guardar_snapshot(ruta, contenido, datos, None)
+    return len(contenido)
+
+
+class AlmacenYAML:
+    """
+    Almacenamiento original: todo database.yaml se reescribe en cada cambio.
+    Las operaciones reciben los datos ya aplicados sobre el mismo diccionario que retornó cargar().
+    """
+
+    def __init__(self, ruta=None):
+        self.ruta = ruta or ruta_datos("database.yaml")
+        self.db = None
+        self._lock = threading.Lock()  # Toda escritura de database.yaml (altas y compactación del diario)
+
+    def cargar(self):
+        self.db = cargar_yaml(self.ruta)
+        return self.db
+
+    def _guardar(self, *args):
+        with self._lock:
+            escribir_yaml(self.db, self.ruta)
+
+    agregar_usuario = _guardar
+    inscribir_alumno = _guardar
+    asignar_profesor = _guardar
+    guardar_notas = _guardar
+    agregar_curso = _guardar
+
+    def guardar_notas_lote(self, cambios):
+        """
+        Vuelca los cambios [(codigo_curso, registro)] del diario. Si la base ya está cargada, la copia en memoria
+        tiene esas notas (y quizá otras más nuevas), así que se escribe tal cual; si no, se aplican sobre el archivo.
+        Se hace con el mismo lock que las altas, para que ninguna escritura pise a la otra.
+        """
+        with self._lock:
+            if self.db is not None:
+                escribir_yaml(self.db, self.ruta)
+                return
+            base = leer_yaml(self.ruta)
+            registros = {
+                (seccion['curso'], registro['alumno']): registro
+                for seccion in base.get('notas') or [] for registro in seccion.get('alumnos', [])
+            }
+            for codigo_curso, registro in cambios:
+                actual = registros.get((codigo_curso, registro['alumno']))
+                if actual is not None:
+                    actual.clear()
+                    actual.update(registro)
+            escribir_yaml(base, self.ruta)
+
+
+ESQUEMA_SQLITE = """
+CREATE TABLE IF NOT EXISTS usuarios (
+    codigo INTEGER NOT NULL UNIQUE,  -- sin PRIMARY KEY para no reemplazar al rowid, que guarda el orden
+    mac TEXT,
+    rol TEXT,
+    datos TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS usuarios_mac ON usuarios(mac);
+CREATE TABLE IF NOT EXISTS servidores (
+    codigo_servidor TEXT PRIMARY KEY,
+    datos TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS cursos (
+    codigo_curso TEXT PRIMARY KEY,
+    nombre TEXT NOT NULL,
+    profesor TEXT NOT NULL,
+    servidor TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS inscripciones (
+    codigo_curso TEXT NOT NULL REFERENCES cursos(codigo_curso),
+    codigo_alumno INTEGER NOT NULL,
+    PRIMARY KEY (codigo_curso, codigo_alumno)
+);
+CREATE INDEX IF NOT EXISTS inscripciones_alumno ON inscripciones(codigo_alumno);
+CREATE TABLE IF NOT EXISTS secciones_notas (
+    codigo_curso TEXT PRIMARY KEY,
+    nombre TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS notas (
+    codigo_curso TEXT NOT NULL REFERENCES secciones_notas(codigo_curso),
+    codigo_alumno INTEGER NOT NULL,
+    calificaciones TEXT NOT NULL,
+    PRIMARY KEY (codigo_curso, codigo_alumno)
+);
+"""
+
+
+class AlmacenSQLite:
+    """
+    Almacenamiento en SQLite con tablas indexadas de usuarios, cursos, inscripciones, servidores y notas.
+    Cada cambio se aplica como una actualización por fila dentro de una transacción.
+    Los campos que no tienen columna propia se guardan como JSON, así que cargar() devuelve
+    exactamente la misma estructura que database.yaml.
+    """
+
+    def __init__(self, ruta=None):
+        self.ruta = ruta or ruta_datos("database.sqlite3")
+        self.conexion = sqlite3.connect(self.ruta, check_same_thread=False)
+        self.conexion.execute("PRAGMA journal_mode=WAL")
+        self.conexion.execute("PRAGMA foreign_keys=ON")
+        self.conexion.executescript(ESQUEMA_SQLITE)
+        self._lock = threading.Lock()
+
+    def vacio(self):
+        return self.conexion.execute("SELECT COUNT(*) FROM usuarios").fetchone()[0] == 0
+
+    def cargar(self):
+        with self._lock:
+            c = self.conexion
+            usuarios = [json.loads(datos) for (datos,) in c.execute("SELECT datos FROM usuarios ORDER BY rowid")]
+            servidores = [json.loads(datos) for (datos,) in c.execute("SELECT datos FROM servidores ORDER BY rowid")]
+
+            alumnos = {}
+            for codigo_curso, codigo_alumno in c.execute("SELECT codigo_curso, codigo_alumno FROM inscripciones ORDER BY rowid"):
+                alumnos.setdefault(codigo_curso, []).append(codigo_alumno)
+            cursos = [
+                {
+                    'alumnos': alumnos.get(codigo_curso, []),
+                    'codigo_curso': codigo_curso,
+                    'nombre': nombre,
+                    'profesor': json.loads(profesor),
+                    'servidor': json.loads(servidor),
+                }
+                for codigo_curso, nombre, profesor, servidor
+                in c.execute("SELECT codigo_curso, nombre, profesor, servidor FROM cursos ORDER BY rowid")
+            ]
+
+            registros = {}
+            for codigo_curso, codigo_alumno, calificaciones in c.execute(
+                    "SELECT codigo_curso, codigo_alumno, calificaciones FROM notas ORDER BY rowid"):
+                registros.setdefault(codigo_curso, []).append({'alumno': codigo_alumno, **json.loads(calificaciones)})
+            notas = [
+                {'alumnos': registros.get(codigo_curso, []), 'curso': codigo_curso, 'nombre': nombre}
+                for codigo_curso, nombre in c.execute("SELECT codigo_curso, nombre FROM secciones_notas ORDER BY rowid")
+            ]
+
+        return {'usuarios': usuarios, 'cursos': cursos, 'servidores': servidores, 'notas': notas}
+
+    # Operaciones por fila ------------------------------------------------------------------------------------------------
+
+    def _insertar_usuario(self, usuario):
+        self.conexion.execute(
+            "INSERT INTO usuarios (codigo, mac, rol, datos) VALUES (?, ?, ?, ?)",
+            (usuario['codigo'], usuario.get('mac'), usuario.get('rol'), json.dumps(usuario))
+        )
+
+    def _insertar_registro_notas(self, codigo_curso, registro):
+        calificaciones = {k: v for k, v in registro.items() if k != 'alumno'}
+        self.conexion.execute(
+            "INSERT INTO notas (codigo_curso, codigo_alumno, calificaciones) VALUES (?, ?, ?)",
+            (codigo_curso, registro['alumno'], json.dumps(calificaciones))
+        )
+
+    def _insertar_curso(self, curso, seccion_notas):
+        self.conexion.execute(
+            "INSERT INTO cursos (codigo_curso, nombre, profesor, servidor) VALUES (?, ?, ?, ?)",
+            (curso['codigo_curso'], curso['nombre'], json.dumps(curso['profesor']), json.dumps(curso.get('servidor') or []))
+        )
+        self.conexion.executemany(
+            "INSERT INTO inscripciones (codigo_curso, codigo_alumno) VALUES (?, ?)",
+            [(curso['codigo_curso'], codigo_alumno) for codigo_alumno in curso.get('alumnos', [])]
+        )
+        if seccion_notas is not None:
+            self.conexion.execute(
+                "INSERT INTO secciones_notas (codigo_curso, nombre) VALUES (?, ?)",
+                (seccion_notas['curso'], seccion_notas.get('nombre', ''))
+            )
+            for registro in seccion_notas.get('alumnos', []):
+                self._insertar_registro_notas(seccion_notas['curso'], registro)
+
+    def agregar_usuario(self, usuario):
+        with self._lock, self.conexion:
+            self._insertar_usuario(usuario)
+
+    def inscribir_alumno(self, codigo_curso, codigo_alumno, registro_notas=None):
+        with self._lock, self.conexion:
+            self.conexion.execute(
+                "INSERT INTO inscripciones (codigo_curso, codigo_alumno) VALUES (?, ?)",
+                (codigo_curso, codigo_alumno)
+            )
+            if registro_notas is not None:
+                self._insertar_registro_notas(codigo_curso, registro_notas)
+
+    def asignar_profesor(self, codigo_curso, codigo_profesor):
+        with self._lock, self.conexion:
+            self.conexion.execute(
+                "UPDATE cursos SET profesor = ? WHERE codigo_curso = ?",
+                (json.dumps(codigo_profesor), codigo_curso)
+            )
+
+    def guardar_notas(self, codigo_curso, registro):
+        calificaciones = {k: v for k, v in registro.items() if k != 'alumno'}
+        with self._lock, self.conexion:
+            self.conexion.execute(
+                "UPDATE notas SET calificaciones = ? WHERE codigo_curso = ? AND codigo_alumno = ?",
+                (json.dumps(calificaciones), codigo_curso, registro['alumno'])
+            )
+
+    def guardar_notas_lote(self, cambios):
+        with self._lock, self.conexion:
+            self.conexion.executemany(
+                "UPDATE notas SET calificaciones = ? WHERE codigo_curso = ? AND codigo_alumno = ?",
+                [
+                    (json.dumps({k: v for k, v in registro.items() if k != 'alumno'}), codigo_curso, registro['alumno'])
+                    for codigo_curso, registro in cambios
+                ]
+            )
+
+    def agregar_curso(self, curso, seccion_notas=None):
+        with self._lock, self.conexion:
+            self._insertar_curso(curso, seccion_notas)
+
+    # Migración -----------------------------------------------------------------------------------------------------------
+
+    def importar_yaml(self, ruta=None):
+        """
+        Reemplaza el contenido de la base SQLite por el de un database.yaml, en una sola transacción.
+        """
+        db = leer_yaml(ruta or ruta_datos("database.yaml")) or {}
+        with self._lock, self.conexion:
+            for tabla in ('notas', 'secciones_notas', 'inscripciones', 'cursos', 'servidores', 'usuarios'):
+                self.conexion.execute(f"DELETE FROM {tabla}")
+            for usuario in db.get('usuarios') or []:
+                self._insertar_usuario(usuario)
+            for servidor in db.get('servidores') or []:
+                self.conexion.execute(
+                    "INSERT INTO servidores (codigo_servidor, datos) VALUES (?, ?)",
+                    (servidor['codigo_servidor'], json.dumps(servidor))
+                )
+            secciones = {seccion['curso']: seccion for seccion in db.get('notas') or []}
+            for curso in db.get('cursos') or []:
+                self._insertar_curso(curso, secciones.pop(curso['codigo_curso'], None))
+            for seccion in secciones.values():  # Notas de cursos que no figuran en 'cursos'
+                self.conexion.execute(
+                    "INSERT INTO secciones_notas (codigo_curso, nombre) VALUES (?, ?)",
+                    (seccion['curso'], seccion.get('nombre', ''))
+                )
+                for registro in seccion.get('alumnos', []):
+                    self._insertar_registro_notas(seccion['curso'], registro)
+
+    def exportar_yaml(self, ruta=None):
+        escribir_yaml(self.cargar(), ruta or ruta_datos("database.yaml"))
+
+    def cerrar(self):
+        self.conexion.close()
+
+
+#DIARIO DE NOTAS *************************************************************************************************************************************
+
+INTERVALO_FSYNC = 0.05     # Segundos que el escritor espera para juntar varias notas en un solo fsync
+UMBRAL_COMPACTACION = 200  # Registros en el diario antes de volcarlos al almacenamiento principal
+
+
+class DiarioNotas:
+    """
+    Diario de escritura anticipada para las notas: cada cambio se agrega como una línea JSON
+    y varios cambios concurrentes comparten un mismo fsync. Una compactación en segundo plano
+    vuelca el diario al almacenamiento principal y lo vacía.
+    """
+
+    def __init__(self, almacen, ruta=None, intervalo_fsync=INTERVALO_FSYNC,
+                 umbral_compactacion=UMBRAL_COMPACTACION):
+        self.almacen = almacen
+        self.ruta = ruta or ruta_datos("notas.journal")
+        self.ruta_compactando = f"{self.ruta}.compactando"
+        self.intervalo_fsync = intervalo_fsync
+        self.umbral_compactacion = umbral_compactacion
+        self.registros_en_diario = len(self.leer(self.ruta))
+        self.fsyncs = 0
+        self.compactaciones = 0
+        self._pendientes = []  # (línea, evento)
+        self._cond = threading.Condition()
+        self._lock_compactacion = threading.Lock()  # Protege el archivo abierto del diario
+        self._lock_volcado = threading.Lock()       # Evita leer la base a mitad de una compactación
+        self._archivo = open(self.ruta, 'a', encoding="utf-8")
+        threading.Thread(target=self._escritor, name="diario-notas", daemon=True).start()
+        # Un diario que quedó con datos de la ejecución anterior se compacta al arrancar
+        if self.registros_en_diario or os.path.exists(self.ruta_compactando):
+            self.compactar_en_segundo_plano()
+
+    @staticmethod
+    def leer(ruta):
+        """
+        Retorna los cambios [(codigo_curso, registro)] del archivo, ignorando una última línea incompleta.
+        """
+        cambios = []
+        if not os.path.exists(ruta):
+            return cambios
+        with open(ruta, 'r', encoding="utf-8") as archivo:
+            for linea in archivo:
+                try:
+                    entrada = json.loads(linea)
+                except json.JSONDecodeError:
+                    continue  # Línea cortada por una caída a mitad de escritura
+                cambios.append((entrada['curso'], entrada['registro']))
+        return cambios
+
+    def cargar(self):
+        """
+        Carga la base del almacén principal y le superpone los cambios del diario que todavía no fueron compactados.
+        """
+        with self._lock_volcado:
+            return self._superponer(self.almacen.cargar())
+
+    def _superponer(self, db):
+        registros = {
+            (seccion['curso'], registro['alumno']): registro
+            for seccion in db.get('notas') or [] for registro in seccion.get('alumnos', [])
+        }
+        for codigo_curso, registro in self.leer(self.ruta_compactando) + self.leer(self.ruta):
+            actual = registros.get((codigo_curso, registro['alumno']))
+            if actual is not None:
+                actual.clear()
+                actual.update(registro)
+        return db
+
+    def registrar(self, codigo_curso, registro, esperar=True):
+        """
+        Agrega el cambio al diario. Con esperar=True retorna cuando el cambio ya pasó por fsync.
+        """
+        linea = json.dumps({'curso': codigo_curso, 'registro': registro}, ensure_ascii=False) + "\n"
+        evento = threading.Event()
+        with self._cond:
+            self._pendientes.append((linea, evento))
+            self._cond.notify()
+        if esperar:
+            evento.wait()
+
+    def _escritor(self):
+        while True:
+            with self._cond:
+                while not self._pendientes:
+                    self._cond.wait()
+                concurrentes = len(self._pendientes) > 1
+            # Solo si hay varios escritores vale la pena esperar a que lleguen más cambios para el mismo fsync
+            if concurrentes:
+                time.sleep(self.intervalo_fsync)
+            with self._cond:
+                lote, self._pendientes = self._pendientes, []
+            with self._lock_compactacion:
+                self._archivo.writelines(linea for linea, _ in lote)
+                self._archivo.flush()
+                os.fsync(self._archivo.fileno())
+                self.fsyncs += 1
+                self.registros_en_diario += len(lote)
+            for _, evento in lote:
+                evento.set()
+            if self.registros_en_diario >= self.umbral_compactacion:
+                self.compactar_en_segundo_plano()
+
+    def compactar_en_segundo_plano(self):
+        threading.Thread(target=self.compactar, name="compactar-notas", daemon=True).start()
+
+    def compactar(self):
+        """
+        Rota el diario, vuelca sus cambios al almacenamiento principal y borra el archivo rotado.
+        Las notas nuevas siguen entrando al diario mientras dura la compactación.
+        """
+        with self._lock_volcado:
+            self._compactar()
+
+    def _compactar(self):
+        with self._lock_compactacion:
+            if not os.path.exists(self.ruta_compactando):
+                if self.registros_en_diario == 0:
+                    return
+                self._archivo.close()
+                os.replace(self.ruta, self.ruta_compactando)
+                self._archivo = open(self.ruta, 'a', encoding="utf-8")
+                self.registros_en_diario = 0
+
+        # Solo se conserva el último cambio de cada alumno
+        cambios = {}
+        for codigo_curso, registro in self.leer(self.ruta_compactando):
+            cambios[(codigo_curso, registro['alumno'])] = (codigo_curso, registro)
+        if cambios:
+            self.almacen.guardar_notas_lote(list(cambios.values()))
+        os.remove(self.ruta_compactando)
+        self.compactaciones += 1
+
+
+class AlmacenConDiario:
+    """
+    Envuelve un almacén para que las notas vayan al DiarioNotas en vez de reescribir el almacén completo.
+    El resto de operaciones se delega tal cual.
+    """
+
+    def __init__(self, almacen, ruta_diario=None):
+        self.almacen = almacen
+        self.diario = DiarioNotas(almacen, ruta_diario)
+
+    def __getattr__(self, nombre):
+        return getattr(self.almacen, nombre)
+
+    def cargar(self):
+        return self.diario.cargar()
+
+    def guardar_notas(self, codigo_curso, registro):
+        self.diario.registrar(codigo_curso, registro)
+
+
+def crear_almacen(tipo=None, diario=None):
+    """
+    Crea el almacenamiento indicado por 'tipo' o por la variable SDN_ALMACEN ('yaml' por defecto, o 'sqlite').
+    La primera vez que se usa SQLite, se importa automáticamente el database.yaml existente.
+    Salvo que SDN_DIARIO_NOTAS sea '0', las notas pasan por el diario (ver DiarioNotas).
+    """
+    tipo = tipo or os.environ.get("SDN_ALMACEN", "yaml")
+    if diario is None:
+        diario = os.environ.get("SDN_DIARIO_NOTAS", "1") != "0"
+
+    if tipo == "sqlite":
+        almacen = AlmacenSQLite()
+        if almacen.vacio() and os.path.exists(ruta_datos("database.yaml")):
+            almacen.importar_yaml()
+    else:
+        almacen = AlmacenYAML()
+
+    return AlmacenConDiario(almacen) if diario else almacen
+
+
+#RUTAS ***********************************************************************************************************************************************
+
+INTERVALO_RUTAS = float(os.environ.get("SDN_INTERVALO_RUTAS", "0.2"))  # Segundos para juntar varios cambios en una escritura
+
+# Campo que identifica a cada entrada de las listas de rutas.yaml
+CLAVES_RUTAS = {'usuarios': 'codigo', 'servidores': 'codigo_servidor'}
+
+
+class AlmacenRutas:
+    """
+    Guarda rutas.yaml solo si alguna entrada cambió respecto a lo último guardado. Los cambios que llegan
+    seguidos se juntan y un hilo en segundo plano los escribe de una vez (archivo temporal + rename).
+    Con intervalo=0 se escribe en el mismo guardar().
+    """
+
+    def __init__(self, ruta=None, intervalo=INTERVALO_RUTAS):
+        self._ruta = ruta
+        self.intervalo = intervalo
+        self.escrituras = 0
+        self.bytes_escritos = 0
+        self.omitidas = 0             # Llamadas a guardar() sin cambios
+        self.entradas_cambiadas = 0
+        self._firmas = {}             # (lista, clave) -> JSON de la entrada tal como se guardó
+        self._pendiente = None        # Copia de rutas esperando ser escrita
+        self._cond = threading.Condition()
+        self._lock_escritura = threading.Lock()
+        self._hilo = None
+
+    @property
+    def ruta(self):
+        return self._ruta or ruta_datos("rutas.yaml")
+
+    @staticmethod
+    def firmas(rutas):
+        firmas = {}
+        for lista, valor in rutas.items():
+            clave = CLAVES_RUTAS.get(lista)
+            if clave is None or not isinstance(valor, list):
+                firmas[(lista, None)] = json.dumps(valor, sort_keys=True, default=str)
+                continue
+            for entrada in valor:
+                firmas[(lista, entrada.get(clave))] = json.dumps(entrada, sort_keys=True, default=str)
+        return firmas
+
+    def cargar(self):
+        rutas = cargar_yaml(self.ruta)
+        with self._cond:
+            self._firmas = self.firmas(rutas)
+        return rutas
+
+    def guardar(self, rutas, lock=None):
+        """
+        Programa la escritura de rutas si cambió alguna entrada. Retorna la cantidad de entradas cambiadas.
+        Si otros hilos modifican rutas, lock es el que protege esas modificaciones (o el llamador ya lo tiene
+        tomado y no lo pasa): las firmas y la copia que se escribe salen de la misma lectura.
+        """
+        with lock or nullcontext():
+            firmas = self.firmas(rutas)
+            with self._cond:
+                cambiadas = sum(1 for clave in firmas.keys() | self._firmas.keys()
+                                if firmas.get(clave) != self._firmas.get(clave))
+                if not cambiadas:
+                    self.omitidas += 1
+                    return 0
+                self._firmas = firmas
+                self.entradas_cambiadas += cambiadas
+                self._pendiente = deepcopy(rutas)
+                if self.intervalo and self._hilo is None:
+                    self._hilo = threading.Thread(target=self._escritor, name="escritor-rutas", daemon=True)
+                    self._hilo.start()
+                    atexit.register(self.vaciar)
+                self._cond.notify()
+        if not self.intervalo:
+            self.vaciar()
+        return cambiadas
+
+    def _escritor(self):
+        while True:
+            with self._cond:
+                while self._pendiente is None:
+                    self._cond.wait()
+            time.sleep(self.intervalo)  # Deja que lleguen más cambios para la misma escritura
+            self.vaciar()
+
+    def vaciar(self):
+        """
+        Escribe ya los cambios pendientes, si los hay.
+        """
+        with self._lock_escritura:
+            with self._cond:
+                datos, self._pendiente = self._pendiente, None
+            if datos is None:
+                return False
+            self.bytes_escritos += escribir_yaml(datos, self.ruta)
+            self.escrituras += 1
+            return True
+
+    def estadisticas(self):
+        return {
+            'escrituras': self.escrituras,
+            'bytes_escritos': self.bytes_escritos,
+            'omitidas': self.omitidas,
+            'entradas_cambiadas': self.entradas_cambiadas,
+        }
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Migra la base de datos entre database.yaml y SQLite.")
+    parser.add_argument("accion", choices=["importar", "exportar"])
+    parser.add_argument("--yaml", default=ruta_datos("database.yaml"))
+    parser.add_argument("--sqlite", default=ruta_datos("database.sqlite3"))
+    args = parser.parse_args()
+
+    almacen = AlmacenSQLite(args.sqlite)
+    if args.accion == "importar":
+        almacen.importar_yaml(args.yaml)
+        print(f"Importado {args.yaml} en {args.sqlite}")
+    else:
+        almacen.exportar_yaml(args.yaml)
+        print(f"Exportado {args.sqlite} a {args.yaml}")
+    almacen.cerrar()
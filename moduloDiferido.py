@@ -0,0 +1,110 @@
+import importlib
+import os
+import re
+import subprocess
+import sys
+
+#IMPORTACIÓN DIFERIDA ********************************************************************************************************************************
+#
+# paramiko (y con él cryptography), requests y tabulate tardan cientos de milisegundos en importarse.
+# Con estos envoltorios solo se cargan la primera vez que realmente se usan.
+
+class ModuloDiferido:
+    """
+    Representa un módulo que se importa recién cuando se accede al primero de sus atributos.
+    """
+
+    def __init__(self, nombre):
+        self.__dict__['_nombre'] = nombre
+        self.__dict__['_modulo'] = None
+
+    def _cargar(self):
+        modulo = self.__dict__['_modulo']
+        if modulo is None:
+            modulo = importlib.import_module(self._nombre)  # import_module ya es seguro entre hilos
+            self.__dict__['_modulo'] = modulo
+        return modulo
+
+    def __getattr__(self, atributo):
+        return getattr(self._cargar(), atributo)
+
+    def __repr__(self):
+        estado = "cargado" if self.__dict__['_modulo'] is not None else "sin cargar"
+        return f"<módulo diferido {self._nombre} ({estado})>"
+
+
+def importar_diferido(nombre):
+    return ModuloDiferido(nombre)
+
+
+def funcion_diferida(nombre_modulo, nombre_funcion):
+    """
+    Retorna una función que importa 'nombre_modulo' en su primera llamada y delega en 'nombre_funcion'.
+    """
+    modulo = ModuloDiferido(nombre_modulo)
+
+    def envoltura(*args, **kwargs):
+        return getattr(modulo, nombre_funcion)(*args, **kwargs)
+
+    envoltura.__name__ = nombre_funcion
+    return envoltura
+
+
+#PRESUPUESTO DE IMPORTACIÓN **************************************************************************************************************************
+
+PRESUPUESTO_MS = 150  # Tiempo máximo para importar moduloAuth
+MODULOS_PESADOS = ("paramiko", "cryptography", "requests", "urllib3", "tabulate")
+
+
+def medir_importacion(modulo="moduloAuth"):
+    """
+    Importa el módulo en un intérprete nuevo con 'python -X importtime' y retorna
+    (milisegundos acumulados del módulo, lista de módulos importados).
+    """
+    resultado = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {modulo}"],
+        capture_output=True, text=True, check=True,
+        cwd=os.path.dirname(os.path.abspath(__file__))  # Los módulos están en la raíz del repositorio
+    )
+    total_us = None
+    importados = []
+    for linea in resultado.stderr.splitlines():
+        coincidencia = re.match(r"import time:\s+\d+ \|\s+(\d+) \| ( *)(\S+)", linea)
+        if not coincidencia:
+            continue
+        acumulado, sangria, nombre = coincidencia.groups()
+        importados.append(nombre)
+        if nombre == modulo and not sangria:
+            total_us = int(acumulado)
+    if total_us is None:
+        raise RuntimeError(f"No se encontró {modulo} en la salida de -X importtime")
+    return total_us / 1000, importados
+
+
+def verificar_presupuesto(modulo="moduloAuth", presupuesto_ms=PRESUPUESTO_MS):
+    """
+    Retorna la lista de problemas encontrados: presupuesto excedido o dependencias pesadas cargadas al importar.
+    """
+    milisegundos, importados = medir_importacion(modulo)
+    problemas = []
+    if milisegundos > presupuesto_ms:
+        problemas.append(f"importar {modulo} tomó {milisegundos:.1f} ms (presupuesto: {presupuesto_ms} ms)")
+    pesados = sorted({nombre.split('.')[0] for nombre in importados} & set(MODULOS_PESADOS))
+    if pesados:
+        problemas.append(f"{modulo} importa al arrancar: {', '.join(pesados)}")
+    print(f"{modulo}: {milisegundos:.1f} ms")
+    return problemas
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Verifica que importar la CLI no exceda el presupuesto de tiempo.")
+    parser.add_argument("--modulo", default="moduloAuth")
+    parser.add_argument("--presupuesto", type=float, default=PRESUPUESTO_MS, help="Milisegundos permitidos")
+    args = parser.parse_args()
+
+    problemas = verificar_presupuesto(args.modulo, args.presupuesto)
+    for problema in problemas:
+        print(f"ERROR: {problema}")
+    sys.exit(1 if problemas else 0)
@@ -0,0 +1,738 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import Counter, OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+
+from moduloDiferido import importar_diferido
+
+requests = importar_diferido("requests")  # Solo se importa al crear el primer cliente
+adaptadores = importar_diferido("requests.adapters")
+
+#CLIENTE FLOODLIGHT **********************************************************************************************************************************
+
+CONTROLADOR = os.environ.get("SDN_CONTROLADOR", "10.20.12.146")  # "ip" o "ip:puerto" (p. ej. el simulador local)
+PUERTO_REST = 8080
+MAX_CONEXIONES = 16  # Conexiones keep-alive por controlador
+MAX_HILOS = 8        # Reglas enviadas en paralelo
+TIMEOUT = 5          # Segundos por petición REST
+LOTE_BORRADO = 32    # Reglas borradas por lote al cerrar sesión
+
+
+def separar_direccion(direccion, puerto=PUERTO_REST):
+    """
+    Separa "ip:puerto" en (ip, puerto). Si no se indica puerto se usa el de la API REST.
+    """
+    host, separador, puerto_texto = str(direccion).rpartition(":")
+    if separador and puerto_texto.isdigit():
+        return host, int(puerto_texto)
+    return str(direccion), puerto
+
+
+class ClienteFloodlight:
+    """
+    Cliente REST de Floodlight con un pool de conexiones persistentes (keep-alive)
+    y un pool acotado de hilos para enviar varias reglas a la vez.
+    """
+
+    def __init__(self, ip_controlador, puerto=PUERTO_REST, max_conexiones=MAX_CONEXIONES,
+                 max_hilos=MAX_HILOS, timeout=TIMEOUT):
+        self.ip_controlador, puerto = separar_direccion(ip_controlador, puerto)
+        self.base_url = f"http://{self.ip_controlador}:{puerto}"
+        self.timeout = timeout
+        self.sesion = requests.Session()
+        adaptador = adaptadores.HTTPAdapter(pool_connections=1, pool_maxsize=max_conexiones)
+        self.sesion.mount("http://", adaptador)
+        self.hilos = ThreadPoolExecutor(max_workers=max_hilos, thread_name_prefix="floodlight")
+
+    def get(self, ruta):
+        return self.sesion.get(self.base_url + ruta, timeout=self.timeout)
+
+    def post(self, ruta, datos):
+        return self.sesion.post(self.base_url + ruta, json=datos, timeout=self.timeout)
+
+    def delete(self, ruta, datos):
+        return self.sesion.delete(self.base_url + ruta, json=datos, timeout=self.timeout)
+
+    def _insertar_regla(self, regla):
+        try:
+            response = self.post("/wm/staticflowpusher/json", regla)
+            if response.status_code == 200:
+                return regla['name'], None
+            return regla['name'], f"HTTP {response.status_code}"
+        except Exception as e:
+            return regla['name'], str(e)
+
+    def insertar_reglas(self, reglas):
+        """
+        Envía las reglas al staticflowpusher de forma concurrente.
+
+        Returns:
+            dict: {'exitosas': [nombres], 'fallidas': [(nombre, motivo)]}
+        """
+        resultado = {'exitosas': [], 'fallidas': []}
+        for nombre, error in self.hilos.map(self._insertar_regla, reglas):
+            if error is None:
+                resultado['exitosas'].append(nombre)
+            else:
+                resultado['fallidas'].append((nombre, error))
+        return resultado
+
+    def _borrar_regla(self, nombre):
+        try:
+            response = self.delete("/wm/staticflowpusher/json", {'name': nombre})
+            if response.status_code == 200:
+                return nombre, None
+            return nombre, f"HTTP {response.status_code}"
+        except Exception as e:
+            return nombre, str(e)
+
+    def borrar_reglas(self, nombres, tamano_lote=LOTE_BORRADO):
+        """
+        Borra las reglas indicadas por nombre, enviando cada lote en paralelo.
+
+        Returns:
+            dict: {'exitosas': [nombres], 'fallidas': [(nombre, motivo)]}
+        """
+        nombres = list(nombres)
+        resultado = {'exitosas': [], 'fallidas': []}
+        for inicio in range(0, len(nombres), tamano_lote):
+            lote = nombres[inicio:inicio + tamano_lote]
+            for nombre, error in self.hilos.map(self._borrar_regla, lote):
+                if error is None:
+                    resultado['exitosas'].append(nombre)
+                else:
+                    resultado['fallidas'].append((nombre, error))
+        return resultado
+
+    def cerrar(self):
+        self.hilos.shutdown(wait=True)
+        self.sesion.close()
+
+
+_clientes = {}
+_clientes_lock = threading.Lock()
+
+
+def obtener_cliente(ip_controlador):
+    """
+    Retorna el cliente compartido para el controlador indicado ("ip" o "ip:puerto"), creándolo la primera vez.
+    """
+    with _clientes_lock:
+        cliente = _clientes.get(ip_controlador)
+        if cliente is None:
+            cliente = ClienteFloodlight(ip_controlador)
+            _clientes[ip_controlador] = cliente
+        return cliente
+
+
+#SNAPSHOT DE DISPOSITIVOS ****************************************************************************************************************************
+
+VIGENCIA_DISPOSITIVOS = 30  # Segundos antes de volver a descargar /wm/device/
+
+
+class SnapshotDispositivos:
+    """
+    Copia en memoria de /wm/device/ indexada por MAC -> attachmentPoints.
+    Solo se vuelve a descargar cuando la copia supera la ventana de vigencia.
+    """
+
+    def __init__(self, obtener_dispositivos, vigencia=VIGENCIA_DISPOSITIVOS):
+        self.obtener_dispositivos = obtener_dispositivos
+        self.vigencia = vigencia
+        self.attachment_por_mac = {}
+        self.instante = None
+        self.descargas = 0
+        self._lock = threading.Lock()
+
+    def vigente(self):
+        return self.instante is not None and time.monotonic() - self.instante < self.vigencia
+
+    def refrescar(self):
+        dispositivos = self.obtener_dispositivos()
+        mapa = {}
+        for dispositivo in dispositivos:
+            macs = dispositivo.get('mac') or [None]
+            # Si varios dispositivos comparten la MAC, gana el primero de la lista
+            mapa.setdefault(macs[0], [
+                {'switchDPID': ap.get('switchDPID'), 'port': ap.get('port')}
+                for ap in dispositivo.get('attachmentPoint', [])
+            ])
+        self.attachment_por_mac = mapa
+        self.instante = time.monotonic()
+        self.descargas += 1
+
+    def mapa(self):
+        """
+        Retorna el diccionario MAC -> attachmentPoints, refrescándolo si está vencido.
+        """
+        with self._lock:
+            if not self.vigente():
+                self.refrescar()
+            return self.attachment_por_mac
+
+    def attachment_points(self, mac):
+        return [dict(ap) for ap in self.mapa().get(mac, [])]
+
+    def invalidar(self):
+        with self._lock:
+            self.instante = None
+
+
+#CACHE DE RUTAS **************************************************************************************************************************************
+
+CAPACIDAD_CACHE_RUTAS = 256  # Rutas (src_dpid, src_port, dst_dpid, dst_port) guardadas como máximo
+TTL_RUTAS = 300              # Segundos que una ruta se considera válida
+INTERVALO_TOPOLOGIA = 5      # Segundos entre comprobaciones de /wm/topology/links
+
+
+def firma_enlaces(enlaces):
+    """
+    Calcula un hash del conjunto de enlaces que no depende del orden en que los devuelve el controlador.
+    """
+    serializados = sorted(json.dumps(enlace, sort_keys=True) for enlace in enlaces)
+    return hashlib.sha256("\n".join(serializados).encode("utf-8")).hexdigest()
+
+
+class CacheRutas:
+    """
+    Cache LRU de rutas con tamaño acotado y TTL. Se vacía por completo cuando cambia
+    el hash de los enlaces reportados por el controlador.
+    """
+
+    def __init__(self, obtener_enlaces, capacidad=CAPACIDAD_CACHE_RUTAS, ttl=TTL_RUTAS,
+                 intervalo_topologia=INTERVALO_TOPOLOGIA):
+        self.obtener_enlaces = obtener_enlaces
+        self.capacidad = capacidad
+        self.ttl = ttl
+        self.intervalo_topologia = intervalo_topologia
+        self.entradas = OrderedDict()  # clave -> (instante, ruta)
+        self.firma = None
+        self.ultima_verificacion = None
+        self.aciertos = 0
+        self.fallos = 0
+        self.invalidaciones = 0
+        self._lock = threading.Lock()
+
+    def verificar_topologia(self, forzar=False):
+        """
+        Descarga los enlaces y vacía la cache si el conjunto cambió desde la última comprobación.
+        """
+        ahora = time.monotonic()
+        if not forzar and self.ultima_verificacion is not None and ahora - self.ultima_verificacion < self.intervalo_topologia:
+            return
+        enlaces = self.obtener_enlaces()
+        self.ultima_verificacion = ahora
+        if enlaces is None:
+            return  # Sin respuesta del controlador: se conserva lo que había
+        firma = firma_enlaces(enlaces)
+        with self._lock:
+            if self.firma is not None and firma != self.firma:
+                self.entradas.clear()
+                self.invalidaciones += 1
+            self.firma = firma
+
+    def obtener(self, clave):
+        self.verificar_topologia()
+        with self._lock:
+            entrada = self.entradas.get(clave)
+            if entrada is None or time.monotonic() - entrada[0] >= self.ttl:
+                self.entradas.pop(clave, None)
+                self.fallos += 1
+                return None
+            self.entradas.move_to_end(clave)
+            self.aciertos += 1
+            return entrada[1]
+
+    def guardar(self, clave, ruta):
+        with self._lock:
+            self.entradas[clave] = (time.monotonic(), ruta)
+            self.entradas.move_to_end(clave)
+            while len(self.entradas) > self.capacidad:
+                self.entradas.popitem(last=False)
+
+    def invalidar(self):
+        with self._lock:
+            self.entradas.clear()
+            self.invalidaciones += 1
+
+
+#MOTOR DE RUTAS LOCAL ********************************************************************************************************************************
+
+class ArbolRutas:
+    """
+    Árbol de caminos más cortos (en saltos) hacia un switch raíz, normalmente el de un servidor.
+    padre[dpid] = (siguiente switch hacia la raíz, puerto de salida local, puerto de entrada en el siguiente).
+    """
+
+    def __init__(self, raiz, adyacencias):
+        self.raiz = raiz
+        self.padre = {raiz: None}
+        self.distancia = {raiz: 0}
+        self.caminos = {}  # dpid origen -> [(dpid, puerto hacia la raíz, puerto de entrada en el siguiente)]
+        self.equivalentes = {}  # (dpid origen, k) -> lista de caminos de igual costo con el mismo formato
+        cola = deque([raiz])
+        while cola:
+            actual = cola.popleft()
+            for puerto_local, vecino, puerto_vecino in adyacencias.get(actual, ()):
+                if vecino not in self.padre:
+                    self.padre[vecino] = (actual, puerto_vecino, puerto_local)
+                    self.distancia[vecino] = self.distancia[actual] + 1
+                    cola.append(vecino)
+
+    def usa_enlace(self, enlace):
+        a, puerto_a, b, puerto_b = enlace
+        return self.padre.get(a) == (b, puerto_a, puerto_b) or self.padre.get(b) == (a, puerto_b, puerto_a)
+
+    def mejora_con(self, enlace):
+        """
+        Indica si un enlace nuevo acorta algún camino del árbol (o conecta un switch que no era alcanzable).
+        """
+        a, _, b, _ = enlace
+        if (a in self.distancia) != (b in self.distancia):
+            return True
+        if a not in self.distancia:
+            return False
+        return abs(self.distancia[a] - self.distancia[b]) > 1
+
+    def camino(self, origen):
+        tramos = self.caminos.get(origen)
+        if tramos is None and origen in self.padre:
+            tramos = []
+            actual = origen
+            while self.padre[actual] is not None:
+                siguiente, puerto_salida, puerto_entrada = self.padre[actual]
+                tramos.append((actual, puerto_salida, puerto_entrada))
+                actual = siguiente
+            self.caminos[origen] = tramos
+        return tramos
+
+
+def normalizar_enlaces(enlaces):
+    """
+    Convierte la respuesta de /wm/topology/links/json en un conjunto de tuplas (dpid_a, puerto_a, dpid_b, puerto_b).
+    Floodlight reporta cada enlace bidireccional una sola vez, pero por si acaso se ignoran los duplicados invertidos.
+    """
+    normalizados = set()
+    for enlace in enlaces or []:
+        a, puerto_a = enlace['src-switch'], enlace['src-port']
+        b, puerto_b = enlace['dst-switch'], enlace['dst-port']
+        if (b, puerto_b, a, puerto_a) not in normalizados:
+            normalizados.add((a, puerto_a, b, puerto_b))
+    return normalizados
+
+
+class MotorRutas:
+    """
+    Calcula las rutas localmente sobre el grafo de switches y enlaces del controlador, sin llamar a
+    /wm/topology/route/ en cada acceso. Mantiene un árbol de caminos más cortos por switch destino
+    (se precalculan los de los servidores), así que cada consulta es una búsqueda en diccionario.
+    Cuando cambian los enlaces solo se recalculan los árboles afectados.
+    """
+
+    def __init__(self, obtener_enlaces, obtener_switches, intervalo_topologia=INTERVALO_TOPOLOGIA):
+        self.obtener_enlaces = obtener_enlaces
+        self.obtener_switches = obtener_switches
+        self.intervalo_topologia = intervalo_topologia
+        self.enlaces = None   # Conjunto normalizado; None mientras no se haya podido descargar
+        self.switches = set()
+        self.adyacencias = {}
+        self.arboles = {}     # dpid raíz -> ArbolRutas
+        self.ultima_verificacion = None
+        self.recalculos = 0
+        self.consultas = 0
+        self._lock = threading.Lock()
+
+    def _construir_adyacencias(self):
+        adyacencias = {dpid: [] for dpid in self.switches}
+        for a, puerto_a, b, puerto_b in sorted(self.enlaces, key=str):
+            adyacencias.setdefault(a, []).append((puerto_a, b, puerto_b))
+            adyacencias.setdefault(b, []).append((puerto_b, a, puerto_a))
+        self.adyacencias = adyacencias
+
+    def actualizar(self, forzar=False):
+        """
+        Descarga switches y enlaces y, si cambiaron, recalcula solo los árboles que usaban un enlace
+        caído o que se acortan con un enlace nuevo; en los demás se descartan los caminos de igual costo.
+        """
+        ahora = time.monotonic()
+        if not forzar and self.ultima_verificacion is not None and ahora - self.ultima_verificacion < self.intervalo_topologia:
+            return
+        enlaces = self.obtener_enlaces()
+        switches = self.obtener_switches()
+        self.ultima_verificacion = ahora
+        if enlaces is None:
+            return  # Sin respuesta del controlador: se conserva el grafo anterior
+
+        nuevos = normalizar_enlaces(enlaces)
+        with self._lock:
+            if switches is not None:
+                self.switches = {switch['switchDPID'] for switch in switches}
+            if nuevos == self.enlaces:
+                return
+            anteriores = self.enlaces or set()
+            caidos, agregados = anteriores - nuevos, nuevos - anteriores
+            self.enlaces = nuevos
+            self._construir_adyacencias()
+            for raiz, arbol in list(self.arboles.items()):
+                if any(arbol.usa_enlace(e) for e in caidos) or any(arbol.mejora_con(e) for e in agregados):
+                    self.arboles[raiz] = ArbolRutas(raiz, self.adyacencias)
+                    self.recalculos += 1
+                else:
+                    # Los caminos de igual costo pueden pasar por enlaces que no son del árbol
+                    arbol.equivalentes = {}
+
+    def arbol(self, raiz):
+        with self._lock:
+            arbol = self.arboles.get(raiz)
+            if arbol is None:
+                arbol = ArbolRutas(raiz, self.adyacencias)
+                self.arboles[raiz] = arbol
+            return arbol
+
+    def precalcular(self, raices):
+        self.actualizar()
+        for raiz in set(raices):
+            self.arbol(raiz)
+
+    def ruta(self, src_dpid, src_port, dst_dpid, dst_port):
+        """
+        Retorna la ruta con el mismo formato que /wm/topology/route/ (puerto de entrada y de salida por switch),
+        o None si no se conoce la topología o no hay camino.
+        """
+        self.actualizar()
+        if self.enlaces is None:
+            return None
+        self.consultas += 1
+        tramos = self.arbol(dst_dpid).camino(src_dpid)
+        if tramos is None:
+            return None
+        return self._armar_ruta(tramos, src_port, dst_dpid, dst_port)
+
+    @staticmethod
+    def _armar_ruta(tramos, src_port, dst_dpid, dst_port):
+        ruta = []
+        puerto_entrada = src_port
+        for dpid, puerto_salida, entrada_siguiente in tramos:
+            ruta.append({'switch': dpid, 'port': {'portNumber': puerto_entrada}})
+            ruta.append({'switch': dpid, 'port': {'portNumber': puerto_salida}})
+            puerto_entrada = entrada_siguiente
+        ruta.append({'switch': dst_dpid, 'port': {'portNumber': puerto_entrada}})
+        ruta.append({'switch': dst_dpid, 'port': {'portNumber': dst_port}})
+        return ruta
+
+    def rutas_equivalentes(self, src_dpid, src_port, dst_dpid, dst_port, k):
+        """
+        Retorna hasta k rutas de igual costo (mínimo número de saltos) entre los dos puntos, en un orden estable.
+        Se recorren los vecinos que quedan un salto más cerca del destino según su árbol; los enlaces
+        paralelos entre dos switches cuentan como caminos distintos.
+        """
+        self.actualizar()
+        if self.enlaces is None:
+            return []
+        arbol = self.arbol(dst_dpid)
+        if src_dpid not in arbol.distancia:
+            return []
+        self.consultas += 1
+
+        caminos = arbol.equivalentes.get((src_dpid, k))
+        if caminos is None:
+            caminos = []
+            pila = [(src_dpid, [])]
+            while pila and len(caminos) < k:
+                actual, tramos = pila.pop()
+                if actual == dst_dpid:
+                    caminos.append(tramos)
+                    continue
+                siguientes = [
+                    (vecino, tramos + [(actual, puerto_local, puerto_vecino)])
+                    for puerto_local, vecino, puerto_vecino in self.adyacencias.get(actual, ())
+                    if arbol.distancia.get(vecino) == arbol.distancia[actual] - 1
+                ]
+                pila.extend(reversed(siguientes))
+            arbol.equivalentes[(src_dpid, k)] = caminos
+        return [self._armar_ruta(tramos, src_port, dst_dpid, dst_port) for tramos in caminos]
+
+
+#REPARTO ENTRE CAMINOS DE IGUAL COSTO ****************************************************************************************************************
+
+def firma_ruta(ruta):
+    return tuple((salto['switch'], salto['port']['portNumber']) for salto in ruta[1:-1])
+
+
+class RepartoRutas:
+    """
+    Reparte las sesiones entre varios caminos de igual costo hacia un mismo servidor, con un hash de la MAC
+    del usuario (el mismo usuario siempre cae en el mismo camino), y cuenta cuántas sesiones usa cada camino.
+    """
+
+    def __init__(self):
+        self.sesiones_por_camino = Counter()  # firma del camino -> sesiones que lo usan
+        self.caminos_por_sesion = {}          # sesion -> set(firmas)
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def elegir(caminos, clave):
+        resumen = hashlib.blake2b(str(clave).encode("utf-8"), digest_size=8).digest()
+        return caminos[int.from_bytes(resumen, "big") % len(caminos)]
+
+    def asignar(self, sesion, ruta):
+        if sesion is None:
+            return
+        firma = firma_ruta(ruta)
+        with self._lock:
+            propias = self.caminos_por_sesion.setdefault(sesion, set())
+            if firma not in propias:
+                propias.add(firma)
+                self.sesiones_por_camino[firma] += 1
+
+    def quitar(self, sesion, ruta):
+        """
+        Descuenta un solo camino de la sesión (cuando se reencamina y deja de usarlo).
+        """
+        firma = firma_ruta(ruta)
+        with self._lock:
+            propias = self.caminos_por_sesion.get(sesion, set())
+            if firma in propias:
+                propias.discard(firma)
+                self.sesiones_por_camino[firma] -= 1
+                if not self.sesiones_por_camino[firma]:
+                    del self.sesiones_por_camino[firma]
+
+    def liberar(self, sesion):
+        with self._lock:
+            for firma in self.caminos_por_sesion.pop(sesion, ()):
+                self.sesiones_por_camino[firma] -= 1
+                if not self.sesiones_por_camino[firma]:
+                    del self.sesiones_por_camino[firma]
+
+    def resumen(self):
+        """
+        Sesiones por camino, con el camino escrito como "dpid:puerto > dpid:puerto > ...".
+        """
+        with self._lock:
+            return {
+                " > ".join(f"{dpid}:{puerto}" for dpid, puerto in firma) or "(mismo switch)": cantidad
+                for firma, cantidad in self.sesiones_por_camino.items()
+            }
+
+
+#REGISTRO DE FLUJOS POR SESIÓN ***********************************************************************************************************************
+
+class RegistroFlujos:
+    """
+    Registra qué reglas instaló cada sesión y cuántas sesiones usan cada regla.
+    Una regla compartida (p. ej. allow-arp-{switch}) solo se libera cuando la última sesión que la usa cierra.
+    """
+
+    def __init__(self):
+        self.reglas_por_sesion = {}  # sesion -> set(nombres)
+        self.referencias = {}        # nombre -> número de sesiones que la usan
+        self.ultimo_uso = {}         # sesion -> instante de su última instalación o acceso
+        self._lock = threading.Lock()
+
+    def registrar(self, sesion, nombres):
+        with self._lock:
+            propias = self.reglas_por_sesion.setdefault(sesion, set())
+            for nombre in nombres:
+                if nombre not in propias:
+                    propias.add(nombre)
+                    self.referencias[nombre] = self.referencias.get(nombre, 0) + 1
+            self.ultimo_uso[sesion] = time.monotonic()
+
+    def tocar(self, sesion):
+        with self._lock:
+            if sesion in self.reglas_por_sesion:
+                self.ultimo_uso[sesion] = time.monotonic()
+
+    def sesiones_por_antiguedad(self):
+        """
+        Sesiones con reglas registradas, de la que lleva más tiempo sin actividad a la más reciente.
+        """
+        with self._lock:
+            return sorted(self.reglas_por_sesion, key=lambda sesion: self.ultimo_uso.get(sesion, 0))
+
+    def reglas_de(self, sesion):
+        with self._lock:
+            return set(self.reglas_por_sesion.get(sesion, ()))
+
+    def en_uso(self, nombre):
+        with self._lock:
+            return self.referencias.get(nombre, 0) > 0
+
+    def liberar(self, sesion):
+        """
+        Quita la sesión del registro y retorna las reglas que ya no usa ninguna otra sesión.
+        """
+        with self._lock:
+            liberadas = []
+            self.ultimo_uso.pop(sesion, None)
+            for nombre in self.reglas_por_sesion.pop(sesion, ()):
+                self.referencias[nombre] -= 1
+                if self.referencias[nombre] == 0:
+                    del self.referencias[nombre]
+                    liberadas.append(nombre)
+            return sorted(liberadas)
+
+    def quitar(self, sesion, nombres):
+        """
+        Quita solo algunas reglas de la sesión y retorna las que ya no usa ninguna otra sesión.
+        """
+        with self._lock:
+            liberadas = []
+            propias = self.reglas_por_sesion.get(sesion, set())
+            for nombre in nombres:
+                if nombre in propias:
+                    propias.discard(nombre)
+                    self.referencias[nombre] -= 1
+                    if self.referencias[nombre] == 0:
+                        del self.referencias[nombre]
+                        liberadas.append(nombre)
+            return sorted(liberadas)
+
+
+#RUTAS INSTALADAS POR SESIÓN *************************************************************************************************************************
+
+class RutasPorSesion:
+    """
+    Recuerda la última ruta instalada por cada sesión hacia cada destino (usuario, lista de saltos, hosts y
+    nombres de regla), para que al moverse el usuario se envíen y borren solo los saltos que cambiaron.
+    """
+
+    def __init__(self):
+        # sesion -> {(dst_dpid, dst_port): {'usuario', 'extremos', 'ruta', 'hosts', 'por_pareja', 'reglas'}}
+        self.rutas = {}
+        self._lock = threading.Lock()
+
+    def guardar(self, sesion, usuario, extremos, ruta, hosts, por_pareja, reglas):
+        with self._lock:
+            self.rutas.setdefault(sesion, {})[tuple(extremos[2:])] = {
+                'usuario': usuario,
+                'extremos': tuple(extremos),
+                'ruta': ruta,
+                'hosts': hosts,
+                'por_pareja': por_pareja,
+                'reglas': set(reglas),
+            }
+
+    def desde(self, src_dpid, src_port, usuario):
+        """
+        Retorna [(sesion, registro)] de las rutas del usuario que salen del attachment point indicado.
+        """
+        with self._lock:
+            return [
+                (sesion, dict(registro))
+                for sesion, destinos in self.rutas.items()
+                for registro in destinos.values()
+                if registro['usuario'] == usuario and registro['extremos'][:2] == (src_dpid, src_port)
+            ]
+
+    def reglas_de(self, sesion, excepto=None):
+        """
+        Reglas que usan las rutas de la sesión, sin contar la ruta hacia el destino 'excepto' (dst_dpid, dst_port).
+        """
+        with self._lock:
+            return {
+                nombre
+                for destino, registro in self.rutas.get(sesion, {}).items() if destino != excepto
+                for nombre in registro['reglas']
+            }
+
+    def de_sesion(self, sesion):
+        with self._lock:
+            return [dict(registro) for registro in self.rutas.get(sesion, {}).values()]
+
+    def olvidar(self, sesion):
+        with self._lock:
+            self.rutas.pop(sesion, None)
+
+
+#TABLA DE FLUJOS DESEADA *****************************************************************************************************************************
+
+def nombres_instalados(listado):
+    """
+    Extrae los nombres de regla de la respuesta de /wm/staticflowpusher/list/all/json,
+    que tiene la forma {dpid: [{nombre: {...}}, ...]}.
+    """
+    nombres = set()
+    for flujos in (listado or {}).values():
+        for flujo in flujos or []:
+            nombres.update(flujo.keys())
+    return nombres
+
+
+class TablaFlujos:
+    """
+    Estado deseado de las reglas estáticas, reconciliado contra lo que reporta el controlador.
+    Solo se vuelven a enviar las reglas que faltan en el controlador o cuya definición cambió.
+    """
+
+    def __init__(self):
+        self.confirmadas = {}  # nombre -> regla enviada con éxito
+        self.por_switch = Counter()  # dpid -> reglas confirmadas en ese switch
+        self.envios_ahorrados = 0
+        self._lock = threading.Lock()
+
+    def reconciliar(self, reglas, instaladas):
+        """
+        Separa las reglas en pendientes de envío y ya instaladas.
+
+        Args:
+            reglas (list): Reglas deseadas.
+            instaladas (set | None): Nombres presentes en el controlador; None si no se pudo consultar.
+
+        Returns:
+            tuple: (reglas a enviar, nombres que no hace falta reenviar)
+        """
+        pendientes, ahorradas = [], []
+        with self._lock:
+            for regla in reglas:
+                nombre = regla['name']
+                if instaladas is not None and nombre in instaladas and self.confirmadas.get(nombre) == regla:
+                    ahorradas.append(nombre)
+                else:
+                    pendientes.append(regla)
+            self.envios_ahorrados += len(ahorradas)
+        return pendientes, ahorradas
+
+    def confirmar(self, reglas):
+        with self._lock:
+            for regla in reglas:
+                anterior = self.confirmadas.get(regla['name'])
+                if anterior is not None:
+                    self.por_switch[anterior['switch']] -= 1
+                self.confirmadas[regla['name']] = regla
+                self.por_switch[regla['switch']] += 1
+
+    def olvidar(self, nombres):
+        with self._lock:
+            for nombre in nombres:
+                regla = self.confirmadas.pop(nombre, None)
+                if regla is not None:
+                    self.por_switch[regla['switch']] -= 1
+
+    def vaciar(self):
+        with self._lock:
+            self.confirmadas.clear()
+            self.por_switch.clear()
+
+    def sincronizar(self, instaladas):
+        """
+        Olvida las reglas confirmadas que ya no están en el controlador (p. ej. vencidas por idle/hard timeout),
+        para que el conteo por switch refleje lo que realmente ocupa las tablas.
+        """
+        with self._lock:
+            vencidas = [nombre for nombre in self.confirmadas if nombre not in instaladas]
+        self.olvidar(vencidas)
+        return vencidas
+
+    def switch_de(self, nombre):
+        with self._lock:
+            regla = self.confirmadas.get(nombre)
+            return regla['switch'] if regla else None
+
+    def reglas_por_switch(self):
+        with self._lock:
+            return +self.por_switch  # Copia sin los switches que quedaron en 0
@@ -0,0 +1,100 @@
+import threading
+import time
+
+from moduloDiferido import importar_diferido
+
+paramiko = importar_diferido("paramiko")  # Carga cryptography: solo se importa al abrir la primera conexión
+
+#POOL DE SESIONES SSH ********************************************************************************************************************************
+
+TIEMPO_INACTIVO = 300  # Segundos sin uso antes de cerrar una conexión del pool
+TIMEOUT_SSH = 10       # Segundos para conectar y para esperar la salida de un comando
+
+
+class PoolSSH:
+    """
+    Mantiene conexiones SSH ya autenticadas por (gateway, puerto, usuario).
+    Cada comando se ejecuta en un canal nuevo sobre el transporte existente, evitando
+    repetir el intercambio de claves y la autenticación en cada validación.
+    """
+
+    def __init__(self, tiempo_inactivo=TIEMPO_INACTIVO, timeout=TIMEOUT_SSH):
+        self.tiempo_inactivo = tiempo_inactivo
+        self.timeout = timeout
+        self.conexiones = {}  # (gateway, puerto, usuario) -> [cliente, último uso]
+        self.conexiones_nuevas = 0
+        self.reutilizaciones = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _activa(cliente):
+        transporte = cliente.get_transport()
+        if transporte is None or not transporte.is_active():
+            return False
+        try:
+            transporte.send_ignore()  # Comprueba que el otro extremo sigue respondiendo
+            return True
+        except (paramiko.SSHException, EOFError, OSError):
+            return False
+
+    def _expulsar_inactivas(self, ahora):
+        for clave, (cliente, ultimo_uso) in list(self.conexiones.items()):
+            if ahora - ultimo_uso >= self.tiempo_inactivo:
+                cliente.close()
+                del self.conexiones[clave]
+
+    def obtener(self, gateway, puerto, usuario, contrasenia):
+        """
+        Retorna un SSHClient autenticado, reutilizando el del pool si sigue activo.
+        """
+        clave = (gateway, puerto, usuario)
+        with self._lock:
+            ahora = time.monotonic()
+            self._expulsar_inactivas(ahora)
+            entrada = self.conexiones.get(clave)
+            if entrada and self._activa(entrada[0]):
+                entrada[1] = ahora
+                self.reutilizaciones += 1
+                return entrada[0]
+            if entrada:
+                entrada[0].close()
+                del self.conexiones[clave]
+
+        cliente = paramiko.SSHClient()
+        cliente.set_missing_host_key_policy(paramiko.AutoAddPolicy())
+        cliente.connect(gateway, port=puerto, username=usuario, password=contrasenia, timeout=self.timeout)
+        cliente.get_transport().set_keepalive(30)
+        with self._lock:
+            anterior = self.conexiones.get(clave)
+            if anterior:
+                anterior[0].close()
+            self.conexiones[clave] = [cliente, time.monotonic()]
+            self.conexiones_nuevas += 1
+        return cliente
+
+    def ejecutar(self, gateway, puerto, usuario, contrasenia, comando):
+        """
+        Ejecuta el comando en un canal nuevo y retorna su salida estándar.
+        Si el transporte se cayó entre la comprobación y el uso, se reconecta una vez.
+        """
+        for intento in range(2):
+            cliente = self.obtener(gateway, puerto, usuario, contrasenia)
+            try:
+                stdin, stdout, stderr = cliente.exec_command(comando, timeout=self.timeout)
+                return stdout.read().decode('utf-8')
+            except (paramiko.SSHException, EOFError, OSError):
+                self.descartar(gateway, puerto, usuario)
+                if intento == 1:
+                    raise
+
+    def descartar(self, gateway, puerto, usuario):
+        with self._lock:
+            entrada = self.conexiones.pop((gateway, puerto, usuario), None)
+        if entrada:
+            entrada[0].close()
+
+    def cerrar_todas(self):
+        with self._lock:
+            for cliente, _ in self.conexiones.values():
+                cliente.close()
+            self.conexiones.clear()
@@ -0,0 +1,116 @@
+import argparse
+import asyncio
+import atexit
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+import moduloAuth as auth
+from moduloDatos import RepositorioDB, crear_almacen
+from moduloFloodlight import CONTROLADOR
+
+#SERVIDOR ASYNCIO ************************************************************************************************************************************
+#
+# Protocolo: una petición JSON por línea y una respuesta JSON por línea, p. ej.
+#   {"op": "login", "correo": "a20241001@pucp.edu.pe", "contrasenia": "a123"}
+#   {"op": "solicitar_acceso", "token": "...", "codigo_curso": "TEL201"}
+# Las respuestas llevan "ok": true/false y, si falla, "error" con el mensaje.
+
+HOST = "127.0.0.1"  # Solo local: las contraseñas viajan en texto plano (ver --exponer)
+HOST_EXPUESTO = "0.0.0.0"
+PUERTO = 9000
+MAX_HILOS = 64  # Operaciones bloqueantes (REST, SSH) atendidas a la vez
+
+OPERACIONES = {
+    'login': lambda servicio, p: {'token': servicio.iniciar_sesion(p['correo'], p['contrasenia'])},
+    'listar_cursos': lambda servicio, p: {'cursos': servicio.listar_cursos(p['token'])},
+    'solicitar_acceso': lambda servicio, p: servicio.solicitar_acceso(p['token'], p['codigo_curso']),
+    'ver_notas': lambda servicio, p: {'notas': servicio.ver_notas(p['token'], p['codigo_curso'])},
+    'actualizar_ubicacion': lambda servicio, p: {'attachmentPoint': servicio.actualizar_ubicacion(p['token'])},
+    'logout': lambda servicio, p: {'reglas': servicio.cerrar_sesion(p['token'])},
+}
+
+
+def despachar(servicio, peticion):
+    """
+    Ejecuta una petición sobre el servicio y arma la respuesta. Nunca lanza excepciones.
+    """
+    operacion = OPERACIONES.get(peticion.get('op'))
+    if operacion is None:
+        return {'ok': False, 'error': f"Operación desconocida: {peticion.get('op')}"}
+    try:
+        return {'ok': True, **operacion(servicio, peticion)}
+    except auth.ErrorServicio as e:
+        return {'ok': False, 'error': str(e)}
+    except KeyError as e:
+        return {'ok': False, 'error': f"Falta el campo {e} en la petición."}
+    except Exception as e:
+        return {'ok': False, 'error': f"Error interno: {e}"}
+
+
+async def atender_cliente(servicio, reader, writer):
+    loop = asyncio.get_running_loop()
+    try:
+        while True:
+            linea = await reader.readline()
+            if not linea:
+                break
+            try:
+                peticion = json.loads(linea)
+            except json.JSONDecodeError:
+                respuesta = {'ok': False, 'error': "Petición JSON inválida."}
+            else:
+                # Las operaciones hacen E/S bloqueante (Floodlight, SSH), así que se ejecutan en el pool de hilos
+                respuesta = await loop.run_in_executor(None, despachar, servicio, peticion)
+            writer.write(json.dumps(respuesta, default=str).encode("utf-8") + b"\n")
+            await writer.drain()
+    finally:
+        writer.close()
+
+
+async def servir(servicio, host=HOST, puerto=PUERTO, max_hilos=MAX_HILOS):
+    asyncio.get_running_loop().set_default_executor(ThreadPoolExecutor(max_workers=max_hilos))
+    servidor = await asyncio.start_server(lambda r, w: atender_cliente(servicio, r, w), host, puerto)
+    print(f"Servicio escuchando en {host}:{puerto}")
+    async with servidor:
+        await servidor.serve_forever()
+
+
+def crear_servicio(ip_controlador, precargar_rutas=None, sesion_inactiva=auth.SESION_INACTIVA):
+    """
+    Carga las bases de datos y retorna el servicio listo para atender sesiones. Los attachment points
+    se mantienen al día en segundo plano (ver auth.SeguidorAttachmentPoints).
+    """
+    almacen = crear_almacen()
+    repo = RepositorioDB(auth.cargar_base_datos_usuarios(almacen), almacen)
+    rutas = auth.cargar_base_datos_rutas()
+
+    seguidor = auth.SeguidorAttachmentPoints(ip_controlador, rutas, repo.db).iniciar()
+    atexit.register(seguidor.detener)
+
+    return auth.ServicioAcademico(repo, rutas, ip_controlador, precargar_rutas, sesion_inactiva, seguidor)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Servicio sin interfaz para el sistema de gestión PUCP.")
+    parser.add_argument("--host", default=None, help=f"Dirección en la que escuchar (por defecto {HOST})")
+    parser.add_argument("--exponer", action="store_true",
+                        help=f"Escuchar en todas las interfaces ({HOST_EXPUESTO}); las contraseñas viajan sin cifrar")
+    parser.add_argument("--puerto", type=int, default=PUERTO)
+    parser.add_argument("--controlador", default=CONTROLADOR, help="Dirección del controlador Floodlight (ip o ip:puerto)")
+    parser.add_argument("--hilos", type=int, default=MAX_HILOS)
+    parser.add_argument("--precargar-rutas", action="store_true", default=None,
+                        help="Instalar en segundo plano las rutas de los cursos autorizados al iniciar sesión")
+    parser.add_argument("--sesion-inactiva", type=int, default=auth.SESION_INACTIVA,
+                        help="Segundos sin actividad antes de cerrar una sesión y borrar sus reglas (0 = nunca)")
+    args = parser.parse_args()
+    if args.host is None:
+        args.host = HOST_EXPUESTO if args.exponer else HOST
+    elif args.exponer:
+        parser.error("--exponer y --host no se pueden usar juntos")
+
+    servicio = crear_servicio(args.controlador, args.precargar_rutas, args.sesion_inactiva)
+    asyncio.run(servir(servicio, args.host, args.puerto, args.hilos))
+
+
+if __name__ == "__main__":
+    main()
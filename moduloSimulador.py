@@ -0,0 +1,410 @@
+import argparse
+import json
+import os
+import random
+import re
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+#TOPOLOGÍA SINTÉTICA *********************************************************************************************************************************
+#
+# Simulador local de la API REST de Floodlight para pruebas de carga sin el laboratorio. Atiende:
+#   GET    /wm/device/
+#   GET    /wm/core/controller/switches/json
+#   GET    /wm/topology/links/json
+#   GET    /wm/topology/route/<src_dpid>/<src_port>/<dst_dpid>/<dst_port>/json
+#   POST   /wm/staticflowpusher/json           (agrega o reemplaza una regla por nombre)
+#   DELETE /wm/staticflowpusher/json           (borra la regla {"name": ...})
+#   GET    /wm/staticflowpusher/list/all/json
+#   GET    /wm/staticflowpusher/clear/all/json
+#
+# Uso: python moduloSimulador.py --puerto 8081 --switches 20 --latencia 0.005
+#      SDN_CONTROLADOR=127.0.0.1:8081 python moduloAuth.py
+
+PUERTOS_HOST = 48  # Los puertos 1..48 de cada switch son de acceso; los enlaces entre switches usan los siguientes
+
+
+def dpid_sintetico(i):
+    return "00:00:" + ":".join(f"{(i >> desplazamiento) & 255:02x}" for desplazamiento in (40, 32, 24, 16, 8, 0))
+
+
+def generar_topologia(switches=20, enlaces_extra=None, semilla=1):
+    """
+    Genera una topología conexa: un árbol aleatorio entre los switches más algunos enlaces redundantes.
+
+    Returns:
+        dict: {'switches': [dpid], 'enlaces': [(dpid_a, puerto_a, dpid_b, puerto_b)]}
+    """
+    rnd = random.Random(semilla)
+    dpids = [dpid_sintetico(i + 1) for i in range(switches)]
+    siguiente_puerto = {dpid: PUERTOS_HOST + 1 for dpid in dpids}
+    enlaces, pares = [], set()
+
+    def enlazar(a, b):
+        pares.add(frozenset((a, b)))
+        enlaces.append((a, siguiente_puerto[a], b, siguiente_puerto[b]))
+        siguiente_puerto[a] += 1
+        siguiente_puerto[b] += 1
+
+    for i in range(1, switches):
+        enlazar(dpids[i], dpids[rnd.randrange(i)])
+
+    if enlaces_extra is None:
+        enlaces_extra = switches // 2
+    intentos = 0
+    while enlaces_extra > 0 and intentos < enlaces_extra * 20 and switches > 2:
+        intentos += 1
+        a, b = rnd.sample(dpids, 2)
+        if frozenset((a, b)) not in pares:
+            enlazar(a, b)
+            enlaces_extra -= 1
+
+    return {'switches': dpids, 'enlaces': enlaces}
+
+
+def dispositivos_desde_db(db, topologia, semilla=1):
+    """
+    Ubica a cada usuario y servidor de la base de datos en un puerto de acceso al azar, con el formato de /wm/device/.
+    """
+    rnd = random.Random(semilla)
+    macs = [u['mac'] for u in db.get('usuarios', [])] + [s['mac'] for s in db.get('servidores', [])]
+    dispositivos = []
+    for mac in dict.fromkeys(macs):
+        dispositivos.append({
+            'mac': [mac],
+            'attachmentPoint': [{'switchDPID': rnd.choice(topologia['switches']), 'port': rnd.randint(1, PUERTOS_HOST)}],
+        })
+    return dispositivos
+
+
+#SIMULADOR *******************************************************************************************************************************************
+
+class SimuladorFloodlight:
+    """
+    Estado del controlador simulado: topología, dispositivos y tablas de flujo por switch.
+
+    Args:
+        topologia (dict): Resultado de generar_topologia.
+        dispositivos (list): Dispositivos con el formato de /wm/device/.
+        latencia (float): Segundos de espera por petición.
+        variacion (float): Segundos adicionales al azar (0..variacion) por petición.
+        tasa_error (float): Probabilidad de responder HTTP 500 a una petición.
+        max_flujos (int): Reglas por switch antes de rechazar nuevas inserciones (None = sin límite).
+        colas (int): Colas configuradas por puerto; se rechaza un enqueue a una cola inexistente (None = sin control).
+    """
+
+    def __init__(self, topologia, dispositivos=None, latencia=0.0, variacion=0.0, tasa_error=0.0,
+                 max_flujos=None, semilla=None, colas=None):
+        self.switches = list(topologia['switches'])
+        self.enlaces = list(topologia['enlaces'])
+        self.dispositivos = list(dispositivos or [])
+        self.latencia = latencia
+        self.variacion = variacion
+        self.tasa_error = tasa_error
+        self.max_flujos = max_flujos
+        self.colas = colas
+        self.flujos = {}        # dpid -> {nombre: regla}
+        self.switch_de = {}     # nombre -> dpid
+        self.vencimientos = {}  # nombre -> instante en que vence por idle/hard timeout
+        self.peticiones = {}    # "MÉTODO endpoint" -> número de peticiones
+        self.errores_inyectados = 0
+        self.rechazos_por_capacidad = 0
+        self.vencidas = 0
+        self.servidor = None
+        self._rnd = random.Random(semilla)
+        self._lock = threading.Lock()
+
+    # Topología -------------------------------------------------------------------------------------------------------------
+
+    def _adyacencias(self):
+        adyacencias = {dpid: [] for dpid in self.switches}
+        for a, puerto_a, b, puerto_b in self.enlaces:
+            adyacencias[a].append((puerto_a, b, puerto_b))
+            adyacencias[b].append((puerto_b, a, puerto_a))
+        return adyacencias
+
+    def calcular_ruta(self, src_dpid, src_port, dst_dpid, dst_port):
+        """
+        Camino más corto en saltos, con el formato de /wm/topology/route/: puerto de entrada y de salida por switch.
+        Retorna [] si no hay camino.
+        """
+        with self._lock:
+            adyacencias = self._adyacencias()
+        if src_dpid not in adyacencias or dst_dpid not in adyacencias:
+            return []
+
+        anterior = {src_dpid: None}
+        cola = deque([src_dpid])
+        while cola and dst_dpid not in anterior:
+            actual = cola.popleft()
+            for puerto_local, vecino, puerto_vecino in adyacencias[actual]:
+                if vecino not in anterior:
+                    anterior[vecino] = (actual, puerto_local, puerto_vecino)
+                    cola.append(vecino)
+        if dst_dpid not in anterior:
+            return []
+
+        saltos = []  # (dpid, puerto de entrada, puerto de salida), del destino hacia el origen
+        puerto_salida = dst_port
+        actual = dst_dpid
+        while anterior[actual] is not None:
+            previo, puerto_previo, puerto_entrada = anterior[actual]
+            saltos.append((actual, puerto_entrada, puerto_salida))
+            actual, puerto_salida = previo, puerto_previo
+        saltos.append((src_dpid, src_port, puerto_salida))
+
+        ruta = []
+        for dpid, entrada, salida in reversed(saltos):
+            ruta.append({'switch': dpid, 'port': {'portNumber': entrada}})
+            ruta.append({'switch': dpid, 'port': {'portNumber': salida}})
+        return ruta
+
+    def enlaces_json(self):
+        with self._lock:
+            return [
+                {'src-switch': a, 'src-port': puerto_a, 'dst-switch': b, 'dst-port': puerto_b,
+                 'type': 'internal', 'direction': 'bidirectional', 'latency': 0}
+                for a, puerto_a, b, puerto_b in self.enlaces
+            ]
+
+    def listar_dispositivos(self):
+        with self._lock:
+            return list(self.dispositivos)
+
+    def quitar_enlace(self, dpid_a, dpid_b):
+        with self._lock:
+            self.enlaces = [e for e in self.enlaces if {e[0], e[2]} != {dpid_a, dpid_b}]
+
+    def mover_dispositivo(self, mac, dpid, puerto):
+        with self._lock:
+            for dispositivo in self.dispositivos:
+                if mac in dispositivo.get('mac', []):
+                    dispositivo['attachmentPoint'] = [{'switchDPID': dpid, 'port': puerto}]
+                    return
+            self.dispositivos.append({'mac': [mac], 'attachmentPoint': [{'switchDPID': dpid, 'port': puerto}]})
+
+    # Static flow pusher ----------------------------------------------------------------------------------------------------
+
+    def _expirar(self):
+        """
+        Quita las reglas cuyo timeout venció. Sin tráfico simulado, idle_timeout cuenta desde la instalación.
+        Se llama con el lock tomado.
+        """
+        ahora = time.monotonic()
+        for nombre in [n for n, vence in self.vencimientos.items() if vence <= ahora]:
+            del self.vencimientos[nombre]
+            dpid = self.switch_de.pop(nombre, None)
+            if dpid is not None:
+                self.flujos[dpid].pop(nombre, None)
+                self.vencidas += 1
+
+    def agregar_flujo(self, regla):
+        """
+        Agrega o reemplaza la regla por nombre. Retorna (código HTTP, mensaje).
+        """
+        nombre, dpid = regla.get('name'), regla.get('switch')
+        if not nombre or not dpid:
+            return 400, "Missing name or switch"
+        if self.colas is not None:
+            for accion in str(regla.get('actions', '')).split(','):
+                if accion.startswith("enqueue="):
+                    cola = accion.split(":")[-1]
+                    if not cola.isdigit() or int(cola) >= self.colas:
+                        return 400, f"Queue {cola} does not exist"
+        timeouts = [int(regla.get(campo) or 0) for campo in ('idle_timeout', 'hard_timeout')]
+        timeouts = [t for t in timeouts if t > 0]
+        with self._lock:
+            self._expirar()
+            anterior = self.switch_de.get(nombre)
+            if anterior is not None:
+                self.flujos[anterior].pop(nombre, None)
+            tabla = self.flujos.setdefault(dpid, {})
+            if self.max_flujos is not None and len(tabla) >= self.max_flujos:
+                self.rechazos_por_capacidad += 1
+                self.switch_de.pop(nombre, None)
+                self.vencimientos.pop(nombre, None)
+                return 400, f"Flow table full on switch {dpid}"
+            tabla[nombre] = regla
+            self.switch_de[nombre] = dpid
+            if timeouts:
+                self.vencimientos[nombre] = time.monotonic() + min(timeouts)
+            else:
+                self.vencimientos.pop(nombre, None)
+        return 200, "Entry pushed"
+
+    def borrar_flujo(self, nombre):
+        with self._lock:
+            dpid = self.switch_de.pop(nombre, None)
+            self.vencimientos.pop(nombre, None)
+            if dpid is not None:
+                self.flujos[dpid].pop(nombre, None)
+        return 200, f"Entry {nombre} deleted"
+
+    def listar_flujos(self):
+        with self._lock:
+            self._expirar()
+            return {dpid: [{nombre: regla} for nombre, regla in tabla.items()] for dpid, tabla in self.flujos.items()}
+
+    def vaciar_flujos(self):
+        with self._lock:
+            self.flujos.clear()
+            self.switch_de.clear()
+            self.vencimientos.clear()
+
+    def total_flujos(self):
+        with self._lock:
+            self._expirar()
+            return len(self.switch_de)
+
+    # Servidor HTTP ---------------------------------------------------------------------------------------------------------
+
+    def contar(self, clave):
+        with self._lock:
+            self.peticiones[clave] = self.peticiones.get(clave, 0) + 1
+
+    def inyectar_fallo(self):
+        """
+        Aplica la latencia configurada y decide si la petición debe fallar.
+        """
+        espera = self.latencia + (self._rnd.uniform(0, self.variacion) if self.variacion else 0)
+        if espera > 0:
+            time.sleep(espera)
+        if self.tasa_error and self._rnd.random() < self.tasa_error:
+            with self._lock:
+                self.errores_inyectados += 1
+            return True
+        return False
+
+    def iniciar(self, host="127.0.0.1", puerto=0):
+        """
+        Levanta el servidor HTTP en un hilo y retorna la dirección "ip:puerto" para SDN_CONTROLADOR.
+        Con puerto=0 se usa un puerto libre cualquiera.
+        """
+        self.servidor = ThreadingHTTPServer((host, puerto), ManejadorFloodlight)
+        self.servidor.daemon_threads = True
+        self.servidor.simulador = self
+        threading.Thread(target=self.servidor.serve_forever, name="simulador-floodlight", daemon=True).start()
+        return f"{host}:{self.servidor.server_address[1]}"
+
+    def detener(self):
+        if self.servidor is not None:
+            self.servidor.shutdown()
+            self.servidor.server_close()
+            self.servidor = None
+
+
+RUTA_TOPOLOGIA = re.compile(r"^/wm/topology/route/([^/]+)/(\d+)/([^/]+)/(\d+)/json$")
+
+
+class ManejadorFloodlight(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # Mantiene la conexión abierta, como el pool del cliente espera
+
+    def log_message(self, formato, *args):
+        pass  # Sin una línea por petición en consola
+
+    def _responder(self, codigo, cuerpo):
+        datos = json.dumps(cuerpo).encode("utf-8")
+        self.send_response(codigo)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(datos)))
+        self.end_headers()
+        self.wfile.write(datos)
+
+    def _leer_json(self):
+        longitud = int(self.headers.get("Content-Length") or 0)
+        if not longitud:
+            return {}
+        return json.loads(self.rfile.read(longitud))
+
+    def _atender(self, metodo):
+        simulador = self.server.simulador
+        ruta = self.path.split("?")[0]
+        try:
+            cuerpo = self._leer_json() if metodo in ("POST", "DELETE") else None
+        except json.JSONDecodeError:
+            self._responder(400, {'status': "Invalid JSON"})
+            return
+
+        coincidencia = RUTA_TOPOLOGIA.match(ruta)
+        simulador.contar(f"{metodo} {'/wm/topology/route' if coincidencia else ruta}")
+        if simulador.inyectar_fallo():
+            self._responder(500, {'status': "Simulated error"})
+            return
+
+        if metodo == "GET" and coincidencia:
+            src_dpid, src_port, dst_dpid, dst_port = coincidencia.groups()
+            self._responder(200, simulador.calcular_ruta(src_dpid, int(src_port), dst_dpid, int(dst_port)))
+        elif metodo == "GET" and ruta in ("/wm/device", "/wm/device/"):
+            self._responder(200, simulador.listar_dispositivos())
+        elif metodo == "GET" and ruta == "/wm/core/controller/switches/json":
+            self._responder(200, [{'switchDPID': dpid} for dpid in simulador.switches])
+        elif metodo == "GET" and ruta == "/wm/topology/links/json":
+            self._responder(200, simulador.enlaces_json())
+        elif metodo == "GET" and ruta == "/wm/staticflowpusher/list/all/json":
+            self._responder(200, simulador.listar_flujos())
+        elif metodo == "GET" and ruta == "/wm/staticflowpusher/clear/all/json":
+            simulador.vaciar_flujos()
+            self._responder(200, {'status': "Deleted all flows."})
+        elif metodo == "POST" and ruta == "/wm/staticflowpusher/json":
+            codigo, mensaje = simulador.agregar_flujo(cuerpo)
+            self._responder(codigo, {'status': mensaje})
+        elif metodo == "DELETE" and ruta == "/wm/staticflowpusher/json":
+            codigo, mensaje = simulador.borrar_flujo(cuerpo.get('name'))
+            self._responder(codigo, {'status': mensaje})
+        else:
+            self._responder(404, {'status': f"Unknown endpoint {ruta}"})
+
+    def do_GET(self):
+        self._atender("GET")
+
+    def do_POST(self):
+        self._atender("POST")
+
+    def do_DELETE(self):
+        self._atender("DELETE")
+
+
+def main():
+    from moduloDatos import leer_yaml, ruta_datos
+
+    parser = argparse.ArgumentParser(description="Simulador local de la API REST de Floodlight.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--puerto", type=int, default=8081)
+    parser.add_argument("--switches", type=int, default=20)
+    parser.add_argument("--enlaces-extra", type=int, default=None, help="Enlaces redundantes además del árbol")
+    parser.add_argument("--latencia", type=float, default=0.0, help="Segundos de espera por petición")
+    parser.add_argument("--variacion", type=float, default=0.0, help="Segundos extra al azar por petición")
+    parser.add_argument("--tasa-error", type=float, default=0.0, help="Fracción de peticiones que responden HTTP 500")
+    parser.add_argument("--max-flujos", type=int, default=None, help="Reglas por switch antes de rechazar inserciones")
+    parser.add_argument("--colas", type=int, default=None, help="Colas por puerto para validar las acciones enqueue")
+    parser.add_argument("--semilla", type=int, default=1)
+    parser.add_argument("--dispositivos", help="JSON con la lista de /wm/device/ (p. ej. el de moduloBenchmark --generar)")
+    parser.add_argument("--database", default=ruta_datos("database.yaml"),
+                        help="Si no se indican dispositivos, se ubican los usuarios y servidores de esta base")
+    args = parser.parse_args()
+
+    topologia = generar_topologia(args.switches, args.enlaces_extra, args.semilla)
+    if args.dispositivos:
+        with open(args.dispositivos, encoding="utf-8") as archivo:
+            dispositivos = json.load(archivo)
+    else:
+        db = leer_yaml(args.database) if os.path.exists(args.database) else {}
+        dispositivos = dispositivos_desde_db(db or {}, topologia, args.semilla)
+
+    simulador = SimuladorFloodlight(topologia, dispositivos, args.latencia, args.variacion, args.tasa_error,
+                                    args.max_flujos, args.semilla, args.colas)
+    direccion = simulador.iniciar(args.host, args.puerto)
+    print(f"Simulador de Floodlight en {direccion}: {len(topologia['switches'])} switches, "
+          f"{len(topologia['enlaces'])} enlaces, {len(dispositivos)} dispositivos")
+    print(f"Use SDN_CONTROLADOR={direccion} para apuntar la aplicación al simulador. Ctrl+C para salir.")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        simulador.detener()
+
+
+if __name__ == "__main__":
+    main()
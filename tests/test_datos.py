@@ -0,0 +1,208 @@
+import os
+import pickle
+import sqlite3
+import threading
+
+import pytest
+
+import moduloDatos
+from moduloDatos import (AlmacenRutas, AlmacenSQLite, AlmacenYAML, DiarioNotas, RepositorioDB, escribir_yaml,
+                         leer_yaml)
+
+
+@pytest.fixture
+def directorio(tmp_path, monkeypatch):
+    monkeypatch.setattr(moduloDatos, "DIRECTORIO_DATOS", str(tmp_path))
+    return tmp_path
+
+
+def rutas_ejemplo():
+    return {
+        'servidores': [{'codigo_servidor': 'S1', 'nombre': 'Servidor 1', 'ip': '10.0.0.2',
+                        'attachmentPoint': [{'switchDPID': 's1', 'port': 5}]}],
+        'usuarios': [{'codigo': 20240001, 'nombre': 'Ana', 'attachmentPoint': [{'switchDPID': 's2', 'port': 3}]}],
+    }
+
+
+def test_almacen_rutas_no_escribe_si_nada_cambio(directorio):
+    escribir_yaml(rutas_ejemplo(), str(directorio / "rutas.yaml"))
+    almacen = AlmacenRutas(intervalo=0)
+    rutas = almacen.cargar()
+    assert almacen.guardar(rutas) == 0
+    assert almacen.estadisticas()['escrituras'] == 0
+    assert almacen.estadisticas()['omitidas'] == 1
+
+
+def test_almacen_rutas_escribe_solo_con_cambios(directorio):
+    escribir_yaml(rutas_ejemplo(), str(directorio / "rutas.yaml"))
+    almacen = AlmacenRutas(intervalo=0)
+    rutas = almacen.cargar()
+    rutas['usuarios'][0]['attachmentPoint'] = [{'switchDPID': 's2', 'port': 7}]
+    rutas['usuarios'].append({'codigo': 20240002, 'nombre': 'Luis', 'attachmentPoint': []})
+    assert almacen.guardar(rutas) == 2
+    assert almacen.escrituras == 1 and almacen.bytes_escritos == os.path.getsize(directorio / "rutas.yaml")
+    assert leer_yaml(str(directorio / "rutas.yaml")) == rutas
+
+
+def test_almacen_rutas_junta_varios_cambios_en_una_escritura(directorio):
+    escribir_yaml(rutas_ejemplo(), str(directorio / "rutas.yaml"))
+    almacen = AlmacenRutas(intervalo=60)  # El escritor no llega a despertar durante la prueba
+    rutas = almacen.cargar()
+    for puerto in range(10):
+        rutas['usuarios'][0]['attachmentPoint'] = [{'switchDPID': 's2', 'port': puerto}]
+        almacen.guardar(rutas)
+    assert almacen.escrituras == 0
+    assert almacen.vaciar()
+    assert not almacen.vaciar()
+    assert almacen.escrituras == 1
+    assert leer_yaml(str(directorio / "rutas.yaml"))['usuarios'][0]['attachmentPoint'][0]['port'] == 9
+
+
+def test_almacen_rutas_firma_y_copia_la_misma_lectura(directorio):
+    escribir_yaml(rutas_ejemplo(), str(directorio / "rutas.yaml"))
+    almacen = AlmacenRutas(str(directorio / "rutas.yaml"), intervalo=60)  # Ruta fija: lo pendiente se escribe al salir
+    rutas = almacen.cargar()
+    rutas['usuarios'] += [{'codigo': codigo, 'nombre': 'Otro', 'attachmentPoint': []} for codigo in range(2000)]
+    lock = threading.Lock()
+    fin = threading.Event()
+
+    def modificar():
+        puerto = 0
+        while not fin.is_set():
+            with lock:
+                rutas['usuarios'].append({'codigo': 20250000, 'nombre': 'Nuevo', 'attachmentPoint': []})
+                rutas['usuarios'][0]['attachmentPoint'] = [{'switchDPID': 's2', 'port': puerto}]
+            with lock:
+                rutas['usuarios'].pop()
+            puerto += 1
+
+    hilo = threading.Thread(target=modificar)
+    hilo.start()
+    try:
+        for _ in range(50):
+            almacen.guardar(rutas, lock)
+            with almacen._cond:
+                assert almacen.firmas(almacen._pendiente) == almacen._firmas
+    finally:
+        fin.set()
+        hilo.join()
+
+
+def test_repositorio_mantiene_los_indices_al_agregar():
+    repo = RepositorioDB({'usuarios': [{'codigo': 1, 'nombre': 'Ana', 'rol': 'Profesor', 'mac': 'aa',
+                                        'contrasenia': 'x'}],
+                          'cursos': [], 'servidores': [{'codigo_servidor': 'S1', 'ip': '10.0.0.2'}]})
+    assert repo.autenticar(1, 'x')['nombre'] == 'Ana' and repo.autenticar(1, 'y') is None
+    assert repo.obtener_servidor('S1')['ip'] == '10.0.0.2'
+
+    repo.agregar_usuario({'codigo': 2, 'nombre': 'Luis', 'rol': 'Estudiante', 'mac': 'aa', 'contrasenia': 'z'})
+    repo.agregar_curso({'codigo_curso': 'TEL101', 'nombre': 'Curso', 'profesor': 1, 'alumnos': []},
+                       {'curso': 'TEL101', 'nombre': 'Curso', 'alumnos': []})
+    repo.inscribir_alumno(repo.obtener_curso('TEL101'), 2, {'alumno': 2, 'pc1': 'Pendiente'})
+
+    assert repo.nombre_usuario(2) == 'Luis' and repo.nombre_usuario(3) == 'Desconocido'
+    assert [u['codigo'] for u in repo.usuarios_con_mac('aa')] == [1, 2]
+    assert repo.esta_inscrito(2, 'TEL101') and not repo.esta_inscrito(1, 'TEL101')
+    assert [c['codigo_curso'] for c in repo.cursos_de_alumno(2)] == ['TEL101']
+    assert repo.obtener_notas_alumno('TEL101', 2) == {'alumno': 2, 'pc1': 'Pendiente'}
+
+
+def test_snapshot_en_json_se_usa_y_no_ejecuta_contenido_ajeno(directorio):
+    ruta = str(directorio / "rutas.yaml")
+    escribir_yaml(rutas_ejemplo(), ruta)
+    moduloDatos.TIEMPOS_CARGA.clear()
+    assert moduloDatos.cargar_yaml(ruta) == rutas_ejemplo()
+    assert moduloDatos.TIEMPOS_CARGA[-1][1] == "snapshot"
+    assert os.stat(moduloDatos.ruta_snapshot(ruta)).st_mode & 0o077 == 0
+
+    # Un pickle en lugar del snapshot se descarta: se vuelve a parsear el YAML
+    with open(moduloDatos.ruta_snapshot(ruta), 'wb') as archivo:
+        archivo.write(pickle.dumps(rutas_ejemplo()))
+    assert moduloDatos.cargar_yaml(ruta) == rutas_ejemplo()
+    assert moduloDatos.TIEMPOS_CARGA[-1][1] != "snapshot"
+
+
+def test_sin_snapshot_si_los_datos_no_pasan_por_json(directorio):
+    ruta = str(directorio / "fechas.yaml")
+    with open(ruta, 'w', encoding="utf-8") as archivo:
+        archivo.write("inicio: 2026-03-01\n1: uno\n")
+    datos = moduloDatos.cargar_yaml(ruta)
+    assert datos[1] == "uno" and not isinstance(datos['inicio'], str)
+    assert not os.path.exists(moduloDatos.ruta_snapshot(ruta))
+
+
+def base_con_notas():
+    return {
+        'usuarios': [], 'cursos': [], 'servidores': [],
+        'notas': [{'curso': 'TEL101', 'nombre': 'Curso', 'alumnos': [{'alumno': 1, 'pc1': 'Pendiente'},
+                                                                     {'alumno': 2, 'pc1': 'Pendiente'}]}],
+    }
+
+
+def notas_de(db, alumno):
+    return next(r for r in db['notas'][0]['alumnos'] if r['alumno'] == alumno)
+
+
+def test_diario_se_superpone_a_la_base_al_cargar(directorio):
+    escribir_yaml(base_con_notas(), str(directorio / "database.yaml"))
+    diario = DiarioNotas(AlmacenYAML(), umbral_compactacion=1000)
+    diario.registrar('TEL101', {'alumno': 1, 'pc1': 12})
+    diario.registrar('TEL101', {'alumno': 1, 'pc1': 15})
+    # Una línea cortada por una caída a mitad de escritura se ignora
+    with open(directorio / "notas.journal", 'a', encoding="utf-8") as archivo:
+        archivo.write('{"curso": "TEL101", "registro": {"alumno": 2, "pc1"')
+
+    db = DiarioNotas(AlmacenYAML(), umbral_compactacion=1000).cargar()
+    assert notas_de(db, 1)['pc1'] == 15
+    assert notas_de(db, 2)['pc1'] == 'Pendiente'
+
+
+def test_compactacion_vuelca_el_diario_sin_perder_altas(directorio):
+    escribir_yaml(base_con_notas(), str(directorio / "database.yaml"))
+    almacen = AlmacenYAML()
+    diario = DiarioNotas(almacen, umbral_compactacion=1000)
+    repo = moduloDatos.RepositorioDB(diario.cargar(), almacen)
+    diario.registrar('TEL101', {'alumno': 2, 'pc1': 18})
+    notas_de(repo.db, 2)['pc1'] = 18
+    repo.agregar_usuario({'codigo': 3, 'nombre': 'Nuevo', 'mac': 'aa', 'rol': 'Estudiante', 'contrasenia': 'x'})
+    diario.compactar()
+
+    assert not os.path.exists(directorio / "notas.journal.compactando")
+    db = leer_yaml(str(directorio / "database.yaml"))
+    assert notas_de(db, 2)['pc1'] == 18
+    assert [u['codigo'] for u in db['usuarios']] == [3]
+
+
+def test_sqlite_importa_y_exporta_el_formato_de_database_yaml(directorio):
+    original = leer_yaml(os.path.join(os.path.dirname(os.path.dirname(__file__)), "database.yaml"))
+    escribir_yaml(original, str(directorio / "database.yaml"))
+    almacen = AlmacenSQLite()
+    try:
+        almacen.importar_yaml()
+        assert almacen.cargar() == original
+        almacen.exportar_yaml(str(directorio / "exportada.yaml"))
+        assert leer_yaml(str(directorio / "exportada.yaml")) == original
+    finally:
+        almacen.cerrar()
+
+
+def test_sqlite_rechaza_duplicados_y_deshace_el_cambio_en_memoria(directorio):
+    almacen = AlmacenSQLite()
+    try:
+        repo = RepositorioDB(almacen.cargar(), almacen)
+        repo.agregar_curso({'codigo_curso': 'TEL101', 'nombre': 'Curso', 'profesor': 'Sin profesor',
+                            'alumnos': [], 'servidor': []})
+        repo.agregar_usuario({'codigo': 1, 'nombre': 'Ana', 'rol': 'Estudiante', 'mac': 'aa'})
+        repo.inscribir_alumno(repo.obtener_curso('TEL101'), 1)
+
+        with pytest.raises(sqlite3.IntegrityError):
+            repo.agregar_usuario({'codigo': 1, 'nombre': 'Otra', 'rol': 'Estudiante', 'mac': 'bb'})
+        with pytest.raises(sqlite3.IntegrityError):
+            repo.inscribir_alumno(repo.obtener_curso('TEL101'), 1)
+
+        assert [u['nombre'] for u in repo.db['usuarios']] == ['Ana'] and repo.obtener_usuario(1)['nombre'] == 'Ana'
+        assert not repo.existe_mac('bb')
+        assert repo.obtener_curso('TEL101')['alumnos'] == [1] and repo.esta_inscrito(1, 'TEL101')
+        assert almacen.cargar() == repo.db
+    finally:
+        almacen.cerrar()
@@ -0,0 +1,78 @@
+from moduloFloodlight import RegistroFlujos, TablaFlujos
+
+
+def regla(nombre, switch="s1", salida=2):
+    return {'switch': switch, 'name': nombre, 'actions': f"output={salida}"}
+
+
+def test_registro_libera_reglas_compartidas_con_la_ultima_sesion():
+    registro = RegistroFlujos()
+    registro.registrar("a", ["flow-1", "allow-arp-s1"])
+    registro.registrar("b", ["flow-2", "allow-arp-s1"])
+    assert registro.liberar("a") == ["flow-1"]
+    assert registro.en_uso("allow-arp-s1")
+    assert registro.liberar("b") == ["allow-arp-s1", "flow-2"]
+    assert not registro.en_uso("allow-arp-s1")
+
+
+def test_registro_quitar_solo_algunas_reglas():
+    registro = RegistroFlujos()
+    registro.registrar("a", ["flow-1", "flow-2"])
+    registro.registrar("b", ["flow-2"])
+    assert registro.quitar("a", ["flow-1", "flow-2", "ajena"]) == ["flow-1"]
+    assert registro.reglas_de("a") == set()
+    assert registro.reglas_de("b") == {"flow-2"}
+
+
+def test_registro_sesiones_por_antiguedad():
+    registro = RegistroFlujos()
+    registro.registrar("vieja", ["flow-1"])
+    registro.registrar("nueva", ["flow-2"])
+    registro.tocar("vieja")
+    assert registro.sesiones_por_antiguedad() == ["nueva", "vieja"]
+
+
+def test_reconciliar_solo_reenvia_lo_que_falta_o_cambio():
+    tabla = TablaFlujos()
+    tabla.confirmar([regla("flow-1"), regla("flow-2")])
+    deseadas = [regla("flow-1"), regla("flow-2", salida=3), regla("flow-3")]
+
+    pendientes, ahorradas = tabla.reconciliar(deseadas, {"flow-1", "flow-2"})
+    assert ahorradas == ["flow-1"]
+    assert [r['name'] for r in pendientes] == ["flow-2", "flow-3"]
+
+
+def test_reconciliar_sin_listado_del_controlador_reenvia_todo():
+    tabla = TablaFlujos()
+    tabla.confirmar([regla("flow-1")])
+    pendientes, ahorradas = tabla.reconciliar([regla("flow-1")], None)
+    assert ahorradas == [] and len(pendientes) == 1
+
+
+def test_conteo_por_switch_y_sincronizar():
+    tabla = TablaFlujos()
+    tabla.confirmar([regla("flow-1"), regla("flow-2"), regla("flow-3", switch="s2")])
+    tabla.confirmar([regla("flow-1", salida=5)])  # Reemplazo: no suma
+    assert tabla.reglas_por_switch() == {"s1": 2, "s2": 1}
+    assert tabla.sincronizar({"flow-1"}) == ["flow-2", "flow-3"]
+    assert tabla.reglas_por_switch() == {"s1": 1}
+
+
+def test_liberar_capacidad_no_cuenta_reemplazos(monkeypatch):
+    import moduloAuth as auth
+
+    tabla, registro = TablaFlujos(), RegistroFlujos()
+    monkeypatch.setattr(auth, "tabla_flujos", tabla)
+    monkeypatch.setattr(auth, "registro_flujos", registro)
+    monkeypatch.setattr(auth, "CAPACIDAD_SWITCH", 10)
+    desalojos = []
+    monkeypatch.setattr(auth, "borrar_rutas", lambda ip, sesion, silencioso=False: desalojos.append(sesion))
+
+    tabla.confirmar([regla(f"flow-{i}") for i in range(9)])
+    registro.registrar("inactiva", [f"flow-{i}" for i in range(9)])
+
+    # Reemplazar reglas ya confirmadas no llena la tabla
+    assert auth.liberar_capacidad("ctl", [regla("flow-0", salida=7), regla("flow-1", salida=7)], "actual") == []
+    # Una regla con nombre nuevo sí supera el umbral (9 de 10)
+    assert auth.liberar_capacidad("ctl", [regla("flow-nueva")], "actual") == ["inactiva"]
+    assert desalojos == ["inactiva"]
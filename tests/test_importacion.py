@@ -0,0 +1,12 @@
+from moduloDiferido import medir_importacion, verificar_presupuesto
+
+
+def test_medir_importacion_lee_la_salida_de_importtime():
+    milisegundos, importados = medir_importacion("moduloDiferido")
+    assert milisegundos > 0
+    assert "moduloDiferido" in importados
+
+
+def test_importar_la_cli_cumple_el_presupuesto():
+    assert verificar_presupuesto() == []
+
@@ -0,0 +1,67 @@
+import pytest
+
+import moduloAuth as auth
+import moduloDatos
+from moduloSimulador import SimuladorFloodlight, dpid_sintetico
+
+S1, S2, S3 = (dpid_sintetico(i) for i in (1, 2, 3))
+TOPOLOGIA = {'switches': [S1, S2, S3], 'enlaces': [(S1, 49, S2, 49), (S2, 50, S3, 49)]}
+SERVIDOR = {'ip': '10.0.0.2', 'mac': '00:00:00:00:00:02', 'servicios': ['ssh', 'web'], 'servicio': 'ssh', 'puerto': 22}
+
+
+@pytest.fixture
+def controlador(tmp_path, monkeypatch):
+    monkeypatch.setenv("SDN_QOS", "1")
+    monkeypatch.setattr(auth, "QOS", True)
+    monkeypatch.setattr(auth, "MULTIRUTA", 1)
+    monkeypatch.setattr(auth, "_politica_qos", None)
+    monkeypatch.setattr(moduloDatos, "DIRECTORIO_DATOS", str(tmp_path))  # Sin qos.yaml: se usa POLITICA_QOS
+    simulador = SimuladorFloodlight(TOPOLOGIA, [], colas=2)
+    ip = simulador.iniciar()
+    yield simulador, ip
+    simulador.detener()
+
+
+def acceder(ip, sesion, rol, ip_usuario):
+    hosts = {'origen': {'ip': ip_usuario, 'mac': '00:00:00:00:01:01', 'rol': rol}, 'destino': SERVIDOR}
+    return auth.get_route(ip, S1, 1, S3, 2, sesion, silencioso=True, hosts=hosts)
+
+
+def reglas_qos(simulador, ip_usuario):
+    return {
+        nombre: regla
+        for tabla in simulador.listar_flujos().values() for flujo in tabla for nombre, regla in flujo.items()
+        if nombre.startswith("qos-") and regla['ipv4_src'] in (ip_usuario, SERVIDOR['ip'])
+        and ip_usuario in (regla['ipv4_src'], regla['ipv4_dst'])
+    }
+
+
+def test_profesor_usa_colas_y_prioridades_de_la_politica(controlador):
+    simulador, ip = controlador
+    resultado = acceder(ip, "profesor", "Profesor", "10.0.0.10")
+    assert resultado['fallidas'] == []
+
+    reglas = reglas_qos(simulador, "10.0.0.10")
+    ssh = [r for r in reglas.values() if "22" in (r.get('tcp_dst'), r.get('tcp_src'))]
+    web = [r for r in reglas.values() if {r.get('tcp_dst'), r.get('tcp_src')} & {"80", "443"}]
+    # Tres switches, ida y vuelta
+    assert len(ssh) == 6 and len(web) == 12
+    assert {r['priority'] for r in ssh} == {"9400"} and {r['priority'] for r in web} == {"9250"}
+    for regla in ssh + web:
+        puerto, cola = regla['actions'].removeprefix("enqueue=").split(":")
+        assert cola == ("0" if regla in ssh else "1")
+        assert puerto != str(regla['in_port'])
+
+
+def test_cola_inexistente_es_rechazada(controlador):
+    simulador, ip = controlador
+    resultado = acceder(ip, "estudiante", "Estudiante", "10.0.0.11")
+
+    # Estudiante: ssh a la cola 1 (existe), web a la cola 2 (el simulador solo tiene 0 y 1)
+    rechazadas = dict(resultado['fallidas'])
+    assert rechazadas and all(nombre.startswith("qos-") and nombre.rsplit("-", 1)[1] in ("80", "443")
+                              for nombre in rechazadas)
+    assert all("400" in str(error) for error in rechazadas.values())
+
+    instaladas = reglas_qos(simulador, "10.0.0.11")
+    assert instaladas and all(r['actions'].endswith(":1") and r['priority'] == "9300" for r in instaladas.values())
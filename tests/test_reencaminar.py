@@ -0,0 +1,61 @@
+import pytest
+
+import moduloAuth as auth
+from moduloFloodlight import RegistroFlujos, RepartoRutas, RutasPorSesion, TablaFlujos
+from moduloSimulador import SimuladorFloodlight, dpid_sintetico
+
+S1, S2, S3 = (dpid_sintetico(i) for i in (1, 2, 3))
+TOPOLOGIA = {'switches': [S1, S2, S3], 'enlaces': [(S1, 49, S2, 49), (S2, 50, S3, 49)]}
+SERVIDOR = {'ip': '10.0.0.2', 'mac': '00:00:00:00:00:02'}
+
+
+@pytest.fixture
+def controlador(monkeypatch):
+    monkeypatch.setattr(auth, "QOS", False)
+    monkeypatch.setattr(auth, "MULTIRUTA", 1)
+    for nombre, clase in (("registro_flujos", RegistroFlujos), ("tabla_flujos", TablaFlujos),
+                          ("rutas_sesion", RutasPorSesion), ("reparto_rutas", RepartoRutas)):
+        monkeypatch.setattr(auth, nombre, clase())
+    simulador = SimuladorFloodlight(TOPOLOGIA)
+    ip = simulador.iniciar()
+    yield simulador, ip
+    simulador.detener()
+
+
+def acceder(ip, sesion, usuario, ip_usuario):
+    hosts = {'origen': {'ip': ip_usuario, 'mac': f"00:00:00:00:01:{usuario:02x}"}, 'destino': SERVIDOR}
+    return auth.get_route(ip, S1, 1, S3, 2, sesion, silencioso=True, hosts=hosts, usuario=usuario)
+
+
+def instaladas(simulador):
+    return {nombre for tabla in simulador.listar_flujos().values() for flujo in tabla for nombre in flujo}
+
+
+def test_reencaminar_instala_antes_de_borrar_y_solo_toca_al_usuario_que_se_movio(controlador, monkeypatch):
+    simulador, ip = controlador
+    assert acceder(ip, "sesion-1", 1, "10.0.0.11")['fallidas'] == []
+    assert acceder(ip, "sesion-2", 2, "10.0.0.12")['fallidas'] == []  # Otro usuario en el mismo puerto
+    antes = auth.registro_flujos.reglas_de("sesion-1")
+    de_la_otra = auth.registro_flujos.reglas_de("sesion-2")
+
+    operaciones = []
+    agregar, borrar = simulador.agregar_flujo, simulador.borrar_flujo
+    monkeypatch.setattr(simulador, "agregar_flujo", lambda regla: operaciones.append("+") or agregar(regla))
+    monkeypatch.setattr(simulador, "borrar_flujo", lambda nombre: operaciones.append("-") or borrar(nombre))
+
+    # El usuario 1 pasa de s1:1 a s2:3
+    resultados = auth.reencaminar_attachment_point(ip, {'switchDPID': S1, 'port': 1}, {'switchDPID': S2, 'port': 3},
+                                                   1, silencioso=True)
+    assert len(resultados) == 1 and resultados[0]['fallidas'] == []
+    assert resultados[0]['nuevas'] and resultados[0]['borradas'] and resultados[0]['conservadas']
+    # Make-before-break: ninguna regla se borra antes de que estén todas las nuevas
+    assert operaciones == ["+"] * len(resultados[0]['nuevas']) + ["-"] * len(resultados[0]['borradas'])
+
+    despues = auth.registro_flujos.reglas_de("sesion-1")
+    assert set(resultados[0]['conservadas']) <= antes & despues
+    assert not set(resultados[0]['borradas']) & de_la_otra
+    assert auth.registro_flujos.reglas_de("sesion-2") == de_la_otra
+    assert [registro['extremos'][:2] for registro in auth.rutas_sesion.de_sesion("sesion-1")] == [(S2, 3)]
+    assert [registro['extremos'][:2] for registro in auth.rutas_sesion.de_sesion("sesion-2")] == [(S1, 1)]
+    # En el controlador quedan exactamente las reglas de las dos sesiones, sin huérfanas
+    assert instaladas(simulador) == despues | de_la_otra
@@ -0,0 +1,24 @@
+import moduloAuth as auth
+
+# A:3 -> A:49 | B:51 -> B:50 | C:49 -> C:5
+RUTA = [{'switch': switch, 'port': {'portNumber': puerto}}
+        for switch, puerto in (("A", 3), ("A", 49), ("B", 51), ("B", 50), ("C", 49), ("C", 5))]
+HOSTS = {'origen': {'ip': '10.0.0.1', 'mac': '00:00:00:00:00:01'},
+         'destino': {'ip': '10.0.0.2', 'mac': '00:00:00:00:00:02'}}
+
+
+def coincidencias(reglas):
+    return [(regla['switch'], regla.get('in_port'), regla['priority']) for regla in reglas if 'in_port' in regla]
+
+
+def test_una_regla_por_puerto_de_entrada_en_cada_switch(monkeypatch):
+    monkeypatch.setattr(auth, "QOS", False)
+    reglas = [regla for regla in auth.generar_reglas(RUTA) if regla['name'].startswith("flow-")]
+    assert sorted((regla['switch'], regla['in_port'], regla['actions']) for regla in reglas) == [
+        ("A", 3, "output=49"), ("A", 49, "output=3"),
+        ("B", 50, "output=51"), ("B", 51, "output=50"),
+        ("C", 5, "output=49"), ("C", 49, "output=5"),
+    ]
+    for por_pareja in (False, True):
+        claves = coincidencias(auth.generar_reglas(RUTA, HOSTS, por_pareja=por_pareja))
+        assert len(claves) == len(set(claves))
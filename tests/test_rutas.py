@@ -0,0 +1,77 @@
+from moduloFloodlight import ArbolRutas, MotorRutas, normalizar_enlaces
+
+
+def enlace(a, puerto_a, b, puerto_b):
+    return {'src-switch': a, 'src-port': puerto_a, 'dst-switch': b, 'dst-port': puerto_b}
+
+
+# s1 - s2 - s3 en línea, más s1 - s4 - s3 como segundo camino de igual costo
+ENLACES = [enlace("s1", 10, "s2", 20), enlace("s2", 21, "s3", 30), enlace("s1", 11, "s4", 40), enlace("s4", 41, "s3", 31)]
+
+
+def crear_motor(enlaces):
+    estado = {'enlaces': list(enlaces)}
+    motor = MotorRutas(lambda: estado['enlaces'],
+                       lambda: [{'switchDPID': dpid} for dpid in ("s1", "s2", "s3", "s4")],
+                       intervalo_topologia=0)
+    return motor, estado
+
+
+def test_arbol_camino_mas_corto_hacia_la_raiz():
+    motor, _ = crear_motor(ENLACES[:2])
+    motor.actualizar()
+    arbol = ArbolRutas("s3", motor.adyacencias)
+    assert arbol.distancia == {"s3": 0, "s2": 1, "s1": 2}
+    assert arbol.camino("s1") == [("s1", 10, 20), ("s2", 21, 30)]
+    assert arbol.camino("s3") == []
+    assert arbol.camino("s9") is None
+
+
+def test_arbol_usa_enlace_y_mejora_con():
+    motor, _ = crear_motor(ENLACES[:2])
+    motor.actualizar()
+    arbol = ArbolRutas("s3", motor.adyacencias)
+    assert arbol.usa_enlace(("s2", 21, "s3", 30))
+    assert not arbol.usa_enlace(("s1", 11, "s4", 40))
+    assert arbol.mejora_con(("s1", 12, "s3", 32))      # acorta s1 de 2 a 1 salto
+    assert arbol.mejora_con(("s4", 41, "s3", 31))      # conecta un switch que no era alcanzable
+
+
+def test_ruta_con_formato_de_floodlight():
+    motor, _ = crear_motor(ENLACES[:2])
+    ruta = motor.ruta("s1", 1, "s3", 2)
+    assert [(salto['switch'], salto['port']['portNumber']) for salto in ruta] == [
+        ("s1", 1), ("s1", 10), ("s2", 20), ("s2", 21), ("s3", 30), ("s3", 2)]
+
+
+def test_caida_de_enlace_recalcula_solo_los_arboles_afectados():
+    motor, estado = crear_motor(ENLACES)
+    motor.precalcular(["s3", "s2"])
+    antes = motor.ruta("s1", 1, "s3", 2)
+    caido = next(e for e in ENLACES if motor.arbol("s3").usa_enlace(next(iter(normalizar_enlaces([e])))))
+    estado['enlaces'] = [e for e in ENLACES if e is not caido]
+    despues = motor.ruta("s1", 1, "s3", 2)
+    assert despues != antes and len(despues) == len(antes)
+    assert motor.recalculos >= 1
+
+
+def test_rutas_equivalentes():
+    motor, _ = crear_motor(ENLACES)
+    caminos = motor.rutas_equivalentes("s1", 1, "s3", 2, 4)
+    intermedios = {ruta[2]['switch'] for ruta in caminos}
+    assert intermedios == {"s2", "s4"}
+
+
+def test_caida_de_enlace_fuera_del_arbol_actualiza_rutas_equivalentes():
+    motor, estado = crear_motor(ENLACES)
+    assert len(motor.rutas_equivalentes("s1", 1, "s3", 2, 4)) == 2
+    # s1 - s4 no es parte del árbol hacia s3 (el BFS llega a s1 por s2), así que el árbol no se recalcula
+    assert not motor.arbol("s3").usa_enlace(("s1", 11, "s4", 40))
+    estado['enlaces'] = [e for e in ENLACES if e['dst-switch'] != "s4" or e['src-switch'] != "s1"]
+    caminos = motor.rutas_equivalentes("s1", 1, "s3", 2, 4)
+    assert motor.recalculos == 0
+    assert [ruta[2]['switch'] for ruta in caminos] == ["s2"]
+
+    # Al volver, el enlace aparece de nuevo entre los caminos de igual costo
+    estado['enlaces'] = list(ENLACES)
+    assert {ruta[2]['switch'] for ruta in motor.rutas_equivalentes("s1", 1, "s3", 2, 4)} == {"s2", "s4"}
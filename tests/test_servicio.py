@@ -0,0 +1,48 @@
+import threading
+
+import moduloAuth as auth
+
+
+class SnapshotFijo:
+    def __init__(self, lock, attachment_points):
+        self.lock = lock
+        self.puntos = attachment_points
+
+    def attachment_points(self, mac):
+        assert not self.lock.locked()  # La consulta al controlador no debe bloquear las rutas
+        return [dict(ap) for ap in self.puntos]
+
+    def invalidar(self):
+        pass
+
+
+def test_actualizar_attachment_point_consulta_y_reencamina_sin_el_lock(monkeypatch):
+    lock = threading.Lock()
+    rutas = {'usuarios': [{'codigo': 1, 'nombre': 'Ana', 'attachmentPoint': [{'switchDPID': 's1', 'port': 1}]}],
+             'servidores': []}
+    nuevo = [{'switchDPID': 's2', 'port': 4}]
+    monkeypatch.setattr(auth, "obtener_snapshot_dispositivos", lambda ip: SnapshotFijo(lock, nuevo))
+    reencaminados = []
+
+    def reencaminar(ip, anterior, actual, usuario, silencioso=False):
+        assert not lock.locked()
+        reencaminados.append((anterior['switchDPID'], actual['switchDPID'], usuario))
+
+    monkeypatch.setattr(auth, "reencaminar_attachment_point", reencaminar)
+    actual = auth.actualizar_attachment_point_usuario_logueado("ctl", rutas, {'codigo': 1, 'nombre': 'Ana', 'mac': 'aa'},
+                                                               guardar=False, lock=lock, silencioso=True)
+    assert actual == nuevo and rutas['usuarios'][0]['attachmentPoint'] == nuevo
+    assert reencaminados == [("s1", "s2", 1)]
+
+
+def test_errores_diferidos_no_se_imprimen_hasta_terminar_el_login(capsys):
+    errores = []
+    auth.diferir_errores(errores)
+    try:
+        assert auth.obtener_flujos_instalados("127.0.0.1:1") is None
+    finally:
+        auth.diferir_errores(None)
+    assert capsys.readouterr().out == ""
+    assert len(errores) == 1 and "listar las reglas instaladas" in errores[0]
+    auth.reportar_error("después del login")
+    assert capsys.readouterr().out == "después del login\n"